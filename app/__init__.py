@@ -0,0 +1,5 @@
+# app/__init__.py
+import time
+
+# Start of the app import, for the cold start timings (see app/startup.py)
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,292 @@
+# app/bulk.py
+import json
+import time
+import zlib
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from .config import settings
+from .models import WebhookPayload
+from .targets import GitHubTarget, resolve_target, use_target
+from .coalescer import CoalesceKey, created_at_sort_key
+from .helpers import commit_manifest_to_github_direct
+from .serialization import body_decompressor
+from .webhook_body import parse_webhook_payload
+
+logger = logging.getLogger(__name__)
+
+# Bulk direct commits for backfills and migrations. The body is NDJSON, one
+# WebhookPayload per line, read and validated line by line as it arrives. Records are
+# grouped by target file; a group only keeps its newest manifest (by created_at) and
+# the commit hashes of the records waiting for the next commit, which is made every
+# settings.BULK_MAX_RECORDS_PER_COMMIT records and at the end of the body. Memory thus
+# stays flat however large the upload is. One result line per record is streamed back
+# as soon as its commit finishes, followed by a summary line.
+
+_DECODE_STEP = 64 * 1024  # Decompressed bytes per step, so a small gzip chunk cannot expand all at once
+_RESULT_QUEUE_SIZE = 1000  # Result lines waiting to be sent; a client that reads slowly slows the ingest down
+_RESULTS_PER_CHUNK = 100  # Result lines sent together when several are ready
+
+BULK_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/x-ndjson": {"schema": {"type": "string", "description": "One WebhookPayload JSON object per line."}}},
+    }
+}
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body is produced while the request body is still being read.
+    Starlette's version also calls receive() to watch for a disconnect, which would take
+    request body messages away from the reader; here the reader notices a disconnect
+    itself (ClientDisconnect).
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _decoded_chunks(request: Request, decompressor: Optional[Any]) -> AsyncIterator[bytes]:
+    async for chunk in request.stream():
+        if decompressor is None:
+            yield chunk
+            continue
+        data = decompressor.decompress(chunk, _DECODE_STEP)
+        while True:
+            if data:
+                yield data
+            if not decompressor.unconsumed_tail:
+                break
+            data = decompressor.decompress(decompressor.unconsumed_tail, _DECODE_STEP)
+    if decompressor is not None and not decompressor.eof:
+        raise zlib.error("the compressed data ends early")
+
+
+async def _ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Yields (line number, line) for every non-blank line. A line longer than
+    settings.MAX_WEBHOOK_BODY_BYTES is dropped while it streams in and yielded as None.
+    """
+    limit = settings.MAX_WEBHOOK_BODY_BYTES
+    buffer = bytearray()
+    oversized = False
+    line_number = 0
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if not oversized:
+                buffer += chunk[start:] if end == -1 else chunk[start:end]
+                if len(buffer) > limit:
+                    oversized = True
+                    buffer.clear()
+            if end == -1:
+                break
+            line_number += 1
+            if oversized:
+                yield line_number, None
+            elif buffer.strip():
+                yield line_number, bytes(buffer)
+            buffer.clear()
+            oversized = False
+            start = end + 1
+    if oversized or buffer.strip():
+        yield line_number + 1, None if oversized else bytes(buffer)
+
+
+def _bulk_commit_message(newest: WebhookPayload, commit_hashes: List[str]) -> str:
+    message = f"feat: Update prompt manifest via bulk webhook - commit {newest.commit_hash}"
+    if len(commit_hashes) > 1:
+        listed = "\n".join(f"- {commit_hash}" for commit_hash in commit_hashes)
+        message += f"\n\nIncludes {len(commit_hashes)} webhook events:\n{listed}"
+    return message
+
+
+class _FileGroup:
+    """
+    Records of one bulk upload for one target file: the newest payload so far and the
+    records (line number, commit hash) waiting for the next commit.
+    """
+
+    def __init__(self, target: GitHubTarget):
+        self.target = target
+        self.newest: Optional[WebhookPayload] = None
+        self.pending: List[Tuple[int, str]] = []
+        self.commit_task: Optional[asyncio.Task] = None
+
+    def add(self, line_number: int, payload: WebhookPayload) -> None:
+        # >= keeps the later record on ties, as the coalescer does
+        if self.newest is None or created_at_sort_key(payload) >= created_at_sort_key(self.newest):
+            self.newest = payload
+        self.pending.append((line_number, payload.commit_hash))
+
+
+class BulkCommit:
+    """
+    One bulk upload: reads and groups the records in a background task and hands the
+    result lines to `stream_results`, the body of the streaming response.
+    """
+
+    def __init__(self, request: Request, decompressor: Optional[Any], target_key: Optional[str] = None):
+        self.request = request
+        self.decompressor = decompressor
+        self.target_key = target_key  # From /webhook/{target}/...; overrides the records' `target`
+        self.groups: Dict[CoalesceKey, _FileGroup] = {}
+        self.results: asyncio.Queue = asyncio.Queue(maxsize=_RESULT_QUEUE_SIZE)
+        self.counts = {"records": 0, "committed": 0, "unchanged": 0, "failed": 0, "commits": 0}
+        self.error: Optional[str] = None
+
+    async def stream_results(self) -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        reader = asyncio.create_task(self._read())
+        try:
+            while True:
+                result = await self.results.get()
+                lines = []
+                while result is not None:
+                    lines.append(json.dumps(result, default=str))
+                    if len(lines) >= _RESULTS_PER_CHUNK or self.results.empty():
+                        break
+                    result = self.results.get_nowait()
+                if lines:
+                    yield ("\n".join(lines) + "\n").encode("utf-8")
+                if result is None:
+                    break
+            await reader
+            summary = {**self.counts, "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+            if self.error is not None:
+                summary["error"] = self.error
+            logger.info(
+                f"Bulk upload of {self.counts['records']} records: {self.counts['commits']} commits, "
+                f"{self.counts['failed']} failed records.",
+                extra=summary,
+            )
+            yield (json.dumps({"summary": summary}) + "\n").encode("utf-8")
+        finally:
+            # The client went away: stop reading and abandon commits that have not finished
+            for task in [reader] + [group.commit_task for group in self.groups.values() if group.commit_task]:
+                if not task.done():
+                    task.cancel()
+
+    async def _read(self) -> None:
+        try:
+            try:
+                async for line_number, line in _ndjson_lines(_decoded_chunks(self.request, self.decompressor)):
+                    await self._add(line_number, line)
+            except zlib.error as e:
+                # The records read so far are still committed
+                self.error = f"Request body is not valid compressed data: {str(e)}"
+                logger.warning(self.error)
+            for group in self.groups.values():
+                if group.pending:
+                    await self._flush(group)
+            for group in self.groups.values():
+                if group.commit_task is not None:
+                    await group.commit_task
+        except ClientDisconnect:
+            self.error = "The client disconnected before the end of the request body."
+            logger.warning(self.error)
+        except Exception as e:
+            self.error = "An internal server error occurred during bulk commit."
+            logger.exception(f"Unexpected error reading a bulk upload: {str(e)}")
+        finally:
+            await self.results.put(None)
+
+    async def _add(self, line_number: int, line: Optional[bytes]) -> None:
+        self.counts["records"] += 1
+        if line is None:
+            await self._reject(line_number, None, None, 413, f"Record exceeds the maximum size of {settings.MAX_WEBHOOK_BODY_BYTES} bytes.")
+            return
+        try:
+            payload = parse_webhook_payload(line)
+        except RequestValidationError as e:
+            # Without the "input", which may be the whole record
+            errors = [{"loc": error["loc"], "msg": error["msg"], "type": error["type"]} for error in e.errors()]
+            await self._reject(line_number, None, None, 422, errors)
+            return
+        if self.target_key is not None:
+            payload.target = self.target_key
+        try:
+            target = resolve_target(payload.target)
+        except HTTPException as e:
+            await self._reject(line_number, payload.commit_hash, payload.target, e.status_code, e.detail)
+            return
+
+        key = (target.full_name, target.branch, target.file_path)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = _FileGroup(target)
+        group.add(line_number, payload)
+        if len(group.pending) >= settings.BULK_MAX_RECORDS_PER_COMMIT:
+            await self._flush(group)
+
+    async def _flush(self, group: _FileGroup) -> None:
+        # Commits to one file stay in order; waiting here also stops reading while they run
+        if group.commit_task is not None:
+            await group.commit_task
+        records, group.pending = group.pending, []
+        group.commit_task = asyncio.create_task(self._commit(group.target, group.newest, records))
+
+    async def _commit(self, target: GitHubTarget, newest: WebhookPayload, records: List[Tuple[int, str]]) -> None:
+        # The newest manifest so far goes in one commit for all pending records. If it
+        # was already committed by an earlier batch this is a no-op without GitHub calls.
+        message = _bulk_commit_message(newest, [commit_hash for _, commit_hash in records])
+        try:
+            with use_target(target):
+                github_response = await commit_manifest_to_github_direct(newest, message)
+        except HTTPException as e:
+            await self._fail(target, records, e.status_code, e.detail)
+            return
+        except Exception as e:
+            logger.exception(f"Unexpected error committing {len(records)} bulk records to '{target.file_path}': {str(e)}")
+            await self._fail(target, records, 500, "An internal server error occurred during direct commit.")
+            return
+
+        status = "unchanged" if github_response.get("status") == "unchanged" else "committed"
+        if status == "committed":
+            self.counts["commits"] += 1
+        commit_sha = github_response.get("commit", {}).get("sha")
+        for line_number, commit_hash in records:
+            self.counts[status] += 1
+            await self.results.put({
+                "line": line_number,
+                "commit_hash": commit_hash,
+                "target": target.key,
+                "status": status,
+                "commit_sha": commit_sha,
+                "manifest_commit_hash": newest.commit_hash,
+            })
+
+    async def _fail(self, target: GitHubTarget, records: List[Tuple[int, str]], status_code: int, detail: Any) -> None:
+        for line_number, commit_hash in records:
+            await self._reject(line_number, commit_hash, target.key, status_code, detail)
+
+    async def _reject(self, line_number: int, commit_hash: Optional[str], target_key: Optional[str], status_code: int, detail: Any) -> None:
+        self.counts["failed"] += 1
+        await self.results.put({
+            "line": line_number,
+            "commit_hash": commit_hash,
+            "target": target_key,
+            "status": "failed",
+            "status_code": status_code,
+            "error": detail,
+        })
+
+
+def bulk_commit_response(request: Request, target_key: Optional[str] = None) -> NDJSONStreamingResponse:
+    """
+    Starts a bulk upload and returns its streaming NDJSON response. An unsupported
+    Content-Encoding is rejected (415) before anything is read.
+    """
+    decompressor = body_decompressor(request.headers.get("content-encoding", ""))
+    return NDJSONStreamingResponse(BulkCommit(request, decompressor, target_key).stream_results())
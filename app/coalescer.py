@@ -0,0 +1,115 @@
+# app/coalescer.py
+import time
+import asyncio
+import datetime
+from typing import Dict, Any, List, Set, Tuple, Callable, Awaitable
+
+from .models import WebhookPayload
+
+# (repo, branch, path) identifies one file on one branch
+CoalesceKey = Tuple[str, str, str]
+CommitFn = Callable[[WebhookPayload, List[WebhookPayload]], Awaitable[Dict[str, Any]]]
+
+
+def created_at_sort_key(payload: WebhookPayload) -> Tuple[int, Any]:
+    """
+    Orders payloads by `created_at`. ISO timestamps are compared as datetimes;
+    anything unparseable sorts before them and falls back to string order.
+    """
+    try:
+        parsed = datetime.datetime.fromisoformat(payload.created_at.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return (1, parsed)
+    except ValueError:
+        return (0, payload.created_at)
+
+
+class _PendingBatch:
+    def __init__(self):
+        self.payloads: List[WebhookPayload] = []
+        self.futures: List[asyncio.Future] = []
+        self.first_at = time.monotonic()
+        self.last_at = self.first_at
+
+
+class WriteCoalescer:
+    """
+    Debounces bursts of writes to the same file into a single commit.
+
+    Writes for a key are held until no new write has arrived for `window` seconds
+    (but never longer than `max_wait` after the first one). The newest manifest by
+    `created_at` is committed once, and every merged request receives that commit's
+    result together with the list of coalesced commit hashes.
+    """
+
+    def __init__(self, window: float, max_wait: float):
+        self.window = window
+        self.max_wait = max_wait
+        self._batches: Dict[CoalesceKey, _PendingBatch] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()  # Strong references until each flush finishes
+
+    async def submit(self, key: CoalesceKey, payload: WebhookPayload, commit_fn: CommitFn) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Adds a write to the pending batch for `key` and waits for the shared commit.
+        Returns the commit result and the commit hashes of every merged payload.
+        """
+        batch = self._batches.get(key)
+        is_new_batch = batch is None
+        if is_new_batch:
+            batch = _PendingBatch()
+            self._batches[key] = batch
+
+        future = asyncio.get_running_loop().create_future()
+        batch.payloads.append(payload)
+        batch.futures.append(future)
+        batch.last_at = time.monotonic()
+
+        if is_new_batch:
+            task = asyncio.create_task(self._flush_when_quiet(key, batch, commit_fn))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+        # Shield so a disconnecting caller does not cancel the result for the others
+        return await asyncio.shield(future)
+
+    async def _flush_when_quiet(self, key: CoalesceKey, batch: _PendingBatch, commit_fn: CommitFn) -> None:
+        while True:
+            deadline = min(batch.last_at + self.window, batch.first_at + self.max_wait)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+
+        # Writes arriving from now on start a new batch
+        if self._batches.get(key) is batch:
+            del self._batches[key]
+
+        # max() keeps the last-arrived payload on ties
+        newest = max(reversed(batch.payloads), key=created_at_sort_key)
+        commit_hashes = [p.commit_hash for p in batch.payloads]
+        try:
+            result = await commit_fn(newest, batch.payloads)
+        except asyncio.CancelledError:
+            for future in batch.futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future in batch.futures:
+            if not future.done():
+                future.set_result((result, commit_hashes))
+
+
+def build_coalesced_commit_message(newest: WebhookPayload, payloads: List[WebhookPayload]) -> str:
+    """
+    Commit message for a coalesced write; lists every merged commit hash.
+    """
+    message = f"feat: Update prompt manifest via webhook - commit {newest.commit_hash}"
+    if len(payloads) > 1:
+        coalesced = "\n".join(f"- {p.commit_hash}" for p in payloads)
+        message += f"\n\nCoalesced {len(payloads)} webhook events:\n{coalesced}"
+    return message
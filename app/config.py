@@ -1,4 +1,7 @@
 # app/config.py
+import os
+import time
+import tempfile
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
@@ -15,6 +18,86 @@ class AppConfig(BaseSettings):
     GITHUB_REPO_NAME: str  # No default, must be set in environment
     GITHUB_FILE_PATH: str = "prompt_manifest.json"  # Default path for the committed file
     GITHUB_BRANCH: str = "main"  # Default branch to commit to
+    GITHUB_API_BASE_URL: str = "https://api.github.com"  # Override for GitHub Enterprise or a local fake
+    GITHUB_MANIFEST_LAYOUT: str = "single"  # "single" JSON file, or "exploded" into one file per component
+    GITHUB_MANIFEST_DIR: Optional[str] = None  # Directory for the exploded layout; defaults to GITHUB_FILE_PATH without extension
+    GITHUB_TARGETS_FILE: Optional[str] = None  # JSON routing table of additional targets (repo, branch, path, token, limits); see README
+
+    # Shared GitHub HTTP client (one per worker process, opened in the app lifespan)
+    GITHUB_HTTP_MAX_CONNECTIONS: int = 20  # Upper bound on open connections to GitHub
+    GITHUB_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10  # Idle connections kept warm in the pool
+    GITHUB_HTTP_KEEPALIVE_EXPIRY: float = 60.0  # Seconds an idle connection is kept before closing
+    GITHUB_HTTP2: bool = False  # Multiplex requests over HTTP/2 (requires the `h2` package)
+    GITHUB_CONNECT_TIMEOUT: float = 5.0  # Seconds to establish a TCP/TLS connection
+    GITHUB_READ_TIMEOUT: float = 30.0  # Seconds to wait for a response chunk
+    GITHUB_WRITE_TIMEOUT: float = 30.0  # Seconds to wait while sending a request body
+    GITHUB_POOL_TIMEOUT: float = 10.0  # Seconds to wait for a free connection from the pool
+
+    # Worker warm-up (see app/startup.py and GET /ready)
+    WARMUP_ENABLED: bool = True  # Open each target's connection pool and prefetch its branch and file SHAs before /ready reports ready
+    WARMUP_TIMEOUT_SECONDS: float = 10.0  # /ready reports ready after this even if warm-up has not finished
+
+    # GitHub call scheduler (rate limits, retries, load shedding)
+    GITHUB_RATE_LIMIT_PER_SECOND: float = 10.0  # Token bucket refill rate per worker; 0 disables the bucket
+    GITHUB_RATE_LIMIT_BURST: int = 20  # Token bucket size
+    GITHUB_MAX_CONCURRENT_REQUESTS: int = 10  # Concurrent GitHub calls per worker
+    GITHUB_RATE_LIMIT_RESERVE: int = 50  # Below this many remaining requests, wait for the quota reset
+    GITHUB_MAX_QUEUE_WAIT_SECONDS: float = 10.0  # Calls that would wait longer than this are shed with a 503
+    GITHUB_MAX_RETRIES: int = 3  # Retries for rate-limited, 5xx (idempotent only) and network failures
+    GITHUB_RETRY_BASE_DELAY: float = 0.5  # Seconds; exponential backoff with full jitter
+    GITHUB_RETRY_MAX_DELAY: float = 8.0  # Upper bound for a single backoff
+
+    # Asynchronous job mode (202 Accepted + durable local queue)
+    JOB_QUEUE_ENABLED: bool = False  # Start the SQLite-backed queue and its background workers
+    WEBHOOK_DEFAULT_MODE: str = "sync"  # "sync" or "async"; used when a request does not pass ?mode=
+    JOB_QUEUE_DB_PATH: str = "jobs.sqlite3"  # Shared by all worker processes on the host
+    JOB_QUEUE_WORKERS: int = 4  # Background workers per process
+    JOB_MAX_ATTEMPTS: int = 5  # Attempts before a job is marked as failed
+    JOB_RETRY_BASE_DELAY: float = 2.0  # Seconds; doubled on every retry (with jitter)
+    JOB_LEASE_SECONDS: float = 300.0  # A running job is re-queued if its worker does not finish within this
+    JOB_POLL_INTERVAL: float = 1.0  # Seconds between queue polls when idle
+    JOB_RETENTION_SECONDS: float = 7 * 24 * 3600  # Finished jobs are deleted after this
+
+    # Coalescing of webhook bursts for the same file (direct commits only)
+    COALESCE_WINDOW_SECONDS: float = 0.0  # Quiet period before a batch is committed; 0 disables coalescing
+    COALESCE_MAX_WAIT_SECONDS: float = 10.0  # Upper bound on how long the first write in a batch is held
+
+    # Bulk NDJSON uploads (POST /webhook/github-commit/bulk)
+    BULK_MAX_RECORDS_PER_COMMIT: int = 500  # Records of one target file merged into one commit; each record may be up to MAX_WEBHOOK_BODY_BYTES
+
+    # Local blob-SHA cache for committed files
+    SHA_CACHE_TTL_SECONDS: float = 60.0  # Cached SHAs older than this are revalidated (If-None-Match) before skipping a no-op commit
+    SHA_CACHE_MAX_ENTRIES: int = 1024  # Least recently used (repo, branch, file) SHAs are evicted beyond this
+
+    # State shared by the worker processes on this host (write locks, file SHAs, idempotency)
+    SHARED_STATE_ENABLED: bool = True  # Without it, each worker only serializes its own writes and keeps its own caches
+    SHARED_STATE_DIR: str = os.path.join(tempfile.gettempdir(), "webhook-shared-state")  # SQLite database and lock files; must be local to the host
+    SHARED_LOCK_TIMEOUT_SECONDS: float = 30.0  # Waiting longer than this for another write to the same file answers 503
+    SHARED_IDEMPOTENCY_LEASE_SECONDS: float = 120.0  # Duplicates on other workers wait this long for the first request before running it themselves
+    GITHUB_CONFLICT_RETRIES: int = 3  # Retries of a contents PUT or ref update after a 409/422 conflict, with a refreshed SHA
+
+    # Pull Request flow
+    PR_PIPELINE: str = "git_data"  # "git_data" builds branch + commit in one go; "contents" is the original create-branch/GET/PUT flow
+    BASE_SHA_CACHE_TTL_SECONDS: float = 10.0  # Reuse the base branch SHA for PRs this long before revalidating (ETag)
+    PR_BRANCH_MODE: str = "per_event"  # "per_event" opens a new branch and PR for every webhook; "rolling" keeps one branch and PR per base branch and updates them
+    PR_ROLLING_BRANCH_PREFIX: str = "feature/prompt-manifest"  # Rolling mode commits to "{prefix}-{base branch}"
+
+    # Request bodies and manifest serialization
+    MAX_WEBHOOK_BODY_BYTES: int = 25 * 1024 * 1024  # Larger bodies (before or after gzip decompression) are rejected with a 413
+    MANIFEST_SORT_KEYS: bool = False  # Commit manifests with sorted keys, so reordered but equal manifests are no-ops
+    PR_BODY_MAX_MANIFEST_CHARS: int = 60000  # Manifest excerpt in the PR description (GitHub caps PR bodies at 65536 characters)
+
+    # Idempotency of retried webhooks (keyed by Idempotency-Key header or commit_hash)
+    IDEMPOTENCY_ENABLED: bool = True  # Deduplicate retried webhooks (across workers with SHARED_STATE_ENABLED)
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000  # Least recently used responses are evicted beyond this
+    IDEMPOTENCY_TTL_SECONDS: float = 3600.0  # How long a completed response is replayed
+
+    # Structured logging (JSON lines on stdout, written by a background thread)
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10000  # Records waiting for the writer thread; more are dropped rather than blocking
+    LOG_MAX_MESSAGE_CHARS: int = 2000  # Longer messages and fields (e.g. GitHub error bodies) are truncated
+    LOG_SAMPLE_WINDOW_SECONDS: float = 60.0  # Repeated warnings/errors from one call site are sampled per window
+    LOG_SAMPLE_BURST: int = 10  # Records per call site and window before the rest are suppressed; 0 disables sampling
 
     # Pydantic-settings configuration
     model_config = SettingsConfigDict(
@@ -27,4 +110,7 @@ class AppConfig(BaseSettings):
 # This instance will be populated when this module is first imported.
 # If required environment variables (like GITHUB_TOKEN) are missing,
 # Pydantic will raise a ValidationError.
+_config_started = time.perf_counter()
 settings = AppConfig()
+# Time spent reading the environment and .env, reported with the startup timings (app/startup.py)
+CONFIG_LOAD_SECONDS = time.perf_counter() - _config_started
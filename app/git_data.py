@@ -0,0 +1,378 @@
+# app/git_data.py
+import logging
+import time
+import base64
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from .models import WebhookPayload
+from .config import settings
+from .github_client import get_github_client
+from .targets import current_target
+from .shared_state import write_lock
+from .sha_cache import file_sha_cache, git_blob_sha
+from .manifest_layout import explode_manifest, exploded_manifest_dir
+
+logger = logging.getLogger(__name__)
+
+# Helpers for GitHub's Git Data API (refs, commits, trees, blobs). Unlike the
+# contents API they let one commit touch many files and upload only new blobs.
+
+# (repo, branch) -> (ETag, head commit SHA, time.monotonic() of the lookup), for If-None-Match and short TTLs.
+# Least recently used first: every per-event PR branch passes through it, so it is bounded.
+_ref_cache: "OrderedDict[Tuple[str, str], Tuple[Optional[str], str, float]]" = OrderedDict()
+_REF_CACHE_SIZE = 256
+# commit SHA -> tree SHA. Commits are immutable, so entries never go stale.
+_commit_tree_cache: Dict[str, str] = {}
+_COMMIT_TREE_CACHE_SIZE = 256
+# (repo, branch, manifest directory) -> (head commit SHA, {path: blob SHA}) of an exploded manifest.
+# Targets can share a branch with different directories, so the directory is part of the key.
+_manifest_listing_cache: Dict[Tuple[str, str, str], Tuple[str, Dict[str, str]]] = {}
+
+
+def _branch_key(branch: str) -> Tuple[str, str]:
+    # Branch caches are per repository, i.e. per target
+    return (current_target().full_name, branch)
+
+
+def _listing_key(branch: str, manifest_dir: str) -> Tuple[str, str, str]:
+    return (current_target().full_name, branch, manifest_dir)
+
+
+def _raise_github_error(step: str, e: Exception) -> None:
+    """
+    Converts an httpx error raised during `step` into an HTTPException, in the same
+    format as the helpers in app/helpers.py.
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        error_detail = f"GitHub API error ({step}): {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    error_detail = f"Network error connecting to GitHub ({step}): {str(e)}"
+    logger.error(error_detail)
+    raise HTTPException(status_code=503, detail=error_detail)
+
+
+def _remember_ref(branch: str, etag: Optional[str], commit_sha: str) -> None:
+    key = _branch_key(branch)
+    _ref_cache[key] = (etag, commit_sha, time.monotonic())
+    _ref_cache.move_to_end(key)
+    while len(_ref_cache) > _REF_CACHE_SIZE:
+        _ref_cache.popitem(last=False)
+
+
+def _remember_commit_tree(commit_sha: str, tree_sha: str) -> None:
+    if len(_commit_tree_cache) >= _COMMIT_TREE_CACHE_SIZE:
+        _commit_tree_cache.clear()
+    _commit_tree_cache[commit_sha] = tree_sha
+
+
+async def get_branch_head_sha(client: httpx.AsyncClient, branch: str, max_age: float = 0.0) -> str:
+    """
+    Returns the commit SHA a branch points to. A lookup younger than `max_age` seconds
+    is reused without a request; otherwise the previous ETag is sent as If-None-Match,
+    so an unmoved branch costs a 304 that does not count against the rate limit.
+    """
+    step = f"getting head of branch '{branch}'"
+    key = _branch_key(branch)
+    cached = _ref_cache.get(key)
+    if cached is not None and time.monotonic() - cached[2] < max_age:
+        _ref_cache.move_to_end(key)
+        return cached[1]
+    conditional_headers = {"If-None-Match": cached[0]} if cached is not None and cached[0] else None
+    try:
+        response = await client.get(f"{current_target().api_path}/git/ref/heads/{branch}", headers=conditional_headers)
+        if response.status_code == 304 and cached is not None:
+            _remember_ref(branch, cached[0], cached[1])
+            return cached[1]
+        response.raise_for_status()
+        head_sha = response.json()["object"]["sha"]
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        _raise_github_error(step, e)
+    except (KeyError, TypeError) as e:
+        error_detail = f"Unexpected response structure from GitHub when {step}: {str(e)}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=500, detail=error_detail)
+    _remember_ref(branch, response.headers.get("etag"), head_sha)
+    return head_sha
+
+
+async def get_commit_tree_sha(client: httpx.AsyncClient, commit_sha: str) -> str:
+    """
+    Returns the root tree SHA of a commit.
+    """
+    if commit_sha in _commit_tree_cache:
+        return _commit_tree_cache[commit_sha]
+    try:
+        response = await client.get(f"{current_target().api_path}/git/commits/{commit_sha}")
+        response.raise_for_status()
+        tree_sha = response.json()["tree"]["sha"]
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        _raise_github_error(f"getting commit '{commit_sha}'", e)
+    _remember_commit_tree(commit_sha, tree_sha)
+    return tree_sha
+
+
+async def list_blob_shas(client: httpx.AsyncClient, commit_sha: str, directory: str) -> Dict[str, str]:
+    """
+    Returns {path: blob SHA} for every file under `directory` at `commit_sha`
+    (empty if the directory does not exist yet).
+    """
+    try:
+        response = await client.get(
+            f"{current_target().api_path}/git/trees/{commit_sha}:{directory}", params={"recursive": "1"}
+        )
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        listing = response.json()
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        _raise_github_error(f"listing '{directory}'", e)
+    if listing.get("truncated"):
+        logger.warning(f"Tree listing for '{directory}' was truncated; unchanged files may be re-uploaded.")
+    return {
+        f"{directory}/{entry['path']}": entry["sha"]
+        for entry in listing.get("tree", [])
+        if entry.get("type") == "blob"
+    }
+
+
+async def create_blob(client: httpx.AsyncClient, content: bytes) -> str:
+    """
+    Uploads file contents as a blob and returns its SHA.
+    """
+    blob_payload = {"content": base64.b64encode(content).decode("utf-8"), "encoding": "base64"}
+    try:
+        response = await client.post(f"{current_target().api_path}/git/blobs", json=blob_payload)
+        response.raise_for_status()
+        return response.json()["sha"]
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        _raise_github_error("creating blob", e)
+
+
+async def create_tree(client: httpx.AsyncClient, base_tree_sha: str, entries: List[Dict[str, Any]]) -> str:
+    """
+    Creates a tree from `base_tree_sha` with `entries` added, replaced or (sha=None) removed.
+    """
+    try:
+        response = await client.post(
+            f"{current_target().api_path}/git/trees", json={"base_tree": base_tree_sha, "tree": entries}
+        )
+        response.raise_for_status()
+        return response.json()["sha"]
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        _raise_github_error("creating tree", e)
+
+
+async def create_commit(client: httpx.AsyncClient, message: str, tree_sha: str, parent_shas: List[str]) -> Dict[str, Any]:
+    """
+    Creates a commit object (not yet referenced by any branch).
+    """
+    try:
+        response = await client.post(
+            f"{current_target().api_path}/git/commits",
+            json={"message": message, "tree": tree_sha, "parents": parent_shas},
+        )
+        response.raise_for_status()
+        commit = response.json()
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        _raise_github_error("creating commit", e)
+    _remember_commit_tree(commit["sha"], tree_sha)
+    return commit
+
+
+async def update_branch_ref(client: httpx.AsyncClient, branch: str, commit_sha: str, force: bool = False) -> bool:
+    """
+    Fast-forwards a branch to `commit_sha`. Returns False if the branch has moved in
+    the meantime (GitHub rejects a non-fast-forward update with 422). With `force`,
+    the branch is reset to `commit_sha` whatever it pointed to.
+    """
+    try:
+        response = await client.patch(
+            f"{current_target().api_path}/git/refs/heads/{branch}", json={"sha": commit_sha, "force": force}
+        )
+        if response.status_code == 422:
+            _ref_cache.pop(_branch_key(branch), None)
+            return False
+        response.raise_for_status()
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        _raise_github_error(f"updating branch '{branch}'", e)
+    # The ETag of the old ref response no longer applies
+    _remember_ref(branch, None, commit_sha)
+    return True
+
+
+async def create_branch_ref(client: httpx.AsyncClient, branch: str, commit_sha: str) -> bool:
+    """
+    Creates a branch pointing at `commit_sha`. Returns False if the branch already exists.
+    """
+    try:
+        response = await client.post(
+            f"{current_target().api_path}/git/refs", json={"ref": f"refs/heads/{branch}", "sha": commit_sha}
+        )
+        if response.status_code == 422 and "Reference already exists" in response.text:
+            return False
+        response.raise_for_status()
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        _raise_github_error(f"creating branch '{branch}'", e)
+    _remember_ref(branch, None, commit_sha)
+    return True
+
+
+# --- Exploded (multi-file) manifest layout ---
+
+def exploded_manifest_files(payload: WebhookPayload) -> Dict[str, bytes]:
+    """
+    Returns {repository path: content} for the exploded layout of the payload's manifest.
+    """
+    manifest_dir = exploded_manifest_dir()
+    return {
+        f"{manifest_dir}/{relative_path}": content
+        for relative_path, content in explode_manifest(payload.manifest).items()
+    }
+
+
+async def diff_exploded_manifest(client: httpx.AsyncClient, branch: str, head_sha: str, manifest_dir: str, new_blob_shas: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """
+    Compares the new files with the manifest directory at `head_sha` and returns
+    (changed or added paths, removed paths). The listing is cached per branch head and directory.
+    """
+    key = _listing_key(branch, manifest_dir)
+    cached_listing = _manifest_listing_cache.get(key)
+    if cached_listing is not None and cached_listing[0] == head_sha:
+        current_blob_shas = cached_listing[1]
+    else:
+        current_blob_shas = await list_blob_shas(client, head_sha, manifest_dir)
+        _manifest_listing_cache[key] = (head_sha, current_blob_shas)
+
+    changed = [path for path, sha in new_blob_shas.items() if current_blob_shas.get(path) != sha]
+    removed = [path for path in current_blob_shas if path not in new_blob_shas]
+    return changed, removed
+
+async def commit_manifest_exploded(payload: WebhookPayload, commit_message: Optional[str] = None, branch: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Commits the manifest to the current target's branch (or `branch`) as one file per
+    top-level component (see app/manifest_layout.py) in a single atomic commit.
+
+    Only files whose blob SHA differs from the branch head are uploaded, so request size
+    and repository growth scale with the change rather than with the manifest.
+    """
+    client = get_github_client()
+    target = current_target()
+    branch = branch or target.branch
+    manifest_dir = exploded_manifest_dir()
+    files = exploded_manifest_files(payload)
+    new_blob_shas = {path: git_blob_sha(content) for path, content in files.items()}
+    if commit_message is None:
+        commit_message = f"feat: Update prompt manifest via webhook - commit {payload.commit_hash}"
+
+    # One exploded commit per manifest directory at a time across all workers; another
+    # writer moving the branch between our read and the ref update is retried on the new head
+    async with write_lock(target.full_name, branch, manifest_dir):
+        for _ in range(settings.GITHUB_CONFLICT_RETRIES + 1):
+            head_sha = await get_branch_head_sha(client, branch)
+            changed, removed = await diff_exploded_manifest(client, branch, head_sha, manifest_dir, new_blob_shas)
+            if not changed and not removed:
+                logger.info(f"Exploded manifest in '{manifest_dir}' on '{branch}' is unchanged. Skipping commit.")
+                return {"status": "unchanged", "content": {"path": manifest_dir, "files_changed": [], "files_removed": []}, "commit": {}}
+
+            base_tree_sha = await get_commit_tree_sha(client, head_sha)
+            await asyncio.gather(*(create_blob(client, files[path]) for path in changed))
+            tree_entries = [
+                {"path": path, "mode": "100644", "type": "blob", "sha": new_blob_shas[path]} for path in changed
+            ] + [
+                {"path": path, "mode": "100644", "type": "blob", "sha": None} for path in removed
+            ]
+            tree_sha = await create_tree(client, base_tree_sha, tree_entries)
+            commit = await create_commit(client, commit_message, tree_sha, [head_sha])
+
+            if await update_branch_ref(client, branch, commit["sha"]):
+                _manifest_listing_cache[_listing_key(branch, manifest_dir)] = (commit["sha"], new_blob_shas)
+                return {
+                    "commit": commit,
+                    "content": {"path": manifest_dir, "files_changed": changed, "files_removed": removed},
+                }
+            logger.info(f"Branch '{branch}' moved during exploded commit. Retrying on the new head.")
+
+        error_detail = f"GitHub API conflict: branch '{branch}' kept moving while committing the exploded manifest."
+        logger.error(error_detail)
+        raise HTTPException(status_code=409, detail=error_detail)
+
+
+# --- Low-latency Pull Request pipeline ---
+
+async def commit_manifest_to_new_branch(client: httpx.AsyncClient, new_branch_name: str, payload: WebhookPayload, manifest_json_string: str, commit_message: str, reuse_branch: bool = False) -> Dict[str, Any]:
+    """
+    Builds the PR commit on top of the current target's branch with the Git Data API and
+    creates `new_branch_name` pointing at it, so the branch and its commit appear together.
+
+    Compared with create-branch + contents GET + contents PUT this skips the file SHA
+    lookup entirely, and the base branch SHA is reused for settings.BASE_SHA_CACHE_TTL_SECONDS.
+    File contents are sent inline in the tree, so no separate blob upload is needed.
+
+    With `reuse_branch` (the rolling PR branch, which later webhooks commit to) an existing
+    branch is force-reset to the new commit instead of stacked on, with a warning naming the
+    head it discards, and the file SHA caches are primed for the next commit to the branch.
+
+    Returns `{"commit": ...}`, or `{"status": "unchanged", ...}` if the base branch
+    already holds this manifest (no branch is created in that case).
+    """
+    target = current_target()
+    base_branch = target.branch
+    base_sha = await get_branch_head_sha(client, base_branch, max_age=settings.BASE_SHA_CACHE_TTL_SECONDS)
+
+    if target.manifest_layout == "exploded":
+        manifest_dir = exploded_manifest_dir()
+        files = exploded_manifest_files(payload)
+        new_blob_shas = {path: git_blob_sha(content) for path, content in files.items()}
+        changed, removed = await diff_exploded_manifest(client, base_branch, base_sha, manifest_dir, new_blob_shas)
+        tree_entries = [
+            {"path": path, "mode": "100644", "type": "blob", "content": files[path].decode("utf-8")} for path in changed
+        ] + [
+            {"path": path, "mode": "100644", "type": "blob", "sha": None} for path in removed
+        ]
+    else:
+        new_blob_sha = git_blob_sha(manifest_json_string.encode("utf-8"))
+        cached = file_sha_cache.get(target.full_name, base_branch, target.file_path)
+        is_unchanged = cached is not None and cached.blob_sha == new_blob_sha and file_sha_cache.is_fresh(cached)
+        tree_entries = [] if is_unchanged else [
+            {"path": target.file_path, "mode": "100644", "type": "blob", "content": manifest_json_string}
+        ]
+
+    if not tree_entries:
+        logger.info(f"Manifest is unchanged on '{base_branch}'. Skipping branch and PR creation.")
+        return {"status": "unchanged", "commit": {}}
+
+    base_tree_sha = await get_commit_tree_sha(client, base_sha)
+    tree_sha = await create_tree(client, base_tree_sha, tree_entries)
+    commit = await create_commit(client, commit_message, tree_sha, [base_sha])
+    if reuse_branch:
+        if not await create_branch_ref(client, new_branch_name, commit["sha"]):
+            # Left over from a merged or closed PR: start again from the base branch. Commits
+            # that only the old branch had are no longer reachable from it, so log its head.
+            old_head_sha = await get_branch_head_sha(client, new_branch_name)
+            logger.warning(
+                f"Branch '{new_branch_name}' already exists. Force-resetting it to the new commit "
+                f"{commit['sha']} on '{base_branch}', discarding its old head {old_head_sha}."
+            )
+            await update_branch_ref(client, new_branch_name, commit["sha"], force=True)
+        if target.manifest_layout == "exploded":
+            _manifest_listing_cache[_listing_key(new_branch_name, manifest_dir)] = (commit["sha"], new_blob_shas)
+        else:
+            file_sha_cache.update(target.full_name, new_branch_name, target.file_path, new_blob_sha)
+    elif not await create_branch_ref(client, new_branch_name, commit["sha"]):
+        # Same branch name as an earlier webhook: stack the commit on top of it instead,
+        # like the contents flow does when the branch already exists
+        logger.info(f"Branch '{new_branch_name}' already exists. Adding the commit on top of it.")
+        if not await update_branch_ref(client, new_branch_name, commit["sha"]):
+            branch_head_sha = await get_branch_head_sha(client, new_branch_name)
+            commit = await create_commit(client, commit_message, tree_sha, [branch_head_sha])
+            if not await update_branch_ref(client, new_branch_name, commit["sha"]):
+                error_detail = f"GitHub API conflict: branch '{new_branch_name}' kept moving while adding the PR commit."
+                logger.error(error_detail)
+                raise HTTPException(status_code=409, detail=error_detail)
+    return {"commit": commit}
@@ -0,0 +1,114 @@
+# app/github_client.py
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+from .config import settings
+from .github_scheduler import SchedulingTransport, get_scheduler
+from .targets import GitHubTarget, current_target, resolve_target
+
+logger = logging.getLogger(__name__)
+
+
+def github_headers(token: str) -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github.v3+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+
+# The long-lived clients of this worker process, one per target (see app/targets.py).
+# Opened by the FastAPI lifespan handler in app/main.py (the default target's client)
+# or on a target's first webhook, and all closed on shutdown.
+_clients: Dict[str, httpx.AsyncClient] = {}
+_started = False
+# Replaces the network for every client, e.g. the fake GitHub in benchmarks/
+_transport_override: Optional[httpx.AsyncBaseTransport] = None
+
+
+def build_github_client(target: GitHubTarget, transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    Builds the pooled AsyncClient used for all GitHub API calls to `target`, with the
+    target's token, connection limit and scheduler. Timeouts and HTTP/2 are taken from
+    settings. A custom `transport` (e.g. the fake GitHub in benchmarks/) replaces the network.
+    """
+    limits = httpx.Limits(
+        max_connections=target.max_connections,
+        max_keepalive_connections=min(settings.GITHUB_HTTP_MAX_KEEPALIVE_CONNECTIONS, target.max_connections),
+        keepalive_expiry=settings.GITHUB_HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.GITHUB_CONNECT_TIMEOUT,
+        read=settings.GITHUB_READ_TIMEOUT,
+        write=settings.GITHUB_WRITE_TIMEOUT,
+        pool=settings.GITHUB_POOL_TIMEOUT,
+    )
+    if transport is None:
+        transport = _build_http_transport(limits)
+    # Every call goes through the target's scheduler: rate limits, concurrency cap, retries, load shedding
+    scheduled_transport = SchedulingTransport(
+        transport,
+        get_scheduler(target),
+        max_retries=settings.GITHUB_MAX_RETRIES,
+        base_delay=settings.GITHUB_RETRY_BASE_DELAY,
+        max_delay=settings.GITHUB_RETRY_MAX_DELAY,
+    )
+    return httpx.AsyncClient(
+        transport=scheduled_transport,
+        base_url=settings.GITHUB_API_BASE_URL,
+        headers=github_headers(target.token),
+        timeout=timeout,
+    )
+
+
+def _build_http_transport(limits: httpx.Limits) -> httpx.AsyncHTTPTransport:
+    if settings.GITHUB_HTTP2:
+        try:
+            return httpx.AsyncHTTPTransport(http2=True, limits=limits)
+        except ImportError:
+            # httpx needs the optional `h2` package for HTTP/2 (pip install httpx[http2])
+            logger.warning("GITHUB_HTTP2 is enabled but 'h2' is not installed. Falling back to HTTP/1.1.")
+    return httpx.AsyncHTTPTransport(limits=limits)
+
+
+async def start_github_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    Opens the default target's GitHub client for this worker; the clients of other
+    targets are opened on first use. Safe to call more than once.
+    """
+    global _started, _transport_override
+    _started = True
+    _transport_override = transport
+    return _client_for(resolve_target(None))
+
+
+async def close_github_client() -> None:
+    """
+    Closes every target's GitHub client and releases their pooled connections.
+    """
+    global _started, _transport_override
+    _started = False
+    _transport_override = None
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def _client_for(target: GitHubTarget) -> httpx.AsyncClient:
+    client = _clients.get(target.key)
+    if client is None or client.is_closed:
+        client = _clients[target.key] = build_github_client(target, _transport_override)
+    return client
+
+
+def get_github_client() -> httpx.AsyncClient:
+    """
+    Returns the GitHub client of the current target (see app/targets.py).
+    Raises if the app lifespan has not started the clients.
+    """
+    if not _started:
+        raise RuntimeError("GitHub client is not initialised. Is the application lifespan running?")
+    return _client_for(current_target())
@@ -0,0 +1,299 @@
+# app/github_scheduler.py
+import logging
+import time
+import random
+import asyncio
+import email.utils
+from typing import Dict, Any, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from .config import settings
+from .metrics import (
+    GITHUB_QUEUE_WAIT,
+    GITHUB_RATE_LIMIT_REMAINING,
+    GITHUB_REQUESTS_IN_FLIGHT,
+    GITHUB_REQUESTS_WAITING,
+    github_step,
+    observe_connection_pool,
+    observe_github_call,
+)
+from .logging_config import record_step_timing
+from .targets import GitHubTarget
+
+logger = logging.getLogger(__name__)
+
+# Methods that are safe to send again after a 5xx or a network error
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+RETRYABLE_SERVER_ERRORS = {500, 502, 503, 504}
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header (seconds or HTTP date) into seconds from now.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class GitHubScheduler:
+    """
+    Admission control for every GitHub API call this worker process makes to one target.
+
+    - A token bucket spreads requests out (secondary rate limits punish bursts).
+    - A semaphore caps concurrent requests.
+    - The primary quota is tracked from X-RateLimit-* headers; when it is nearly used
+      up, calls wait for the reset window.
+    - Retry-After (429 or secondary-limit 403) pauses all calls for that long.
+    - If a call would have to wait longer than `max_wait`, it is shed immediately
+      with a 503 and a Retry-After header instead of piling up.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int, max_concurrency: int, max_wait: float, quota_reserve: int, name: str = "default"):
+        self.name = name  # Target key, for metric labels and logs
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.quota_reserve = quota_reserve
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._semaphore: Optional[asyncio.Semaphore] = None  # Created lazily inside the event loop
+        self._paused_until = 0.0  # time.monotonic() until which Retry-After holds all calls
+
+        # Primary rate limit, as last reported by GitHub
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # Epoch seconds
+        self.resource: Optional[str] = None
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.totals = {"requests": 0, "retries": 0, "throttled": 0, "shed": 0, "network_errors": 0}
+
+    def _shed(self, reason: str, retry_after: float) -> None:
+        self.totals["shed"] += 1
+        retry_after = max(1, int(retry_after + 0.999))
+        error_detail = f"GitHub request budget for target '{self.name}' exhausted ({reason}). Retry in {retry_after}s."
+        logger.warning(error_detail)
+        raise HTTPException(status_code=503, detail=error_detail, headers={"Retry-After": str(retry_after)})
+
+    def _admission_delay(self) -> float:
+        """
+        Seconds this call must wait for the pause, quota reset and token bucket. Sheds
+        the call (503) if that is longer than `max_wait`. Takes a token when it returns.
+        """
+        now = time.monotonic()
+        delay = max(0.0, self._paused_until - now)
+        if delay > self.max_wait:
+            self._shed("GitHub asked us to back off", delay)
+
+        if self.remaining is not None and self.reset_at is not None and self.remaining <= self.quota_reserve:
+            until_reset = self.reset_at - time.time()
+            if until_reset > 0:
+                if until_reset > self.max_wait:
+                    self._shed(f"{self.remaining} of {self.limit} requests left until reset", until_reset)
+                delay = max(delay, until_reset)
+
+        if self.rate_per_second > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_per_second)
+            self._last_refill = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                token_delay = -self._tokens / self.rate_per_second
+                if max(delay, token_delay) > self.max_wait:
+                    self._tokens += 1
+                    self._shed("request rate too high", token_delay)
+                delay = max(delay, token_delay)
+        return delay
+
+    async def acquire(self) -> None:
+        """
+        Waits until a call may be sent and takes a concurrency slot. Call `release()` afterwards.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        delay = self._admission_delay()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        GITHUB_REQUESTS_WAITING.labels(self.name).set(self.waiting)
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            GITHUB_REQUESTS_WAITING.labels(self.name).set(self.waiting)
+        GITHUB_QUEUE_WAIT.observe(time.perf_counter() - queued_at)
+        self.in_flight += 1
+        GITHUB_REQUESTS_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        self.totals["requests"] += 1
+        if self.remaining is not None:
+            # Count our own call until GitHub reports a fresh number
+            self.remaining -= 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        GITHUB_REQUESTS_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        self._semaphore.release()
+
+    def observe(self, response: httpx.Response) -> Optional[float]:
+        """
+        Updates the quota from a response's headers. Returns the Retry-After delay if
+        GitHub asked us to back off, else None.
+        """
+        headers = response.headers
+        try:
+            if "x-ratelimit-remaining" in headers:
+                self.remaining = int(headers["x-ratelimit-remaining"])
+            if "x-ratelimit-limit" in headers:
+                self.limit = int(headers["x-ratelimit-limit"])
+            if "x-ratelimit-reset" in headers:
+                self.reset_at = float(headers["x-ratelimit-reset"])
+        except ValueError:
+            pass
+        self.resource = headers.get("x-ratelimit-resource", self.resource)
+        if self.remaining is not None:
+            GITHUB_RATE_LIMIT_REMAINING.labels(self.name).set(self.remaining)
+
+        if not self.is_rate_limited(response):
+            return None
+        self.totals["throttled"] += 1
+        retry_after = _parse_retry_after(headers.get("retry-after"))
+        if retry_after is None and self.remaining == 0 and self.reset_at is not None:
+            retry_after = max(0.0, self.reset_at - time.time())
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        return retry_after
+
+    @staticmethod
+    def is_rate_limited(response: httpx.Response) -> bool:
+        """
+        True for 429, and for 403s that are primary or secondary rate limits (not permission errors).
+        """
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        if "retry-after" in response.headers or response.headers.get("x-ratelimit-remaining") == "0":
+            return True
+        return "rate limit" in response.text.lower()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current scheduler state, for the /github/scheduler endpoint.
+        """
+        now = time.monotonic()
+        return {
+            "rate_limit": {
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+                "resource": self.resource,
+            },
+            "paused_for_seconds": round(max(0.0, self._paused_until - now), 3),
+            "token_bucket": {
+                "rate_per_second": self.rate_per_second,
+                "burst": self.burst,
+                "tokens": round(min(self.burst, self._tokens + (now - self._last_refill) * self.rate_per_second), 3),
+            },
+            "concurrency": {"max": self.max_concurrency, "in_flight": self.in_flight, "waiting": self.waiting},
+            "max_wait_seconds": self.max_wait,
+            "totals": dict(self.totals),
+        }
+
+
+class SchedulingTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that sends every GitHub request through a GitHubScheduler and
+    retries rate-limited, 5xx and network failures with jittered exponential backoff
+    (honouring Retry-After). 5xx and network errors are only retried for idempotent methods;
+    a rate-limited request was not processed by GitHub, so it is retried for any method.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, scheduler: GitHubScheduler, max_retries: int, base_delay: float, max_delay: float):
+        self._transport = transport
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform between 0 and the exponential cap
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()  # Buffer the body so it can be sent again
+        idempotent = request.method in IDEMPOTENT_METHODS
+        step = github_step(request.method, request.url.path)
+        attempt = 0
+        while True:
+            await self.scheduler.acquire()
+            sent_at = time.perf_counter()
+            try:
+                response = await self._transport.handle_async_request(request)
+                await response.aread()
+            except httpx.TransportError:
+                elapsed = time.perf_counter() - sent_at
+                observe_github_call(step, "network_error", elapsed)
+                record_step_timing(step, elapsed)
+                self.scheduler.totals["network_errors"] += 1
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.info(f"Network error on GitHub {request.method} {request.url.path}. Retrying in {delay:.2f}s.")
+            else:
+                elapsed = time.perf_counter() - sent_at
+                observe_github_call(step, str(response.status_code), elapsed)
+                record_step_timing(step, elapsed)
+                retry_after = self.scheduler.observe(response)
+                rate_limited = self.scheduler.is_rate_limited(response)
+                server_error = response.status_code in RETRYABLE_SERVER_ERRORS
+                if not (rate_limited or (server_error and idempotent)) or attempt >= self.max_retries:
+                    return response
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                if delay > self.scheduler.max_wait:
+                    # Not worth holding the webhook; let the caller report GitHub's answer
+                    return response
+                await response.aclose()
+                logger.info(f"GitHub {request.method} {request.url.path} returned {response.status_code}. Retrying in {delay:.2f}s.")
+            finally:
+                self.scheduler.release()
+                observe_connection_pool(self.scheduler.name, self._transport)
+
+            self.scheduler.totals["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+# One scheduler per target and worker process, shared by every GitHub call to that
+# target, so a busy target cannot use up another one's budget or concurrency
+github_schedulers: Dict[str, GitHubScheduler] = {}
+
+
+def get_scheduler(target: GitHubTarget) -> GitHubScheduler:
+    scheduler = github_schedulers.get(target.key)
+    if scheduler is None:
+        scheduler = github_schedulers[target.key] = GitHubScheduler(
+            rate_per_second=target.rate_limit_per_second,
+            burst=target.rate_limit_burst,
+            max_concurrency=target.max_concurrent_requests,
+            max_wait=settings.GITHUB_MAX_QUEUE_WAIT_SECONDS,
+            quota_reserve=settings.GITHUB_RATE_LIMIT_RESERVE,
+            name=target.key,
+        )
+    return scheduler
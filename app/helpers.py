@@ -1,8 +1,10 @@
 # app/helpers.py
-import json
+import time
 import base64
+import logging
+import sqlite3
 import datetime # Added for timestamp in branch name
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 import httpx
 from fastapi import HTTPException
@@ -11,124 +13,293 @@ from fastapi import HTTPException
 # If 'helpers.py' is inside 'app/', then these imports are correct:
 from .models import WebhookPayload
 from .config import settings
+from .github_client import get_github_client
+from .targets import GitHubTarget, current_target
+from .shared_state import SharedState, get_shared_state, write_lock
+from .sha_cache import file_sha_cache, git_blob_sha
+from .git_data import commit_manifest_exploded
+
+logger = logging.getLogger(__name__)
+
+# --- File SHA lookup (shared by direct and PR commits) ---
+
+def _unchanged_result(file_path: str, blob_sha: str) -> Dict[str, Any]:
+    """
+    Result returned instead of a GitHub response when the file already has this content.
+    """
+    return {"status": "unchanged", "content": {"path": file_path, "sha": blob_sha}, "commit": {}}
+
+
+async def _fetch_file_sha(client: httpx.AsyncClient, file_url: str, branch: str, file_path: str) -> Optional[str]:
+    """
+    GETs the current blob SHA of a file (None if it does not exist) and refreshes the cache.
+    A cached ETag is sent as If-None-Match, so an unchanged file costs a cheap 304.
+    Raises httpx errors for the caller to report.
+    """
+    repo = current_target().full_name
+    entry = file_sha_cache.get(repo, branch, file_path)
+    conditional_headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+    response = await client.get(file_url, params={"ref": branch}, headers=conditional_headers)
+    if response.status_code == 304 and entry is not None:
+        file_sha_cache.mark_validated(repo, branch, file_path)
+        return entry.blob_sha
+    if response.status_code == 404:
+        file_sha_cache.invalidate(repo, branch, file_path)
+        return None
+    response.raise_for_status()
+    current_file_sha = response.json().get("sha")
+    file_sha_cache.update(repo, branch, file_path, current_file_sha, response.headers.get("etag"))
+    return current_file_sha
+
+
+async def _resolve_file_sha(client: httpx.AsyncClient, file_url: str, branch: str, file_path: str, new_blob_sha: str) -> Tuple[Optional[str], bool]:
+    """
+    Works out the `sha` to send with a contents PUT, skipping the GET when the cache is warm.
+
+    Returns (current_sha, unchanged). `unchanged` is True when the file already holds
+    exactly the new content, so no commit is needed.
+    """
+    repo = current_target().full_name
+    entry = file_sha_cache.get(repo, branch, file_path)
+    if entry is not None:
+        if entry.blob_sha != new_blob_sha:
+            # The PUT itself validates the cached SHA; a 409 means it was stale
+            return entry.blob_sha, False
+        if file_sha_cache.is_fresh(entry):
+            return entry.blob_sha, True
+        # Looks like a no-op, but the entry is old: confirm with a conditional GET first
+    current_file_sha = await _fetch_file_sha(client, file_url, branch, file_path)
+    return current_file_sha, current_file_sha == new_blob_sha
+
+
+async def prefetch_file_sha(client: httpx.AsyncClient) -> Optional[str]:
+    """
+    Loads the blob SHA of the current target's file into the SHA cache, so the first
+    direct commit skips the GET (used by the startup warm-up, see app/startup.py).
+    Raises httpx errors for the caller to report.
+    """
+    target = current_target()
+    file_url = f"{target.api_path}/contents/{target.file_path}"
+    return await _fetch_file_sha(client, file_url, target.branch, target.file_path)
+
+
+def _is_sha_conflict(response: httpx.Response, sent_sha: Optional[str]) -> bool:
+    """
+    True if a contents PUT failed because the file changed under us: 409 for a stale
+    `sha`, or 422 "sha wasn't supplied" when the file was created in the meantime.
+    """
+    if response.status_code == 409:
+        return True
+    if response.status_code != 422 or sent_sha is not None:
+        return False
+    # The quotes of '"sha" wasn't supplied' are escaped in the raw body, so match the parsed message
+    try:
+        message = response.json().get("message") or ""
+    except (ValueError, AttributeError):
+        return False
+    return "sha" in message
+
+
+async def _put_file_contents(client: httpx.AsyncClient, file_url: str, branch: str, file_path: str, data_to_commit: Dict[str, Any], new_blob_sha: str, current_file_sha: Optional[str]) -> Dict[str, Any]:
+    """
+    PUTs file contents. On a SHA conflict the SHA is refreshed with a GET and the PUT
+    retried, up to settings.GITHUB_CONFLICT_RETRIES times (or until the file turns out
+    to hold the new content already). Raises httpx errors for the caller to report.
+    """
+    repo = current_target().full_name
+    for attempt in range(settings.GITHUB_CONFLICT_RETRIES + 1):
+        data_to_commit.pop("sha", None)
+        if current_file_sha:
+            data_to_commit["sha"] = current_file_sha
+        response_put = await client.put(file_url, json=data_to_commit)
+        if not _is_sha_conflict(response_put, current_file_sha):
+            break
+        file_sha_cache.invalidate(repo, branch, file_path)
+        if attempt == settings.GITHUB_CONFLICT_RETRIES:
+            break
+        logger.info(f"Conflict on PUT of '{file_path}' to '{branch}' (status {response_put.status_code}). Refreshing its SHA and retrying.")
+        current_file_sha = await _fetch_file_sha(client, file_url, branch, file_path)
+        if current_file_sha == new_blob_sha:
+            return _unchanged_result(file_path, new_blob_sha)
+
+    response_put.raise_for_status()
+    put_json = response_put.json()
+    file_sha_cache.update(repo, branch, file_path, put_json.get("content", {}).get("sha") or new_blob_sha)
+    return put_json
+
+
+async def _load_shared_file_sha(shared: SharedState, branch: str, file_path: str) -> None:
+    """
+    Adopts the blob SHA another worker recorded for the file, if it differs from ours.
+    Called under the write lock, so it is the SHA of the last write through this service.
+    """
+    repo = current_target().full_name
+    try:
+        recorded = await shared.get_file_sha(repo, branch, file_path)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read the shared SHA of '{file_path}': {str(e)}")
+        return
+    if recorded is None:
+        return
+    blob_sha, age = recorded
+    entry = file_sha_cache.get(repo, branch, file_path)
+    if entry is None or entry.blob_sha != blob_sha:
+        file_sha_cache.update(repo, branch, file_path, blob_sha, age=age)
+
+
+async def _publish_file_sha(shared: SharedState, branch: str, file_path: str) -> None:
+    """
+    Records this worker's view of the file's blob SHA (or that it is unknown) for the others.
+    """
+    repo = current_target().full_name
+    entry = file_sha_cache.get(repo, branch, file_path)
+    try:
+        if entry is None:
+            await shared.set_file_sha(repo, branch, file_path, None)
+        else:
+            await shared.set_file_sha(repo, branch, file_path, entry.blob_sha, age=time.monotonic() - entry.validated_at)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record the shared SHA of '{file_path}': {str(e)}")
+
 
 # --- Helper for Direct Commit ---
-async def commit_manifest_to_github_direct(payload: WebhookPayload) -> Dict[str, Any]:
+async def commit_manifest_to_github_direct(payload: WebhookPayload, commit_message: Optional[str] = None) -> Dict[str, Any]:
     """
-    Helper function to commit the manifest directly to the main configured branch.
+    Helper function to commit the manifest directly to the current target's branch.
     (Renamed from _commit_manifest_to_github to avoid underscore for external use
      and to be specific about 'direct' commit)
 
+    The git blob SHA of the serialized manifest is computed locally: if the file already
+    holds the same content no GitHub call is made (or only a conditional GET when the
+    cached SHA is old), and the GET for the current file SHA is skipped when the cache is warm.
+    Writes to the file are serialized across all workers on the host (see app/shared_state.py),
+    and a conflict with a writer outside this service is retried with a refreshed SHA.
+
     Args:
         payload: The webhook payload containing the manifest and commit details.
+        commit_message: Optional override for the commit message (used when several
+            webhooks are coalesced into one commit).
 
     Returns:
-        A dictionary containing the response from the GitHub API upon successful commit.
-    """
-    github_api_base_url = "https://api.github.com"
-    repo_file_url = (
-        f"{github_api_base_url}/repos/{settings.GITHUB_REPO_OWNER}/"
-        f"{settings.GITHUB_REPO_NAME}/contents/{settings.GITHUB_FILE_PATH}"
-    )
-
-    headers = {
-        "Authorization": f"Bearer {settings.GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
+        A dictionary containing the response from the GitHub API upon successful commit,
+        or `{"status": "unchanged", ...}` if the manifest did not change.
+    """
+    target = current_target()
+    if target.manifest_layout == "exploded":
+        # One file per component, committed through the Git Data API (see app/git_data.py)
+        return await commit_manifest_exploded(payload, commit_message)
 
-    manifest_json_string = json.dumps(payload.manifest, indent=2)
-    content_base64 = base64.b64encode(manifest_json_string.encode('utf-8')).decode('utf-8')
+    repo_file_url = f"{target.api_path}/contents/{target.file_path}"
+
+    manifest_bytes = payload.manifest_json().encode('utf-8')
+    content_base64 = base64.b64encode(manifest_bytes).decode('utf-8')
+    new_blob_sha = git_blob_sha(manifest_bytes)
     # Using the full commit_hash in the message for direct commit
-    commit_message = f"feat: Update prompt manifest via webhook - commit {payload.commit_hash}"
+    if commit_message is None:
+        commit_message = f"feat: Update prompt manifest via webhook - commit {payload.commit_hash}"
     
     data_to_commit = {
         "message": commit_message,
         "content": content_base64,
-        "branch": settings.GITHUB_BRANCH, # Commits to the main configured branch
+        "branch": target.branch, # Commits to the target's configured branch
     }
 
-    async with httpx.AsyncClient() as client:
-        current_file_sha = None
+    # One write per file at a time across all workers, so PUTs do not race on the file `sha`
+    async with write_lock(target.full_name, target.branch, target.file_path):
+        shared = get_shared_state()
+        if shared is not None:
+            await _load_shared_file_sha(shared, target.branch, target.file_path)
         try:
-            params_get = {"ref": settings.GITHUB_BRANCH}
-            response_get = await client.get(repo_file_url, headers=headers, params=params_get)
-            if response_get.status_code == 200:
-                current_file_sha = response_get.json().get("sha")
-            elif response_get.status_code != 404: # If not 404 (not found), it's an unexpected error
-                response_get.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            error_detail = f"GitHub API error (GET file SHA for direct commit): {e.response.status_code} - {e.response.text}"
-            print(f"[ERROR] {error_detail}")
-            raise HTTPException(status_code=e.response.status_code, detail=error_detail)
-        except httpx.RequestError as e:
-            error_detail = f"Network error connecting to GitHub (GET file SHA for direct commit): {str(e)}"
-            print(f"[ERROR] {error_detail}")
-            raise HTTPException(status_code=503, detail=error_detail)
+            return await _commit_file_direct(get_github_client(), target, repo_file_url, data_to_commit, new_blob_sha)
+        finally:
+            if shared is not None:
+                await _publish_file_sha(shared, target.branch, target.file_path)
 
-        if current_file_sha:
-            data_to_commit["sha"] = current_file_sha
 
-        try:
-            response_put = await client.put(repo_file_url, headers=headers, json=data_to_commit)
-            response_put.raise_for_status()
-            return response_put.json()
-        except httpx.HTTPStatusError as e:
-            error_detail = f"GitHub API error (PUT content for direct commit): {e.response.status_code} - {e.response.text}"
-            if e.response.status_code == 409:
-                error_detail = (
-                    f"GitHub API conflict (PUT content for direct commit): {e.response.text}. "
-                    "This might be due to an outdated SHA or branch protection rules."
-                )
-            elif e.response.status_code == 422:
-                error_detail = (
-                    f"GitHub API Unprocessable Entity (PUT content for direct commit): {e.response.text}. "
-                    f"Ensure the branch '{settings.GITHUB_BRANCH}' exists and the payload is correctly formatted."
-                )
-            print(f"[ERROR] {error_detail}")
-            raise HTTPException(status_code=e.response.status_code, detail=error_detail)
-        except httpx.RequestError as e:
-            error_detail = f"Network error connecting to GitHub (PUT content for direct commit): {str(e)}"
-            print(f"[ERROR] {error_detail}")
-            raise HTTPException(status_code=503, detail=error_detail)
+async def _commit_file_direct(client: httpx.AsyncClient, target: GitHubTarget, repo_file_url: str, data_to_commit: Dict[str, Any], new_blob_sha: str) -> Dict[str, Any]:
+    """
+    SHA lookup and PUT of the direct commit, run while holding the file's write lock.
+    """
+    try:
+        current_file_sha, unchanged = await _resolve_file_sha(
+            client, repo_file_url, target.branch, target.file_path, new_blob_sha
+        )
+    except httpx.HTTPStatusError as e:
+        error_detail = f"GitHub API error (GET file SHA for direct commit): {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except httpx.RequestError as e:
+        error_detail = f"Network error connecting to GitHub (GET file SHA for direct commit): {str(e)}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=503, detail=error_detail)
+
+    if unchanged:
+        logger.info(f"Manifest for '{target.file_path}' on '{target.branch}' is unchanged. Skipping commit.")
+        return _unchanged_result(target.file_path, new_blob_sha)
+
+    try:
+        return await _put_file_contents(
+            client, repo_file_url, target.branch, target.file_path,
+            data_to_commit, new_blob_sha, current_file_sha
+        )
+    except httpx.HTTPStatusError as e:
+        error_detail = f"GitHub API error (PUT content for direct commit): {e.response.status_code} - {e.response.text}"
+        if e.response.status_code == 409:
+            error_detail = (
+                f"GitHub API conflict (PUT content for direct commit): {e.response.text}. "
+                "This might be due to an outdated SHA or branch protection rules."
+            )
+        elif e.response.status_code == 422:
+            error_detail = (
+                f"GitHub API Unprocessable Entity (PUT content for direct commit): {e.response.text}. "
+                f"Ensure the branch '{target.branch}' exists and the payload is correctly formatted."
+            )
+        logger.error(error_detail)
+        raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except httpx.RequestError as e:
+        error_detail = f"Network error connecting to GitHub (PUT content for direct commit): {str(e)}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=503, detail=error_detail)
 
 # --- Helpers for Pull Request Flow ---
 
-async def get_base_branch_sha(client: httpx.AsyncClient, headers: Dict[str, str]) -> str:
+async def get_base_branch_sha(client: httpx.AsyncClient) -> str:
     """
-    Fetches the SHA of the latest commit on the configured base branch (settings.GITHUB_BRANCH).
+    Fetches the SHA of the latest commit on the current target's base branch.
     """
-    ref_url = f"https://api.github.com/repos/{settings.GITHUB_REPO_OWNER}/{settings.GITHUB_REPO_NAME}/git/refs/heads/{settings.GITHUB_BRANCH}"
+    target = current_target()
+    base_branch = target.branch
+    ref_url = f"{target.api_path}/git/refs/heads/{base_branch}"
     try:
-        response = await client.get(ref_url, headers=headers)
+        response = await client.get(ref_url)
         response.raise_for_status()
         return response.json()["object"]["sha"]
     except httpx.HTTPStatusError as e:
-        error_detail = f"GitHub API error (getting base branch SHA for '{settings.GITHUB_BRANCH}'): {e.response.status_code} - {e.response.text}"
-        print(f"[ERROR] {error_detail}")
+        error_detail = f"GitHub API error (getting base branch SHA for '{base_branch}'): {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
     except httpx.RequestError as e:
-        error_detail = f"Network error connecting to GitHub (getting base branch SHA for '{settings.GITHUB_BRANCH}'): {str(e)}"
-        print(f"[ERROR] {error_detail}")
+        error_detail = f"Network error connecting to GitHub (getting base branch SHA for '{base_branch}'): {str(e)}"
+        logger.error(error_detail)
         raise HTTPException(status_code=503, detail=error_detail)
     except (KeyError, IndexError) as e: # Catch potential issues with JSON structure
-        error_detail = f"Unexpected response structure from GitHub when getting SHA for '{settings.GITHUB_BRANCH}': {str(e)}"
-        print(f"[ERROR] {error_detail}")
+        error_detail = f"Unexpected response structure from GitHub when getting SHA for '{base_branch}': {str(e)}"
+        logger.error(error_detail)
         raise HTTPException(status_code=500, detail=error_detail)
 
-async def create_new_branch_from_base(client: httpx.AsyncClient, new_branch_name: str, base_branch_sha: str, headers: Dict[str, str]) -> None:
+async def create_new_branch_from_base(client: httpx.AsyncClient, new_branch_name: str, base_branch_sha: str) -> None:
     """
     Creates a new branch in the repository pointing to the base_branch_sha.
     """
-    branch_url = f"https://api.github.com/repos/{settings.GITHUB_REPO_OWNER}/{settings.GITHUB_REPO_NAME}/git/refs"
+    branch_url = f"{current_target().api_path}/git/refs"
     payload = {
         "ref": f"refs/heads/{new_branch_name}",
         "sha": base_branch_sha
     }
     try:
-        response = await client.post(branch_url, headers=headers, json=payload)
+        response = await client.post(branch_url, json=payload)
         if response.status_code == 422 and "Reference already exists" in response.text:
-            print(f"[INFO] Branch '{new_branch_name}' already exists. Proceeding.")
+            logger.info(f"Branch '{new_branch_name}' already exists. Proceeding.")
             # Decide if this should be an error or if it's okay to proceed
             # For now, we allow proceeding, assuming the commit will update the existing branch.
             # If strict new branch creation is needed, raise HTTPException here.
@@ -138,94 +309,156 @@ async def create_new_branch_from_base(client: httpx.AsyncClient, new_branch_name
             response.raise_for_status() # Raises for other 4xx/5xx errors
     except httpx.HTTPStatusError as e:
         error_detail = f"GitHub API error (creating branch '{new_branch_name}'): {e.response.status_code} - {e.response.text}"
-        print(f"[ERROR] {error_detail}")
+        logger.error(error_detail)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
     except httpx.RequestError as e:
         error_detail = f"Network error connecting to GitHub (creating branch '{new_branch_name}'): {str(e)}"
-        print(f"[ERROR] {error_detail}")
+        logger.error(error_detail)
         raise HTTPException(status_code=503, detail=error_detail)
 
-async def commit_file_to_branch(client: httpx.AsyncClient, branch_name: str, file_path: str, content_base64: str, commit_message: str, headers: Dict[str, str]) -> Dict[str, Any]:
+async def commit_file_to_branch(client: httpx.AsyncClient, branch_name: str, file_path: str, content_base64: str, commit_message: str) -> Dict[str, Any]:
     """
     Commits a file to the specified branch. Creates or updates the file.
+    Uses the blob SHA cache like the direct commit: identical content is not committed
+    again and the SHA lookup is skipped when the cache is warm.
     """
-    file_url = f"https://api.github.com/repos/{settings.GITHUB_REPO_OWNER}/{settings.GITHUB_REPO_NAME}/contents/{file_path}"
+    file_url = f"{current_target().api_path}/contents/{file_path}"
+    new_blob_sha = git_blob_sha(base64.b64decode(content_base64))
     
     current_file_sha = None
+    unchanged = False
     try:
-        get_params = {"ref": branch_name} # Get file from the specific new branch
-        response_get = await client.get(file_url, headers=headers, params=get_params)
-        if response_get.status_code == 200:
-            current_file_sha = response_get.json().get("sha")
-        elif response_get.status_code != 404:
-            response_get.raise_for_status()
+        current_file_sha, unchanged = await _resolve_file_sha(
+            client, file_url, branch_name, file_path, new_blob_sha
+        )
     except httpx.HTTPStatusError as e:
-        print(f"[INFO] Could not get SHA for '{file_path}' on branch '{branch_name}': {e.response.status_code}. Assuming new file or continuing.")
+        logger.info(f"Could not get SHA for '{file_path}' on branch '{branch_name}': {e.response.status_code}. Assuming new file or continuing.")
     except httpx.RequestError as e:
-        print(f"[INFO] Network error checking for file '{file_path}' on branch '{branch_name}': {str(e)}. Assuming new file or continuing.")
+        logger.info(f"Network error checking for file '{file_path}' on branch '{branch_name}': {str(e)}. Assuming new file or continuing.")
+
+    if unchanged:
+        logger.info(f"'{file_path}' on branch '{branch_name}' is unchanged. Skipping commit.")
+        return _unchanged_result(file_path, new_blob_sha)
 
     commit_payload = {
         "message": commit_message,
         "content": content_base64,
         "branch": branch_name, # Important: commit to the new feature branch
     }
-    if current_file_sha:
-        commit_payload["sha"] = current_file_sha
 
     try:
-        response = await client.put(file_url, headers=headers, json=commit_payload)
-        response.raise_for_status()
-        return response.json()
+        return await _put_file_contents(
+            client, file_url, branch_name, file_path,
+            commit_payload, new_blob_sha, current_file_sha
+        )
     except httpx.HTTPStatusError as e:
         error_detail = f"GitHub API error (committing file to '{branch_name}'): {e.response.status_code} - {e.response.text}"
-        print(f"[ERROR] {error_detail}")
+        logger.error(error_detail)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
     except httpx.RequestError as e:
         error_detail = f"Network error connecting to GitHub (committing file to '{branch_name}'): {str(e)}"
-        print(f"[ERROR] {error_detail}")
+        logger.error(error_detail)
         raise HTTPException(status_code=503, detail=error_detail)
 
-async def create_github_pull_request(client: httpx.AsyncClient, head_branch: str, base_branch: str, title: str, body: str, headers: Dict[str, str]) -> Dict[str, Any]:
+async def create_github_pull_request(client: httpx.AsyncClient, head_branch: str, base_branch: str, title: str, body: str) -> Dict[str, Any]:
     """
     Creates a pull request from the head_branch to the base_branch.
     """
-    pr_url = f"https://api.github.com/repos/{settings.GITHUB_REPO_OWNER}/{settings.GITHUB_REPO_NAME}/pulls"
+    pr_url = f"{current_target().api_path}/pulls"
     payload = {
         "title": title,
         "body": body,
         "head": head_branch, # The branch with your new changes
-        "base": base_branch,  # The branch you want to merge into (e.g., settings.GITHUB_BRANCH)
+        "base": base_branch,  # The branch you want to merge into (e.g., the target's configured branch)
         "draft": False 
     }
     try:
-        response = await client.post(pr_url, headers=headers, json=payload)
+        response = await client.post(pr_url, json=payload)
         if response.status_code == 422: # Unprocessable Entity
             response_json = response.json()
             # Check if PR already exists
             if any("A pull request already exists" in err.get("message", "") for err in response_json.get("errors", [])):
-                print(f"[INFO] Pull request from '{head_branch}' to '{base_branch}' already exists.")
-                # Attempt to find the existing PR URL (this is a bit more involved, might need a separate GET)
-                # For simplicity, returning a generic message.
-                # A more robust solution would GET /repos/{owner}/{repo}/pulls?head={owner}:{head_branch}&base={base_branch}
-                # and return the html_url of the first result if it exists.
-                existing_pr_url = f"https://github.com/{settings.GITHUB_REPO_OWNER}/{settings.GITHUB_REPO_NAME}/pulls?q=is%3Apr+is%3Aopen+head%3A{head_branch}+base%3A{base_branch}"
+                logger.info(f"Pull request from '{head_branch}' to '{base_branch}' already exists.")
+                message = f"Pull request from '{head_branch}' to '{base_branch}' already exists."
+                # Return the existing PR itself (number, html_url, ...) when it can be found
+                existing_pr = await find_open_pull_request(client, head_branch, base_branch)
+                if existing_pr is not None:
+                    return {**existing_pr, "message": message, "status": "already_exists"}
+                existing_pr_url = f"https://github.com/{current_target().full_name}/pulls?q=is%3Apr+is%3Aopen+head%3A{head_branch}+base%3A{base_branch}"
                 return {
-                    "message": f"Pull request from '{head_branch}' to '{base_branch}' already exists.",
+                    "message": message,
                     "html_url": existing_pr_url, # Provide a link to search for the PR
                     "status": "already_exists"
                 }
             # Otherwise, it's some other validation error
             error_detail = f"GitHub API validation error (creating PR): {response.status_code} - {response.text}"
-            print(f"[ERROR] {error_detail}")
+            logger.error(error_detail)
             raise HTTPException(status_code=response.status_code, detail=error_detail)
         
         response.raise_for_status() # For other 4xx/5xx errors
         return response.json() # Contains PR details including html_url
     except httpx.HTTPStatusError as e:
         error_detail = f"GitHub API error (creating PR from '{head_branch}' to '{base_branch}'): {e.response.status_code} - {e.response.text}"
-        print(f"[ERROR] {error_detail}")
+        logger.error(error_detail)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
     except httpx.RequestError as e:
         error_detail = f"Network error connecting to GitHub (creating PR from '{head_branch}' to '{base_branch}'): {str(e)}"
-        print(f"[ERROR] {error_detail}")
+        logger.error(error_detail)
+        raise HTTPException(status_code=503, detail=error_detail)
+
+async def find_open_pull_request(client: httpx.AsyncClient, head_branch: str, base_branch: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the open pull request from head_branch to base_branch, or None if there is none.
+    """
+    target = current_target()
+    params = {"head": f"{target.owner}:{head_branch}", "base": base_branch, "state": "open"}
+    try:
+        response = await client.get(f"{target.api_path}/pulls", params=params)
+        response.raise_for_status()
+        pulls = response.json()
+    except httpx.HTTPStatusError as e:
+        error_detail = f"GitHub API error (listing PRs from '{head_branch}' to '{base_branch}'): {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except httpx.RequestError as e:
+        error_detail = f"Network error connecting to GitHub (listing PRs from '{head_branch}' to '{base_branch}'): {str(e)}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=503, detail=error_detail)
+    return pulls[0] if pulls else None
+
+async def get_github_pull_request(client: httpx.AsyncClient, pr_number: int) -> Dict[str, Any]:
+    """
+    Returns a pull request by number, whatever its state (check `state` and `merged`).
+    """
+    pr_url = f"{current_target().api_path}/pulls/{pr_number}"
+    try:
+        response = await client.get(pr_url)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        error_detail = f"GitHub API error (getting PR #{pr_number}): {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except httpx.RequestError as e:
+        error_detail = f"Network error connecting to GitHub (getting PR #{pr_number}): {str(e)}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=503, detail=error_detail)
+
+async def update_github_pull_request(client: httpx.AsyncClient, pr_number: int, title: str, body: str) -> Dict[str, Any]:
+    """
+    Replaces the title and description of a pull request. Returns the updated PR;
+    check its `state`, since a merged or closed PR can still be edited.
+    """
+    pr_url = f"{current_target().api_path}/pulls/{pr_number}"
+    try:
+        response = await client.patch(pr_url, json={"title": title, "body": body})
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        error_detail = f"GitHub API error (updating PR #{pr_number}): {e.response.status_code} - {e.response.text}"
+        logger.error(error_detail)
+        raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except httpx.RequestError as e:
+        error_detail = f"Network error connecting to GitHub (updating PR #{pr_number}): {str(e)}"
+        logger.error(error_detail)
         raise HTTPException(status_code=503, detail=error_detail)
@@ -0,0 +1,122 @@
+# app/idempotency.py
+import time
+import asyncio
+import logging
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+
+from .shared_state import SharedState, get_shared_state
+
+logger = logging.getLogger(__name__)
+
+# (HTTP status code, response body) of a webhook endpoint
+StoredResponse = Tuple[int, Dict[str, Any]]
+
+
+class _Entry:
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.expires_at: Optional[float] = None  # Set once the operation has succeeded
+
+
+async def _release_claim(shared: SharedState, key: str) -> None:
+    """
+    Drops this worker's shared claim on `key` after a failed or cancelled operation.
+    Shielded, so a second cancellation of the request does not leave the claim to expire.
+    """
+    try:
+        await asyncio.shield(shared.release_response(key))
+    except sqlite3.Error as e:
+        logger.warning(f"Could not release the shared idempotency claim for '{key}': {str(e)}")
+
+
+class IdempotencyStore:
+    """
+    Bounded LRU + TTL store of webhook responses, keyed by idempotency key.
+
+    The first request for a key runs the operation. Duplicates that arrive while it
+    is in flight wait on the same pending operation; duplicates that arrive after it
+    succeeded get the stored response without touching GitHub. Failed operations are
+    not stored, so a retry after an error runs again.
+
+    With shared state enabled (app/shared_state.py) the same holds across the worker
+    processes of the host: a duplicate on another worker waits for, or replays, the
+    response of the first one.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    async def run(self, key: str, operation: Callable[[], Awaitable[StoredResponse]]) -> Tuple[StoredResponse, bool]:
+        """
+        Runs `operation` once per key. Returns its response and whether it was replayed.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            entry = None
+
+        if entry is not None:
+            self._entries.move_to_end(key)
+            # Shield so one disconnecting duplicate does not cancel the shared operation
+            return await asyncio.shield(entry.future), True
+
+        entry = _Entry(asyncio.get_running_loop().create_future())
+        self._entries[key] = entry
+        self._evict()
+        shared = get_shared_state()
+        claimed = False
+        try:
+            if shared is not None:
+                try:
+                    stored = await shared.claim_response(key)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not check the shared idempotency store for '{key}': {str(e)}")
+                else:
+                    if stored is not None:
+                        self._complete(entry, stored)
+                        return stored, True
+                    claimed = True
+            result = await operation()
+        except BaseException as e:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            if isinstance(e, asyncio.CancelledError):
+                entry.future.cancel()
+            else:
+                entry.future.set_exception(e)
+                # Retrieved here so asyncio does not warn when no duplicate was waiting
+                entry.future.exception()
+            if claimed:
+                await _release_claim(shared, key)
+            raise
+        self._complete(entry, result)
+        if claimed:
+            try:
+                await shared.store_response(key, result, self.ttl)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not store the response for '{key}' in the shared idempotency store: {str(e)}")
+        return result, False
+
+    def _complete(self, entry: _Entry, result: StoredResponse) -> None:
+        entry.future.set_result(result)
+        entry.expires_at = time.monotonic() + self.ttl
+
+    def _evict(self) -> None:
+        """
+        Drops the least recently used completed entries beyond `max_entries`.
+        In-flight entries are kept so their duplicates still coalesce.
+        """
+        if len(self._entries) <= self.max_entries:
+            return
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if self._entries[key].future.done():
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,340 @@
+# app/job_queue.py
+import logging
+import json
+import uuid
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from typing import Dict, Any, Optional, List, Set, Callable, Awaitable
+
+from fastapi import HTTPException
+
+from .models import WebhookPayload
+from .config import settings
+from .sqlite_db import open_database
+from .workflows import run_direct_commit, run_pull_request
+from .logging_config import log_context, set_correlation_id, step_timings_extra
+
+logger = logging.getLogger(__name__)
+
+# Job kinds map to the same flows the synchronous endpoints run.
+JOB_RUNNERS: Dict[str, Callable[[WebhookPayload], Awaitable[Dict[str, Any]]]] = {
+    "commit": run_direct_commit,
+    "pr": run_pull_request,
+}
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# GitHub statuses worth retrying; any other 4xx is a permanent failure.
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    locked_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, next_attempt_at);
+"""
+
+
+class JobQueue:
+    """
+    Durable work queue backed by a local SQLite database in WAL mode.
+
+    The database file is shared by every worker process on the host. A job is
+    claimed by setting a lease (`locked_until`); if the process holding it dies,
+    the lease expires and another worker picks the job up again.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = open_database(db_path, _SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- Blocking operations (run via asyncio.to_thread) ---
+
+    def _enqueue(self, kind: str, payload_json: str) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, payload_json, JOB_QUEUED, now, now, now),
+            )
+        return job_id
+
+    def _claim(self, lease_seconds: float, max_attempts: int) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so two processes
+            # can never claim the same row.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A lease that expired on the last attempt means the job kept crashing or
+                # overrunning its worker: fail it instead of handing it out again
+                expired = self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, locked_until = NULL, updated_at = ? "
+                    "WHERE status = ? AND locked_until < ? AND attempts >= ?",
+                    (JOB_FAILED, f"Worker lease expired on the last of {max_attempts} attempt(s).", now, JOB_RUNNING, now, max_attempts),
+                ).rowcount
+                row = self._conn.execute(
+                    "SELECT * FROM jobs "
+                    "WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND locked_until < ?) "
+                    "ORDER BY next_attempt_at LIMIT 1",
+                    (JOB_QUEUED, now, JOB_RUNNING, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, locked_until = ?, updated_at = ? WHERE id = ?",
+                        (JOB_RUNNING, now + lease_seconds, now, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if expired:
+            logger.error(f"Failed {expired} job(s) whose lease expired after {max_attempts} attempt(s).")
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str], next_attempt_at: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, locked_until = NULL, "
+                "next_attempt_at = COALESCE(?, next_attempt_at) WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, next_attempt_at, job_id),
+            )
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def _prune(self, older_than: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (JOB_SUCCEEDED, JOB_FAILED, older_than),
+            )
+        return cursor.rowcount
+
+    # --- Async API ---
+
+    async def enqueue(self, kind: str, payload: WebhookPayload) -> str:
+        """
+        Stores a validated payload and returns the new job id.
+        """
+        return await asyncio.to_thread(self._enqueue, kind, payload.model_dump_json())
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._claim, settings.JOB_LEASE_SECONDS, settings.JOB_MAX_ATTEMPTS)
+
+    async def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None, next_attempt_at: Optional[float] = None) -> None:
+        await asyncio.to_thread(self._finish, job_id, status, result, error, next_attempt_at)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the public view of a job, or None if it does not exist.
+        """
+        job = await asyncio.to_thread(self._get, job_id)
+        if job is None:
+            return None
+        return {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "result": json.loads(job["result"]) if job["result"] else None,
+            "error": job["error"],
+        }
+
+    async def prune(self) -> int:
+        return await asyncio.to_thread(self._prune, time.time() - settings.JOB_RETENTION_SECONDS)
+
+
+class JobWorkerPool:
+    """
+    A bounded pool of asyncio tasks that drain the JobQueue in this process.
+    """
+
+    def __init__(self, queue: JobQueue, concurrency: int):
+        self.queue = queue
+        self.concurrency = concurrency
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self._in_flight: Set[str] = set()
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker_loop()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Hand interrupted jobs straight back to the queue instead of waiting for their lease to expire
+        for job_id in self._in_flight:
+            try:
+                await self.queue.finish(job_id, JOB_QUEUED, error="Interrupted by worker shutdown.")
+            except sqlite3.Error as e:
+                logger.error(f"Could not re-queue job {job_id} on shutdown: {str(e)}. It runs again once its lease expires.")
+        self._in_flight.clear()
+
+    def notify(self) -> None:
+        """
+        Wakes idle workers in this process right away instead of waiting for the next poll.
+        """
+        self._wakeup.set()
+
+    async def _worker_loop(self) -> None:
+        last_prune = 0.0
+        while not self._stopping:
+            try:
+                job = await self.queue.claim()
+            except sqlite3.Error as e:
+                logger.error(f"Job queue claim failed: {str(e)}")
+                job = None
+
+            if job is None:
+                if time.time() - last_prune > 3600:
+                    last_prune = time.time()
+                    try:
+                        await self.queue.prune()
+                    except sqlite3.Error as e:
+                        logger.error(f"Job queue prune failed: {str(e)}")
+                # Other processes enqueue too, so poll as well as waiting for a local wake-up
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            self._in_flight.add(job["id"])
+            with log_context(request_id=f"job-{job['id']}") as timings:
+                started = time.perf_counter()
+                try:
+                    await self._run_job(job)
+                except sqlite3.Error as e:
+                    # The job stays leased, so it runs again once the lease expires
+                    logger.error(f"Could not record the outcome of job {job['id']}: {str(e)}")
+                logger.info(
+                    f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} finished",
+                    extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1), **step_timings_extra(timings)},
+                )
+            self._in_flight.discard(job["id"])
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        runner = JOB_RUNNERS.get(job["kind"])
+        if runner is None:
+            await self.queue.finish(job["id"], JOB_FAILED, error=f"Unknown job kind '{job['kind']}'.")
+            return
+
+        try:
+            payload = WebhookPayload.model_validate_json(job["payload"])
+            set_correlation_id(payload.commit_hash)
+            result = await runner(payload)
+        except HTTPException as e:
+            retryable = e.status_code >= 500 or e.status_code in RETRYABLE_STATUS_CODES
+            await self._fail_or_retry(job, f"{e.status_code}: {e.detail}", retryable)
+            return
+        except Exception as e:
+            await self._fail_or_retry(job, f"Unexpected error: {str(e)}", True)
+            return
+
+        await self.queue.finish(job["id"], JOB_SUCCEEDED, result=result)
+
+    async def _fail_or_retry(self, job: Dict[str, Any], error: str, retryable: bool) -> None:
+        if retryable and job["attempts"] < settings.JOB_MAX_ATTEMPTS:
+            # Jittered exponential backoff before the next attempt
+            delay = settings.JOB_RETRY_BASE_DELAY * (2 ** (job["attempts"] - 1))
+            delay = delay * random.uniform(0.5, 1.5)
+            logger.info(f"Job {job['id']} attempt {job['attempts']} failed ({error}). Retrying in {delay:.1f}s.")
+            await self.queue.finish(job["id"], JOB_QUEUED, error=error, next_attempt_at=time.time() + delay)
+        else:
+            logger.error(f"Job {job['id']} failed after {job['attempts']} attempt(s): {error}")
+            await self.queue.finish(job["id"], JOB_FAILED, error=error)
+
+
+# Per-process queue handle and worker pool, managed by the app lifespan.
+_queue: Optional[JobQueue] = None
+_pool: Optional[JobWorkerPool] = None
+
+
+async def start_job_queue() -> JobQueue:
+    """
+    Opens the job database and starts this process's background workers.
+    """
+    global _queue, _pool
+    if _queue is None:
+        _queue = await asyncio.to_thread(JobQueue, settings.JOB_QUEUE_DB_PATH)
+        _pool = JobWorkerPool(_queue, settings.JOB_QUEUE_WORKERS)
+        _pool.start()
+    return _queue
+
+
+async def stop_job_queue() -> None:
+    global _queue, _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+    if _queue is not None:
+        _queue.close()
+        _queue = None
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Returns the job queue, or raises a 400 if asynchronous mode is not enabled.
+    """
+    if _queue is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Asynchronous job mode is not enabled. Set JOB_QUEUE_ENABLED=true to use it.",
+        )
+    return _queue
+
+
+async def submit_job(kind: str, payload: WebhookPayload) -> Dict[str, Any]:
+    """
+    Enqueues a webhook for background processing and returns the 202 response body.
+    """
+    queue = get_job_queue()
+    job_id = await queue.enqueue(kind, payload)
+    if _pool is not None:
+        _pool.notify()
+    return {
+        "message": "Webhook accepted and queued for processing.",
+        "job_id": job_id,
+        "status": JOB_QUEUED,
+        "status_url": f"/webhook/jobs/{job_id}",
+    }
@@ -0,0 +1,274 @@
+# app/logging_config.py
+import sys
+import json
+import time
+import uuid
+import queue
+import logging
+import logging.handlers
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator, Tuple
+
+from .config import settings
+
+# Structured JSON logging that never blocks the event loop: records are handed to a
+# bounded queue (dropped, and counted, when it is full) and a background thread
+# formats and writes them. Request and correlation ids come from context variables,
+# so every line logged while handling a request or a job carries them.
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+correlation_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+# step -> [calls, total seconds] for the GitHub calls of the current request or job
+_step_timings_var: contextvars.ContextVar[Optional[Dict[str, list]]] = contextvars.ContextVar("step_timings", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "correlation_id", "suppressed"}
+_QUIET_PATHS = {"/health", "/ready", "/metrics"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["_DroppingQueueHandler"] = None
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [truncated {len(text) - limit} chars]"
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def set_correlation_id(correlation_id: Optional[str]) -> None:
+    """
+    Sets the correlation id for the rest of the current request, unless the caller
+    already sent one (X-Correlation-ID).
+    """
+    if correlation_id and correlation_id_var.get() is None:
+        correlation_id_var.set(correlation_id)
+
+
+def record_step_timing(step: str, duration: float) -> None:
+    """
+    Adds a GitHub call to the per-step timings of the current request or job.
+    """
+    timings = _step_timings_var.get()
+    if timings is None:
+        return
+    entry = timings.setdefault(step, [0, 0.0])
+    entry[0] += 1
+    entry[1] += duration
+
+
+def _timings_summary(timings: Dict[str, list]) -> Dict[str, Dict[str, Any]]:
+    return {step: {"calls": calls, "ms": round(seconds * 1000, 1)} for step, (calls, seconds) in timings.items()}
+
+
+@contextmanager
+def log_context(request_id: Optional[str] = None, correlation_id: Optional[str] = None) -> Iterator[Dict[str, list]]:
+    """
+    Scopes request/correlation ids and a fresh step-timings dict to a block, e.g. one
+    background job. Yields the timings dict.
+    """
+    timings: Dict[str, list] = {}
+    tokens = (
+        request_id_var.set(request_id or new_request_id()),
+        correlation_id_var.set(correlation_id),
+        _step_timings_var.set(timings),
+    )
+    try:
+        yield timings
+    finally:
+        _step_timings_var.reset(tokens[2])
+        correlation_id_var.reset(tokens[1])
+        request_id_var.reset(tokens[0])
+
+
+def step_timings_extra(timings: Dict[str, list]) -> Dict[str, Any]:
+    return {"github_steps": _timings_summary(timings)} if timings else {}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, ids, any `extra=` fields,
+    and the traceback. The message and string fields are capped at `max_chars`, so a
+    large GitHub error body cannot produce a multi-megabyte line.
+    """
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage(), self.max_chars),
+        }
+        for key in ("request_id", "correlation_id", "suppressed"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = truncate(value, self.max_chars) if isinstance(value, str) else value
+        if record.exc_text:
+            entry["exception"] = truncate(record.exc_text, self.max_chars * 4)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RepeatedErrorSampler(logging.Filter):
+    """
+    Lets through at most `burst` warnings/errors per call site every `window` seconds.
+    The first record after a window with dropped records reports how many were
+    suppressed, so a GitHub outage logs a handful of lines instead of one per request.
+    """
+
+    def __init__(self, window: float, burst: int):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._lock = threading.Lock()
+        # (logger, level, file, line) -> [window start, records let through, records suppressed]
+        self._sites: Dict[Tuple[str, int, str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site is not None else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that captures the context ids in the calling thread and drops the
+    record (counting it) instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve everything that depends on the caller (ids, message args, traceback);
+        # JSON encoding and the write happen on the listener thread.
+        record.request_id = request_id_var.get()
+        record.correlation_id = correlation_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging() -> None:
+    """
+    Routes the `app` loggers through the background queue. Called once per worker
+    process from the app lifespan; safe to call again.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter(settings.LOG_MAX_MESSAGE_CHARS))
+
+    _queue_handler = _DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RepeatedErrorSampler(settings.LOG_SAMPLE_WINDOW_SECONDS, settings.LOG_SAMPLE_BURST))
+
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [_queue_handler]
+    app_logger.setLevel(settings.LOG_LEVEL.upper())
+    app_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Flushes queued records and stops the background thread.
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    if _queue_handler is not None and _queue_handler.dropped:
+        # The queue is gone, so this one goes straight to the output handler
+        record = logging.getLogger(__name__).makeRecord(
+            __name__, logging.WARNING, __file__, 0,
+            f"Dropped {_queue_handler.dropped} log records because the log queue was full.", None, None,
+        )
+        for handler in listener.handlers:
+            handler.handle(record)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that gives every request a request id (X-Request-ID, generated if
+    absent and echoed in the response), a correlation id (X-Correlation-ID, or set
+    later from the webhook's idempotency key), and logs one line per request with its
+    status, duration and per-step GitHub timings.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("app.requests")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:128] or new_request_id()
+        correlation_id = headers.get(b"x-correlation-id", b"").decode("latin-1")[:128] or None
+        status_code = 500
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        started = time.perf_counter()
+        with log_context(request_id, correlation_id) as timings:
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                if scope["path"] not in _QUIET_PATHS:
+                    self.logger.info(
+                        f"{scope['method']} {scope['path']} {status_code}",
+                        extra={
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "status": status_code,
+                            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                            **step_timings_extra(timings),
+                        },
+                    )
@@ -1,9 +1,57 @@
 # app/main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 
 # Relative imports for modules within the 'app' package
 from .routers import webhook_router
 from .config import settings # Import settings to ensure they are loaded/validated at startup
+from .github_client import start_github_client, close_github_client
+from .job_queue import start_job_queue, stop_job_queue
+from .shared_state import start_shared_state, stop_shared_state
+from .github_scheduler import get_scheduler
+from .targets import DEFAULT_TARGET_KEY, get_targets, resolve_target
+from .metrics import RequestMetricsMiddleware, init_metrics, render_metrics
+from .logging_config import RequestContextMiddleware, setup_logging, shutdown_logging
+from .startup import record_import_time, startup_phase, start_warm_up, stop_warm_up, readiness
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens the pooled GitHub client once per worker process and closes it on shutdown,
+    so webhooks reuse warm keep-alive connections instead of a new TCP/TLS handshake each time.
+    Each startup step is timed, and the warm-up (see app/startup.py) runs in the background
+    until GET /ready reports ready.
+    """
+    with startup_phase("logging"):
+        setup_logging()
+    with startup_phase("metrics"):
+        # prometheus_client is imported here rather than with the app (see app/metrics.py)
+        init_metrics()
+    with startup_phase("targets"):
+        # Loads (and validates) the routing table, so a bad GITHUB_TARGETS_FILE fails at startup
+        get_targets()
+    with startup_phase("github_client"):
+        await start_github_client()
+    if settings.SHARED_STATE_ENABLED:
+        with startup_phase("shared_state"):
+            # Write locks, file SHAs and idempotent responses shared with the other workers on this host
+            await start_shared_state()
+    if settings.JOB_QUEUE_ENABLED:
+        with startup_phase("job_queue"):
+            # Background workers for ?mode=async webhooks; resumes jobs left over from a previous run
+            await start_job_queue()
+    # Opens the GitHub connections and prefetches branch and file SHAs before /ready reports ready
+    start_warm_up()
+    try:
+        yield
+    finally:
+        await stop_warm_up()
+        await stop_job_queue()
+        stop_shared_state()
+        await close_github_client()
+        shutdown_logging()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -13,8 +61,14 @@ app = FastAPI(
         "to a GitHub repository. Refactored structure."
     ),
     version="1.0.1", # Updated version for the refactor
+    lifespan=lifespan,
 )
 
+# Per-route latency histograms for /metrics
+app.add_middleware(RequestMetricsMiddleware)
+# Request/correlation ids and one structured log line per request (outermost, so it also times the metrics middleware)
+app.add_middleware(RequestContextMiddleware)
+
 # Include the webhook router
 # All routes defined in webhook_router will be available under its defined prefix (e.g., /webhook)
 app.include_router(webhook_router.router)
@@ -27,3 +81,46 @@ async def health_check():
     """
     return {"status": "ok", "message": "Webhook to GitHub Commit Service is running."}
 
+
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """
+    Readiness probe: 503 until this worker has started and warmed up its GitHub
+    connections and caches, then 200. Both include the startup timings.
+    """
+    ready, report = readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
+
+
+@app.get("/github/scheduler", tags=["Health"])
+async def github_scheduler_status(target: str = DEFAULT_TARGET_KEY):
+    """
+    Reports this worker's view of a target's GitHub rate limit and its request scheduler:
+    remaining quota, token bucket, in-flight and waiting calls, retries and shed requests.
+    """
+    return get_scheduler(resolve_target(target)).snapshot()
+
+
+@app.get("/github/targets", tags=["Health"])
+async def github_targets():
+    """
+    Lists the routing table: each target's repository, branch, file and limits (without tokens).
+    """
+    return {key: target.model_dump(exclude={"token"}) for key, target in get_targets().items()}
+
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics: request latency per route, latency and status of every GitHub
+    step, scheduler wait time, in-flight calls and connection pool gauges. With
+    PROMETHEUS_MULTIPROC_DIR set, the values of all gunicorn workers are aggregated.
+    """
+    rendered = render_metrics()
+    if rendered is None:
+        return Response("prometheus_client is not installed.\n", status_code=503, media_type="text/plain")
+    body, content_type = rendered
+    return Response(body, media_type=content_type)
+
+
+record_import_time()
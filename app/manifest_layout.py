@@ -0,0 +1,69 @@
+# app/manifest_layout.py
+import re
+import posixpath
+from typing import Dict, Any
+
+from .targets import current_target
+from .serialization import dumps_manifest
+
+# Name of the root file in the exploded layout
+ROOT_FILE_NAME = "manifest.json"
+
+
+def serialize_json(value: Any) -> bytes:
+    """
+    Serializes one manifest file the same way as the single-file layout.
+    """
+    return dumps_manifest(value).encode("utf-8")
+
+
+def exploded_manifest_dir() -> str:
+    """
+    Directory holding the current target's exploded manifest: its `manifest_dir`
+    (GITHUB_MANIFEST_DIR), or its file path without the extension (prompts/chat.json -> prompts/chat).
+    """
+    target = current_target()
+    if target.manifest_dir:
+        return target.manifest_dir.strip("/")
+    return posixpath.splitext(target.file_path)[0]
+
+
+def _component_file_name(key: str, used: Dict[str, str]) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", key) or "_"
+    candidate = f"{name}.json"
+    suffix = 1
+    while candidate in used:
+        suffix += 1
+        candidate = f"{name}_{suffix}.json"
+    used[candidate] = key
+    return candidate
+
+
+def explode_manifest(manifest: Dict[str, Any]) -> Dict[str, bytes]:
+    """
+    Splits a manifest into one file per top-level component.
+
+    Each entry of the manifest's top-level `kwargs` (e.g. `first`, `middle`, `last`
+    of a RunnableSequence) becomes `kwargs/<name>.json`. The remaining fields go to
+    `manifest.json`, where every split-out entry is replaced by `{"$ref": "kwargs/<name>.json"}`.
+    Manifests without a `kwargs` object are stored as a single `manifest.json`.
+
+    Returns a mapping of paths (relative to the manifest directory) to file contents.
+    """
+    files: Dict[str, bytes] = {}
+    kwargs = manifest.get("kwargs")
+    if not isinstance(kwargs, dict) or not kwargs:
+        files[ROOT_FILE_NAME] = serialize_json(manifest)
+        return files
+
+    used_names: Dict[str, str] = {}
+    root_kwargs: Dict[str, Any] = {}
+    for key, value in kwargs.items():
+        relative_path = f"kwargs/{_component_file_name(key, used_names)}"
+        files[relative_path] = serialize_json(value)
+        root_kwargs[key] = {"$ref": relative_path}
+
+    root = dict(manifest)
+    root["kwargs"] = root_kwargs
+    files[ROOT_FILE_NAME] = serialize_json(root)
+    return files
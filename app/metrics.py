@@ -0,0 +1,243 @@
+# app/metrics.py
+import os
+import re
+import time
+from typing import Any, List, Optional, Tuple
+
+from .targets import current_target
+
+# prometheus_client (a dependency) is imported by init_metrics() during startup rather
+# than with this module, so its import stays out of the measured import time of every
+# worker (see app/startup.py). Until then, and if it is not installed, every metric
+# below is a no-op and /metrics answers 503. Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (an
+# environment variable, read by prometheus_client at import time) so /metrics
+# aggregates all workers.
+_prometheus: Optional[Any] = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _NoopMetric:
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+_NOOP = _NoopMetric()
+
+
+class _LazyMetric:
+    """
+    A prometheus_client metric that is created by init_metrics(); a no-op until then.
+    """
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Tuple[str, ...] = (), **kwargs: Any):
+        self._definition = (kind, name, documentation, labelnames, kwargs)
+        self._metric: Any = _NOOP
+
+    def _create(self, prometheus_client: Any) -> None:
+        kind, name, documentation, labelnames, kwargs = self._definition
+        self._metric = getattr(prometheus_client, kind)(name, documentation, labelnames, **kwargs)
+
+    def labels(self, *args: Any, **kwargs: Any) -> Any:
+        return self._metric.labels(*args, **kwargs)
+
+    def observe(self, value: float) -> None:
+        self._metric.observe(value)
+
+    def inc(self, amount: float = 1) -> None:
+        self._metric.inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._metric.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._metric.set(value)
+
+
+_metrics: List[_LazyMetric] = []
+
+
+def _metric(kind: str, name: str, documentation: str, labelnames: Tuple[str, ...] = (), **kwargs: Any) -> _LazyMetric:
+    metric = _LazyMetric(kind, name, documentation, labelnames, **kwargs)
+    _metrics.append(metric)
+    return metric
+
+
+def init_metrics() -> bool:
+    """
+    Imports prometheus_client and creates the metrics. Called once per worker process
+    from the app lifespan; safe to call again. Returns False if it is not installed.
+    """
+    global _prometheus
+    if _prometheus is not None:
+        return True
+    try:
+        import prometheus_client
+    except ImportError:
+        return False
+    for metric in _metrics:
+        metric._create(prometheus_client)
+    _prometheus = prometheus_client
+    return True
+
+
+# Gauges use "livesum" so /metrics adds up the workers that are still running
+HTTP_REQUEST_DURATION = _metric(
+    "Histogram", "http_request_duration_seconds", "Latency of requests to this service, by route template.",
+    ("method", "route", "status"), buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = _metric(
+    "Gauge", "http_requests_in_progress", "Requests to this service currently being handled.",
+    multiprocess_mode="livesum",
+)
+GITHUB_REQUEST_DURATION = _metric(
+    "Histogram", "github_request_duration_seconds", "Latency of each GitHub API call (per attempt), by step and status code.",
+    ("step", "status"), buckets=LATENCY_BUCKETS,
+)
+GITHUB_REQUESTS = _metric(
+    "Counter", "github_requests", "GitHub API calls (per attempt), by step and status code.",
+    ("step", "status"),
+)
+GITHUB_QUEUE_WAIT = _metric(
+    "Histogram", "github_scheduler_wait_seconds", "Time a GitHub call waited for the rate limiter and a concurrency slot.",
+    buckets=LATENCY_BUCKETS,
+)
+GITHUB_REQUESTS_IN_FLIGHT = _metric(
+    "Gauge", "github_requests_in_flight", "GitHub API calls currently in flight, by target.",
+    ("target",), multiprocess_mode="livesum",
+)
+GITHUB_REQUESTS_WAITING = _metric(
+    "Gauge", "github_requests_waiting", "GitHub API calls waiting in the scheduler, by target.",
+    ("target",), multiprocess_mode="livesum",
+)
+GITHUB_POOL_CONNECTIONS = _metric(
+    "Gauge", "github_pool_connections", "Connections in the GitHub HTTP pool, by target and state (active or idle).",
+    ("target", "state"), multiprocess_mode="livesum",
+)
+SHARED_LOCK_WAIT = _metric(
+    "Histogram", "shared_write_lock_wait_seconds", "Time a write waited for the per-file lock shared by all workers.",
+    buckets=LATENCY_BUCKETS,
+)
+GITHUB_RATE_LIMIT_REMAINING = _metric(
+    "Gauge", "github_rate_limit_remaining", "Remaining GitHub API quota as last reported by GitHub, by target.",
+    ("target",), multiprocess_mode="livemin",
+)
+
+# (method, path below /repos/{owner}/{repo}/, step) for every GitHub call the service makes
+_GITHUB_STEPS = [
+    ("GET", re.compile(r"git/refs?/heads/(?P<branch>.+)"), "get_ref"),
+    ("PATCH", re.compile(r"git/refs/heads/.+"), "update_ref"),
+    ("POST", re.compile(r"git/refs"), "create_ref"),
+    ("GET", re.compile(r"contents/.+"), "get_file_sha"),
+    ("PUT", re.compile(r"contents/.+"), "put_content"),
+    ("POST", re.compile(r"git/blobs"), "create_blob"),
+    ("POST", re.compile(r"git/trees"), "create_tree"),
+    ("GET", re.compile(r"git/trees/.+"), "get_tree"),
+    ("POST", re.compile(r"git/commits"), "create_commit"),
+    ("GET", re.compile(r"git/commits/.+"), "get_commit"),
+    ("POST", re.compile(r"pulls"), "create_pr"),
+    ("GET", re.compile(r"pulls"), "list_prs"),
+    ("GET", re.compile(r"pulls/\d+"), "get_pr"),
+    ("PATCH", re.compile(r"pulls/\d+"), "update_pr"),
+]
+_REPO_PATH = re.compile(r"/repos/[^/]+/[^/]+/(.*)$")
+
+
+def github_step(method: str, path: str) -> str:
+    """
+    Names the GitHub step of a call for metric labels, e.g. "put_content" or
+    "get_base_sha" (a ref lookup of the current target's branch). Unknown calls are "other".
+    """
+    match = _REPO_PATH.search(path)
+    if match is None:
+        return "other"
+    rest = match.group(1)
+    for step_method, pattern, step in _GITHUB_STEPS:
+        if method != step_method:
+            continue
+        step_match = pattern.fullmatch(rest)
+        if step_match is None:
+            continue
+        if step == "get_ref" and step_match.group("branch") == current_target().branch:
+            return "get_base_sha"
+        return step
+    return "other"
+
+
+def observe_github_call(step: str, status: str, duration: float) -> None:
+    GITHUB_REQUEST_DURATION.labels(step, status).observe(duration)
+    GITHUB_REQUESTS.labels(step, status).inc()
+
+
+def observe_connection_pool(target: str, transport: Any) -> None:
+    """
+    Updates the pool gauges of a target from its httpx transport's connection pool, if it has one.
+    """
+    connections = getattr(getattr(transport, "_pool", None), "connections", None)
+    if connections is None:
+        return
+    idle = sum(1 for connection in connections if connection.is_idle())
+    GITHUB_POOL_CONNECTIONS.labels(target, "idle").set(idle)
+    GITHUB_POOL_CONNECTIONS.labels(target, "active").set(len(connections) - idle)
+
+
+def render_metrics() -> Optional[Tuple[bytes, str]]:
+    """
+    Returns (body, content type) for /metrics, or None if prometheus_client is not installed
+    (or init_metrics() has not run).
+    """
+    if _prometheus is None:
+        return None
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = _prometheus.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = _prometheus.REGISTRY
+    return _prometheus.generate_latest(registry), _prometheus.CONTENT_TYPE_LATEST
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware that records the latency of every request, labelled with the
+    route template (e.g. /webhook/jobs/{job_id}) so ids do not explode the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status_code)).observe(time.perf_counter() - started)
@@ -1,6 +1,8 @@
 # app/models.py
-from typing import Dict, Any
-from pydantic import BaseModel, Field
+from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+
+from .serialization import dumps_manifest
 
 class WebhookPayload(BaseModel):
     """
@@ -19,6 +21,22 @@ class WebhookPayload(BaseModel):
         ...,
         description="Timestamp indicating when the event was created (ISO format preferred)."
     )
+    target: Optional[str] = Field(
+        None,
+        description="Key of the routing-table target to commit to (see GITHUB_TARGETS_FILE). "
+                    "Overridden by /webhook/{target}/...; defaults to the configured repository."
+    )
+
+    # Serialized manifest, computed once and shared by the blob, the commit and the PR body
+    _manifest_json: Optional[str] = PrivateAttr(default=None)
+
+    def manifest_json(self) -> str:
+        """
+        Returns the manifest as the JSON text committed to GitHub (see app/serialization.py).
+        """
+        if self._manifest_json is None:
+            self._manifest_json = dumps_manifest(self.manifest)
+        return self._manifest_json
 
     # Example of how this model might be used in a request:
     # {
@@ -1,23 +1,23 @@
 # app/routers/webhook_router.py
-import json
-import base64
-import datetime # For PR branch naming
-from typing import Dict, Any
+import logging
+from typing import Optional, Literal, Callable, Awaitable
 
-import httpx
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Depends, Query, Header, Request
+from fastapi.responses import JSONResponse
 
 # Relative imports from other modules within the 'app' package
 from ..models import WebhookPayload
 from ..config import settings
-# Import all necessary helper functions
-from ..helpers import (
-    commit_manifest_to_github_direct,
-    get_base_branch_sha,
-    create_new_branch_from_base,
-    commit_file_to_branch,
-    create_github_pull_request
-)
+# The GitHub flows behind each endpoint (shared with the background job workers)
+from ..workflows import run_direct_commit, run_pull_request
+from ..job_queue import submit_job, get_job_queue
+from ..idempotency import IdempotencyStore, StoredResponse
+from ..webhook_body import read_webhook_payload, WEBHOOK_PAYLOAD_OPENAPI
+from ..logging_config import set_correlation_id
+from ..targets import resolve_target
+from ..bulk import bulk_commit_response, BULK_OPENAPI
+
+logger = logging.getLogger(__name__)
 
 # Create an APIRouter instance.
 router = APIRouter(
@@ -25,101 +25,163 @@ router = APIRouter(
     tags=["GitHub Webhooks"], # Grouped under "GitHub Webhooks" in API docs
 )
 
-@router.post("/github-commit", status_code=201)
-async def handle_webhook_direct_commit_endpoint(payload: WebhookPayload = Body(...)):
-    """
-    Webhook endpoint to receive prompt commit events and commit DIRECTLY to the configured branch.
-    """
-    try:
-        # Call the helper for direct commits
-        github_response = await commit_manifest_to_github_direct(payload)
-        
-        return {
-            "message": "Webhook received and manifest committed directly to GitHub successfully.",
-            "github_commit_details": github_response.get("commit", {}),
-            "github_content_details": github_response.get("content", {})
-        }
-    except HTTPException:
-        raise # Re-raise if it's an HTTPException from the helper
-    except Exception as e:
-        error_message = f"An unexpected error occurred during direct commit: {str(e)}"
-        print(f"[ERROR] {error_message}")
-        raise HTTPException(status_code=500, detail="An internal server error occurred during direct commit.")
+# ?mode=async returns 202 with a job id; ?mode=sync waits for GitHub. Defaults to settings.WEBHOOK_DEFAULT_MODE.
+ModeQuery = Query(None, description="'sync' waits for GitHub, 'async' queues the work and returns 202 with a job id.")
+IdempotencyKeyHeader = Header(None, alias="Idempotency-Key", description="Optional key for deduplicating retries. Defaults to the payload's commit_hash.")
+
+# Responses of recent webhooks, so retried deliveries do not create duplicate commits, branches or PRs
+idempotency_store = IdempotencyStore(
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+)
 
 
-@router.post("/github-pr", status_code=201) # New endpoint for creating Pull Requests
-async def handle_webhook_create_pr_endpoint(payload: WebhookPayload = Body(...)):
+def _is_async(mode: Optional[str]) -> bool:
+    return (mode or settings.WEBHOOK_DEFAULT_MODE) == "async"
+
+
+async def _respond_idempotently(endpoint: str, payload: WebhookPayload, idempotency_key: Optional[str], operation: Callable[[], Awaitable[StoredResponse]]) -> JSONResponse:
     """
-    Webhook endpoint to receive prompt commit events and create a GitHub Pull Request.
+    Runs the endpoint's operation through the idempotency store. Duplicates of a completed
+    webhook get the stored response with an `Idempotent-Replayed: true` header.
     """
-    # Use a short hash and timestamp for a unique branch name
-    short_commit_hash = payload.commit_hash[:12] # First 12 chars of the commit hash
-    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
-    new_branch_name = f"feature/prompt-{short_commit_hash}-{timestamp}"
-    
-    pr_title = f"feat: Update prompt manifest from webhook ({short_commit_hash})"
-    pr_body = (
-        f"Automated Pull Request from webhook event.\n\n"
-        f"Associated Commit Hash (from payload): `{payload.commit_hash}`\n"
-        f"Event Created At (from payload): `{payload.created_at}`\n\n"
-        f"Manifest details included in this PR:\n"
-        f"```json\n{json.dumps(payload.manifest, indent=2)}\n```"
+    # Ties the log lines of retried deliveries of the same webhook together
+    set_correlation_id(idempotency_key or payload.commit_hash)
+    # Unknown targets get a 404 before anything is queued or sent to GitHub
+    target = resolve_target(payload.target)
+    if not settings.IDEMPOTENCY_ENABLED:
+        status_code, body = await operation()
+        return JSONResponse(status_code=status_code, content=body)
+
+    key = f"{endpoint}:{target.key}:{idempotency_key or payload.commit_hash}"
+    (status_code, body), replayed = await idempotency_store.run(key, operation)
+    if replayed:
+        logger.info(f"Duplicate webhook for idempotency key '{key}'. Returning the stored response.")
+    return JSONResponse(
+        status_code=status_code,
+        content=body,
+        headers={"Idempotent-Replayed": "true"} if replayed else None,
     )
 
-    # Standard headers for GitHub API calls
-    headers = {
-        "Authorization": f"Bearer {settings.GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
 
-    # Serialize manifest to Base64 for the commit
-    manifest_json_string = json.dumps(payload.manifest, indent=2)
-    content_base64 = base64.b64encode(manifest_json_string.encode('utf-8')).decode('utf-8')
-    # Commit message for the commit on the new feature branch
-    commit_message_for_pr_branch = f"feat: Update prompt manifest for PR ({short_commit_hash})"
-
-    async with httpx.AsyncClient() as client:
+async def _direct_commit(payload: WebhookPayload, mode: Optional[str], idempotency_key: Optional[str]) -> JSONResponse:
+    async def operation() -> StoredResponse:
+        if _is_async(mode):
+            return 202, await submit_job("commit", payload)
         try:
-            # Step 1: Get the SHA of the base branch (e.g., main, develop)
-            base_sha = await get_base_branch_sha(client, headers)
-
-            # Step 2: Create a new branch from the base branch SHA
-            await create_new_branch_from_base(client, new_branch_name, base_sha, headers)
-
-            # Step 3: Commit the manifest file to the new feature branch
-            commit_details_on_new_branch = await commit_file_to_branch(
-                client, new_branch_name, settings.GITHUB_FILE_PATH, 
-                content_base64, commit_message_for_pr_branch, headers
-            )
-
-            # Step 4: Create the Pull Request from the new feature branch to the base branch
-            pr_details = await create_github_pull_request(
-                client, new_branch_name, settings.GITHUB_BRANCH, 
-                pr_title, pr_body, headers
-            )
-
-            # Determine success message based on PR creation status
-            response_message = "Pull Request created successfully."
-            if pr_details.get("status") == "already_exists":
-                response_message = pr_details.get("message", "Pull Request already exists.")
-
-
-            return {
-                "message": response_message,
-                "pull_request_url": pr_details.get("html_url"), # URL of the created/existing PR
-                "pull_request_details": pr_details, # Full PR details from GitHub API
-                "new_branch_name": new_branch_name,
-                "commit_on_branch_details": commit_details_on_new_branch.get("commit", {})
-            }
+            # Call the helper for direct commits
+            return 201, await run_direct_commit(payload)
+        except HTTPException:
+            raise # Re-raise if it's an HTTPException from the helper
+        except Exception as e:
+            error_message = f"An unexpected error occurred during direct commit: {str(e)}"
+            logger.exception(error_message)
+            raise HTTPException(status_code=500, detail="An internal server error occurred during direct commit.")
 
+    return await _respond_idempotently("github-commit", payload, idempotency_key, operation)
+
+
+async def _create_pr(payload: WebhookPayload, mode: Optional[str], idempotency_key: Optional[str]) -> JSONResponse:
+    async def operation() -> StoredResponse:
+        if _is_async(mode):
+            return 202, await submit_job("pr", payload)
+        try:
+            return 201, await run_pull_request(payload)
         except HTTPException:
             # Re-raise HTTPException if it was raised by one of the helpers
             raise
         except Exception as e:
             # Catch any other unexpected errors during the PR creation process
             error_message = f"An unexpected internal server error occurred during PR creation: {str(e)}"
-            print(f"[ERROR] {error_message}")
+            logger.exception(error_message)
             # Clean up the created branch if PR creation fails? (More advanced error handling)
             # For now, just raise a generic 500 error.
             raise HTTPException(status_code=500, detail="An internal server error occurred during PR creation.")
+
+    return await _respond_idempotently("github-pr", payload, idempotency_key, operation)
+
+
+@router.post("/github-commit", status_code=201, openapi_extra=WEBHOOK_PAYLOAD_OPENAPI)
+async def handle_webhook_direct_commit_endpoint(
+    payload: WebhookPayload = Depends(read_webhook_payload),
+    mode: Optional[Literal["sync", "async"]] = ModeQuery,
+    idempotency_key: Optional[str] = IdempotencyKeyHeader,
+):
+    """
+    Webhook endpoint to receive prompt commit events and commit DIRECTLY to the configured branch
+    (or to the branch of the payload's `target`).
+    """
+    return await _direct_commit(payload, mode, idempotency_key)
+
+
+@router.post("/github-pr", status_code=201, openapi_extra=WEBHOOK_PAYLOAD_OPENAPI) # New endpoint for creating Pull Requests
+async def handle_webhook_create_pr_endpoint(
+    payload: WebhookPayload = Depends(read_webhook_payload),
+    mode: Optional[Literal["sync", "async"]] = ModeQuery,
+    idempotency_key: Optional[str] = IdempotencyKeyHeader,
+):
+    """
+    Webhook endpoint to receive prompt commit events and create a GitHub Pull Request.
+    """
+    return await _create_pr(payload, mode, idempotency_key)
+
+
+@router.post("/github-commit/bulk", openapi_extra=BULK_OPENAPI)
+async def handle_webhook_bulk_commit_endpoint(request: Request):
+    """
+    Bulk direct commits for backfills: the body is NDJSON (one WebhookPayload per line,
+    optionally gzip-encoded). Records are grouped by target file and committed in batches,
+    and one NDJSON result line per record is streamed back as its commit finishes,
+    followed by a summary line.
+    """
+    return bulk_commit_response(request)
+
+
+@router.post("/{target}/github-commit", status_code=201, openapi_extra=WEBHOOK_PAYLOAD_OPENAPI)
+async def handle_target_direct_commit_endpoint(
+    target: str,
+    payload: WebhookPayload = Depends(read_webhook_payload),
+    mode: Optional[Literal["sync", "async"]] = ModeQuery,
+    idempotency_key: Optional[str] = IdempotencyKeyHeader,
+):
+    """
+    Same as /webhook/github-commit, for the routing-table target `target` (see GITHUB_TARGETS_FILE).
+    """
+    payload.target = target
+    return await _direct_commit(payload, mode, idempotency_key)
+
+
+@router.post("/{target}/github-pr", status_code=201, openapi_extra=WEBHOOK_PAYLOAD_OPENAPI)
+async def handle_target_create_pr_endpoint(
+    target: str,
+    payload: WebhookPayload = Depends(read_webhook_payload),
+    mode: Optional[Literal["sync", "async"]] = ModeQuery,
+    idempotency_key: Optional[str] = IdempotencyKeyHeader,
+):
+    """
+    Same as /webhook/github-pr, for the routing-table target `target` (see GITHUB_TARGETS_FILE).
+    """
+    payload.target = target
+    return await _create_pr(payload, mode, idempotency_key)
+
+
+@router.post("/{target}/github-commit/bulk", openapi_extra=BULK_OPENAPI)
+async def handle_target_bulk_commit_endpoint(target: str, request: Request):
+    """
+    Same as /webhook/github-commit/bulk, with every record sent to the routing-table target `target`.
+    """
+    # Unknown targets get a 404 before the body is read
+    resolve_target(target)
+    return bulk_commit_response(request, target)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status_endpoint(job_id: str):
+    """
+    Returns the status of a webhook queued in asynchronous mode, including the
+    GitHub result once it has succeeded or the last error if it failed.
+    """
+    job = await get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job
@@ -0,0 +1,107 @@
+# app/serialization.py
+import logging
+import json
+import zlib
+from typing import Any, Optional
+
+from fastapi import HTTPException
+
+from .config import settings
+
+# orjson serializes large manifests several times faster than the standard library
+# (it is a dependency, but the service still runs without it). Both encoders produce
+# the same text, except for the exponent notation of very large or small floats
+# (1e20 vs 1e+20).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Content-Encoding -> zlib wbits
+_DECOMPRESS_WBITS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "x-gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+
+
+def dumps_manifest(value: Any) -> str:
+    """
+    Serializes a manifest (or one component of it) as JSON indented by 2 spaces, with
+    non-ASCII characters escaped, byte for byte as the service always has. With
+    settings.MANIFEST_SORT_KEYS the keys are sorted, so the committed file only changes
+    when the content does, not when the sender reorders keys.
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2
+        if settings.MANIFEST_SORT_KEYS:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            text = orjson.dumps(value, option=option).decode("utf-8")
+        except TypeError:
+            # orjson rejects integers beyond 64 bits and a few other edge cases
+            text = None
+        # orjson cannot escape non-ASCII characters; such manifests take the slower path
+        if text is not None and text.isascii():
+            return text
+    return json.dumps(value, indent=2, sort_keys=settings.MANIFEST_SORT_KEYS)
+
+
+def loads_json(data: bytes) -> Any:
+    """
+    Parses a JSON document with orjson when available.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _too_large(limit: int) -> HTTPException:
+    error_detail = f"Request body exceeds the maximum size of {limit} bytes."
+    logger.warning(error_detail)
+    return HTTPException(status_code=413, detail=error_detail)
+
+
+def body_decompressor(content_encoding: str) -> Optional[Any]:
+    """
+    Returns a zlib decompressor for the request's Content-Encoding (gzip or deflate),
+    or None for an uncompressed body. Raises a 415 for any other encoding.
+    """
+    encoding = content_encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return None
+    wbits = _DECOMPRESS_WBITS.get(encoding)
+    if wbits is None:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding '{content_encoding}'. Use gzip or deflate.")
+    return zlib.decompressobj(wbits)
+
+
+def decode_body(body: bytes, content_encoding: str) -> bytes:
+    """
+    Undoes the request's Content-Encoding (gzip or deflate). The decompressed size is
+    capped at settings.MAX_WEBHOOK_BODY_BYTES as well, so a small compressed body cannot
+    expand into an arbitrarily large one.
+    """
+    decompressor = body_decompressor(content_encoding)
+    if decompressor is None:
+        return body
+
+    limit = settings.MAX_WEBHOOK_BODY_BYTES
+    encoding = content_encoding.strip().lower()
+    try:
+        decoded = decompressor.decompress(body, limit + 1)
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Request body is not valid {encoding} data: {str(e)}")
+    if len(decoded) > limit or decompressor.unconsumed_tail:
+        raise _too_large(limit)
+    return decoded
+
+
+def check_body_size(size: int) -> None:
+    """
+    Rejects a (compressed) request body larger than settings.MAX_WEBHOOK_BODY_BYTES with a 413.
+    """
+    if size > settings.MAX_WEBHOOK_BODY_BYTES:
+        raise _too_large(settings.MAX_WEBHOOK_BODY_BYTES)
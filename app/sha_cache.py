@@ -0,0 +1,70 @@
+# app/sha_cache.py
+import time
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .config import settings
+
+
+def git_blob_sha(content: bytes) -> str:
+    """
+    Computes the git blob SHA-1 of `content`, i.e. the `sha` GitHub reports for a file
+    with exactly these bytes.
+    """
+    header = f"blob {len(content)}\0".encode("utf-8")
+    return hashlib.sha1(header + content).hexdigest()
+
+
+@dataclass
+class CachedFileSha:
+    blob_sha: str
+    etag: Optional[str]  # ETag of the last contents GET, for If-None-Match revalidation
+    validated_at: float  # time.monotonic() when GitHub last confirmed blob_sha
+
+
+class FileShaCache:
+    """
+    Last known blob SHA of each (repo, branch, path), refreshed from PUT responses.
+
+    Entries younger than `ttl` seconds are trusted as-is. Older entries are still
+    used for PUTs (a 409 tells us they are stale), but a no-op check revalidates
+    them first with a conditional GET. Beyond `max_entries` the least recently used
+    entries are dropped, e.g. those of per-event PR branches.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], CachedFileSha]" = OrderedDict()
+
+    def get(self, repo: str, branch: str, path: str) -> Optional[CachedFileSha]:
+        key = (repo, branch, path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def is_fresh(self, entry: CachedFileSha) -> bool:
+        return time.monotonic() - entry.validated_at < self.ttl
+
+    def update(self, repo: str, branch: str, path: str, blob_sha: str, etag: Optional[str] = None, age: float = 0.0) -> None:
+        # `age`: seconds since GitHub confirmed blob_sha, for SHAs learnt from another worker
+        key = (repo, branch, path)
+        self._entries[key] = CachedFileSha(blob_sha, etag, time.monotonic() - age)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def mark_validated(self, repo: str, branch: str, path: str) -> None:
+        entry = self._entries.get((repo, branch, path))
+        if entry is not None:
+            entry.validated_at = time.monotonic()
+
+    def invalidate(self, repo: str, branch: str, path: str) -> None:
+        self._entries.pop((repo, branch, path), None)
+
+
+# Last known blob SHA per (repo, branch, path) for this worker process
+file_sha_cache = FileShaCache(ttl=settings.SHA_CACHE_TTL_SECONDS, max_entries=settings.SHA_CACHE_MAX_ENTRIES)
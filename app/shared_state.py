@@ -0,0 +1,310 @@
+# app/shared_state.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+
+from fastapi import HTTPException
+
+from .config import settings
+from .metrics import SHARED_LOCK_WAIT
+from .sqlite_db import open_database
+
+# fcntl is POSIX only; elsewhere writes are serialized within a process only
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# State shared by the worker processes of one host, without external services:
+# - write locks per (repo, branch, path), as flock()ed files, so two workers never
+#   PUT the same file at once (the kernel releases them if a worker dies);
+# - the last known blob SHA of each file, so a worker sees what another one committed;
+# - completed and in-flight webhook responses, so a retry that lands on another
+#   worker is deduplicated too.
+# The SHA and response tables live in a small SQLite database (see app/sqlite_db.py).
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_shas (
+    repo TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    path TEXT NOT NULL,
+    blob_sha TEXT NOT NULL,
+    validated_at REAL NOT NULL,
+    PRIMARY KEY (repo, branch, path)
+);
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    status_code INTEGER,
+    body TEXT,
+    expires_at REAL NOT NULL
+);
+"""
+
+_LOCK_POLL_INITIAL = 0.005
+_LOCK_POLL_MAX = 0.1
+_RESPONSE_POLL_INITIAL = 0.05
+_RESPONSE_POLL_MAX = 1.0
+_PRUNE_INTERVAL = 600.0
+
+# (HTTP status code, response body) of a webhook endpoint, as in app/idempotency.py
+StoredResponse = Tuple[int, Dict[str, Any]]
+
+
+class _ProcessLocks:
+    """
+    One asyncio.Lock per key, dropped again once nobody holds or waits for it, so
+    coroutines of the same process queue up here instead of polling the file lock.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, List[Any]] = {}  # key -> [lock, holders and waiters]
+
+    async def acquire(self, key: str, timeout: float) -> None:
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(entry[0].acquire(), timeout)
+        except BaseException:
+            self._drop(key)
+            raise
+
+    def release(self, key: str) -> None:
+        self._locks[key][0].release()
+        self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._locks[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._locks[key]
+
+
+class SharedState:
+    """
+    Host-local state shared by all worker processes: a SQLite database for file SHAs
+    and webhook responses, and a directory of lock files.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock_dir = os.path.join(directory, "locks")
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = open_database(os.path.join(directory, "shared_state.sqlite3"), _SCHEMA)
+        self._pruned_at = 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- Write locks ---
+
+    def _lock_file_path(self, key: str) -> str:
+        return os.path.join(self.lock_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".lock")
+
+    async def acquire_file_lock(self, key: str, deadline: float) -> Optional[int]:
+        """
+        Takes the exclusive file lock for `key`, polling with backoff until `deadline`
+        (time.monotonic()). Returns the open file descriptor; closing it releases the lock.
+        Returns None when file locks are not available on this platform.
+        """
+        if fcntl is None:
+            return None
+        fd = os.open(self._lock_file_path(key), os.O_RDWR | os.O_CREAT, 0o644)
+        delay = _LOCK_POLL_INITIAL
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                if time.monotonic() + delay > deadline:
+                    os.close(fd)
+                    raise TimeoutError(key)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _LOCK_POLL_MAX)
+            except BaseException:
+                os.close(fd)
+                raise
+
+    # --- File SHAs ---
+
+    def _get_file_sha(self, repo: str, branch: str, path: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blob_sha, validated_at FROM file_shas WHERE repo = ? AND branch = ? AND path = ?",
+                (repo, branch, path),
+            ).fetchone()
+        if row is None:
+            return None
+        return row["blob_sha"], max(0.0, time.time() - row["validated_at"])
+
+    def _set_file_sha(self, repo: str, branch: str, path: str, blob_sha: Optional[str], age: float) -> None:
+        with self._lock:
+            if blob_sha is None:
+                self._conn.execute(
+                    "DELETE FROM file_shas WHERE repo = ? AND branch = ? AND path = ?", (repo, branch, path)
+                )
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO file_shas (repo, branch, path, blob_sha, validated_at) VALUES (?, ?, ?, ?, ?)",
+                    (repo, branch, path, blob_sha, time.time() - age),
+                )
+
+    async def get_file_sha(self, repo: str, branch: str, path: str) -> Optional[Tuple[str, float]]:
+        """
+        Returns (blob_sha, seconds since it was last confirmed by GitHub), or None.
+        """
+        return await asyncio.to_thread(self._get_file_sha, repo, branch, path)
+
+    async def set_file_sha(self, repo: str, branch: str, path: str, blob_sha: Optional[str], age: float = 0.0) -> None:
+        """
+        Records the blob SHA of a file (None: unknown or deleted) for the other workers.
+        """
+        await asyncio.to_thread(self._set_file_sha, repo, branch, path, blob_sha, age)
+
+    # --- Webhook responses ---
+
+    def _claim_response(self, key: str, lease_seconds: float) -> Tuple[str, Optional[StoredResponse]]:
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE, so two processes can never both claim the key
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT status_code, body, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row["expires_at"] <= now:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, status_code, body, expires_at) VALUES (?, NULL, NULL, ?)",
+                        (key, now + lease_seconds),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None or row["expires_at"] <= now:
+            return "claimed", None
+        if row["status_code"] is None:
+            return "pending", None
+        return "stored", (row["status_code"], json.loads(row["body"]))
+
+    def _store_response(self, key: str, response: StoredResponse, ttl: float) -> None:
+        now = time.time()
+        status_code, body = response
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, status_code, body, expires_at) VALUES (?, ?, ?, ?)",
+                (key, status_code, json.dumps(body, default=str), now + ttl),
+            )
+            if now - self._pruned_at > _PRUNE_INTERVAL:
+                self._pruned_at = now
+                self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+
+    def _release_response(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ? AND status_code IS NULL", (key,))
+
+    async def claim_response(self, key: str, lease_seconds: Optional[float] = None) -> Optional[StoredResponse]:
+        """
+        Returns the response another worker stored for `key`, or None once this worker
+        has claimed the key and should run the operation itself. While another worker
+        is running it, waits for its response (or for its claim to expire).
+        """
+        if lease_seconds is None:
+            lease_seconds = settings.SHARED_IDEMPOTENCY_LEASE_SECONDS
+        delay = _RESPONSE_POLL_INITIAL
+        while True:
+            state, response = await asyncio.to_thread(self._claim_response, key, lease_seconds)
+            if state == "stored":
+                return response
+            if state == "claimed":
+                return None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RESPONSE_POLL_MAX)
+
+    async def store_response(self, key: str, response: StoredResponse, ttl: float) -> None:
+        await asyncio.to_thread(self._store_response, key, response, ttl)
+
+    async def release_response(self, key: str) -> None:
+        """
+        Drops this worker's claim on `key` after a failed operation, so a retry runs again.
+        """
+        await asyncio.to_thread(self._release_response, key)
+
+
+_shared: Optional[SharedState] = None
+_process_locks = _ProcessLocks()
+
+
+async def start_shared_state() -> SharedState:
+    """
+    Opens the host-wide shared state (settings.SHARED_STATE_DIR) for this worker process.
+    """
+    global _shared
+    if _shared is None:
+        _shared = await asyncio.to_thread(SharedState, settings.SHARED_STATE_DIR)
+        if fcntl is None:
+            logger.warning("File locks are not available on this platform; writes are only serialized within each worker.")
+    return _shared
+
+
+def stop_shared_state() -> None:
+    global _shared
+    if _shared is not None:
+        _shared.close()
+        _shared = None
+
+
+def get_shared_state() -> Optional[SharedState]:
+    """
+    Returns the shared state, or None if it is disabled (each worker then keeps its own).
+    """
+    return _shared
+
+
+@asynccontextmanager
+async def write_lock(repo: str, branch: str, path: str) -> AsyncIterator[None]:
+    """
+    Serializes writes to one file (or manifest directory) on one branch: across the
+    coroutines of this process and, with shared state enabled, across all worker
+    processes on the host. Raises a 503 if the lock is not free within
+    settings.SHARED_LOCK_TIMEOUT_SECONDS.
+    """
+    key = f"{repo}:{branch}:{path}"
+    started = time.monotonic()
+    try:
+        await _process_locks.acquire(key, settings.SHARED_LOCK_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, TimeoutError):
+        raise _lock_timeout(branch, path)
+    fd = None
+    try:
+        if _shared is not None:
+            try:
+                fd = await _shared.acquire_file_lock(key, started + settings.SHARED_LOCK_TIMEOUT_SECONDS)
+            except TimeoutError:
+                raise _lock_timeout(branch, path)
+            except OSError as e:
+                logger.warning(f"Could not take the file lock for '{key}': {str(e)}. Continuing with the in-process lock only.")
+        SHARED_LOCK_WAIT.observe(time.monotonic() - started)
+        yield
+    finally:
+        if fd is not None:
+            os.close(fd)
+        _process_locks.release(key)
+
+
+def _lock_timeout(branch: str, path: str) -> HTTPException:
+    error_detail = (
+        f"Timed out after {settings.SHARED_LOCK_TIMEOUT_SECONDS}s waiting for another write to "
+        f"'{path}' on '{branch}' to finish."
+    )
+    logger.error(error_detail)
+    return HTTPException(status_code=503, detail=error_detail)
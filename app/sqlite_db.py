@@ -0,0 +1,20 @@
+# app/sqlite_db.py
+import sqlite3
+
+# The job queue (app/job_queue.py) and the shared state (app/shared_state.py) each keep
+# a small SQLite database that every worker process on the host opens. All SQLite
+# calls are blocking, so their async methods run them in a thread.
+
+
+def open_database(path: str, schema: str) -> sqlite3.Connection:
+    """
+    Opens (creating if needed) the SQLite database at `path` for use from worker
+    threads, in WAL mode so readers do not block the writer, and applies `schema`.
+    Transactions are explicit (autocommit unless BEGIN is issued).
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(schema)
+    return conn
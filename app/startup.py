@@ -0,0 +1,132 @@
+# app/startup.py
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+
+from . import IMPORT_STARTED
+from .config import settings, CONFIG_LOAD_SECONDS
+from .github_client import get_github_client
+from .targets import GitHubTarget, get_targets, use_target
+from .git_data import get_branch_head_sha, diff_exploded_manifest
+from .helpers import prefetch_file_sha
+from .manifest_layout import exploded_manifest_dir
+
+logger = logging.getLogger(__name__)
+
+# Cold start of a worker process. The time spent importing the app, reading the
+# settings and in each startup step is recorded. A warm-up then opens every target's
+# GitHub connection pool (DNS, TCP and TLS) and prefetches what the first webhooks
+# would otherwise fetch: the branch head SHA and the file's blob SHA. GET /ready
+# answers 503 until the warm-up has finished, so a load balancer only sends traffic to
+# warm workers, while /health reports liveness from the start.
+
+_timings: Dict[str, float] = {}  # phase -> milliseconds
+_warm_up: Dict[str, str] = {}  # target key -> "ok", or why it could not be warmed up
+_warm_up_task: Optional[asyncio.Task] = None
+_ready = False
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def record_import_time() -> None:
+    """
+    Records how long importing the app (from app/__init__.py to the end of app/main.py)
+    and reading the settings took. Called once app/main.py has been imported.
+    """
+    _timings["import"] = _ms(time.perf_counter() - IMPORT_STARTED)
+    _timings["config"] = _ms(CONFIG_LOAD_SECONDS)
+
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """
+    Times one startup step (e.g. opening the GitHub clients) for the startup report.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings[name] = _ms(time.perf_counter() - started)
+
+
+async def _warm_up_target(target: GitHubTarget, slots: asyncio.Semaphore) -> None:
+    async with slots:
+        with use_target(target):
+            client = get_github_client()
+            # The first call also opens the connection (DNS, TCP, TLS) and keeps it in the pool
+            head_sha = await get_branch_head_sha(client, target.branch)
+            if target.manifest_layout == "exploded":
+                # Caches the listing of the manifest directory; the (empty) diff is not needed
+                await diff_exploded_manifest(client, target.branch, head_sha, exploded_manifest_dir(), {})
+            else:
+                await prefetch_file_sha(client)
+
+
+async def _run_warm_up() -> None:
+    global _ready
+    started = time.perf_counter()
+    # Each target's scheduler only limits its own calls; this keeps a long routing table
+    # from sending every worker's warm-up calls to GitHub at once
+    slots = asyncio.Semaphore(settings.GITHUB_MAX_CONCURRENT_REQUESTS)
+    tasks = {key: asyncio.create_task(_warm_up_target(target, slots)) for key, target in get_targets().items()}
+    try:
+        _, pending = await asyncio.wait(tasks.values(), timeout=settings.WARMUP_TIMEOUT_SECONDS)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for key, task in tasks.items():
+            if task in pending:
+                _warm_up[key] = f"timed out after {settings.WARMUP_TIMEOUT_SECONDS}s"
+            elif task.exception() is not None:
+                error = task.exception()
+                _warm_up[key] = f"failed: {error.detail if isinstance(error, HTTPException) else str(error)}"
+            else:
+                _warm_up[key] = "ok"
+            if _warm_up[key] != "ok":
+                logger.warning(f"Could not warm up target '{key}': {_warm_up[key]}. The first webhook will fetch what it needs.")
+    finally:
+        _timings["warm_up"] = _ms(time.perf_counter() - started)
+    # Ready even if some targets could not be warmed up: webhooks still work, only slower
+    _ready = True
+    logger.info("Worker is ready.", extra={"startup_ms": dict(_timings), "warm_up": dict(_warm_up)})
+
+
+def start_warm_up() -> None:
+    """
+    Starts the warm-up in the background (or reports ready right away if
+    settings.WARMUP_ENABLED is off). Called at the end of the app lifespan's startup.
+    """
+    global _warm_up_task, _ready
+    _warm_up.clear()
+    _timings.pop("warm_up", None)
+    if not settings.WARMUP_ENABLED:
+        _ready = True
+        logger.info("Worker is ready.", extra={"startup_ms": dict(_timings)})
+        return
+    _warm_up_task = asyncio.create_task(_run_warm_up())
+
+
+async def stop_warm_up() -> None:
+    global _warm_up_task, _ready
+    _ready = False
+    if _warm_up_task is not None:
+        _warm_up_task.cancel()
+        await asyncio.gather(_warm_up_task, return_exceptions=True)
+        _warm_up_task = None
+
+
+def readiness() -> Tuple[bool, Dict[str, Any]]:
+    """
+    Returns (ready, report) for GET /ready: the startup timings and the warm-up result per target.
+    """
+    return _ready, {
+        "status": "ready" if _ready else "warming_up",
+        "startup_ms": dict(_timings),
+        "warm_up": dict(_warm_up),
+    }
@@ -0,0 +1,191 @@
+# app/targets.py
+import os
+import re
+import json
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Routing table of GitHub targets (repository, branch, file, token and limits).
+# The repository configured with GITHUB_REPO_OWNER/GITHUB_REPO_NAME is always the
+# "default" target; GITHUB_TARGETS_FILE adds more. A webhook picks its target with
+# the /webhook/{target}/... path or the payload's `target` field, and the GitHub flows
+# read it from a context variable, so they follow the webhook into background jobs.
+
+DEFAULT_TARGET_KEY = "default"
+_TARGET_KEY_PATTERN = re.compile(r"[A-Za-z0-9._-]+")
+
+
+class GitHubTarget(BaseModel):
+    """
+    Where one webhook target commits to, and its share of this worker's GitHub capacity.
+    Every target has its own HTTP client, connection pool and scheduler (rate limit
+    budget and concurrency cap), and its writes are serialized per file.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    key: str
+    owner: str
+    repo: str
+    branch: str
+    file_path: str
+    manifest_layout: str
+    manifest_dir: Optional[str]
+    token: str = Field(repr=False)
+    rate_limit_per_second: float
+    rate_limit_burst: int
+    max_concurrent_requests: int
+    max_connections: int
+
+    @property
+    def full_name(self) -> str:
+        # "owner/name", for keys of per-repository state
+        return f"{self.owner}/{self.repo}"
+
+    @property
+    def api_path(self) -> str:
+        # Relative to the client's base_url (settings.GITHUB_API_BASE_URL)
+        return f"/repos/{self.owner}/{self.repo}"
+
+
+class _TargetEntry(BaseModel):
+    """
+    One entry of GITHUB_TARGETS_FILE. Omitted fields fall back to the global settings.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+    owner: str
+    repo: str
+    branch: Optional[str] = None
+    file_path: Optional[str] = None
+    manifest_layout: Optional[str] = Field(None, pattern="^(single|exploded)$")
+    manifest_dir: Optional[str] = None
+    token_env: Optional[str] = None  # Name of the environment variable holding the token
+    rate_limit_per_second: Optional[float] = Field(None, ge=0)
+    rate_limit_burst: Optional[int] = Field(None, ge=1)
+    max_concurrent_requests: Optional[int] = Field(None, ge=1)
+    max_connections: Optional[int] = Field(None, ge=1)
+
+
+def _default_target() -> GitHubTarget:
+    return GitHubTarget(
+        key=DEFAULT_TARGET_KEY,
+        owner=settings.GITHUB_REPO_OWNER,
+        repo=settings.GITHUB_REPO_NAME,
+        branch=settings.GITHUB_BRANCH,
+        file_path=settings.GITHUB_FILE_PATH,
+        manifest_layout=settings.GITHUB_MANIFEST_LAYOUT,
+        manifest_dir=settings.GITHUB_MANIFEST_DIR,
+        token=settings.GITHUB_TOKEN,
+        rate_limit_per_second=settings.GITHUB_RATE_LIMIT_PER_SECOND,
+        rate_limit_burst=settings.GITHUB_RATE_LIMIT_BURST,
+        max_concurrent_requests=settings.GITHUB_MAX_CONCURRENT_REQUESTS,
+        max_connections=settings.GITHUB_HTTP_MAX_CONNECTIONS,
+    )
+
+
+def _target_from_entry(key: str, entry: _TargetEntry, default: GitHubTarget) -> GitHubTarget:
+    token = default.token
+    if entry.token_env:
+        token = os.environ.get(entry.token_env, "")
+        if not token:
+            raise ValueError(f"Target '{key}': environment variable '{entry.token_env}' is not set.")
+    overrides = entry.model_dump(exclude={"token_env"}, exclude_none=True)
+    return default.model_copy(update={**overrides, "key": key, "token": token})
+
+
+def _reject_duplicate_keys(pairs: List[Tuple[str, Any]]) -> Dict[str, Any]:
+    # json.load would otherwise keep the last of two entries with the same key
+    keys = [key for key, _ in pairs]
+    duplicates = sorted({key for key in keys if keys.count(key) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate keys {duplicates}")
+    return dict(pairs)
+
+
+def load_targets(path: Optional[str] = None) -> Dict[str, GitHubTarget]:
+    """
+    Builds the routing table: the default target plus every entry of the JSON file at
+    `path` (settings.GITHUB_TARGETS_FILE), an object mapping target keys to entries such as
+    {"owner": "acme", "repo": "prompts", "branch": "main", "token_env": "ACME_GITHUB_TOKEN"}.
+    Raises ValueError for an unreadable or invalid file, so a bad table fails at startup.
+    """
+    default = _default_target()
+    targets = {DEFAULT_TARGET_KEY: default}
+    if not path:
+        return targets
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f, object_pairs_hook=_reject_duplicate_keys)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Could not read the targets file '{path}': {str(e)}")
+    if not isinstance(raw, dict):
+        raise ValueError(f"The targets file '{path}' must contain a JSON object of target key -> target.")
+    for key, value in raw.items():
+        if not _TARGET_KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"Invalid target key '{key}' in '{path}': use letters, digits, '.', '_' and '-'.")
+        if key == DEFAULT_TARGET_KEY:
+            raise ValueError(
+                f"Invalid target key '{key}' in '{path}': the default target is configured with the GITHUB_* settings."
+            )
+        try:
+            entry = _TargetEntry.model_validate(value)
+        except ValidationError as e:
+            raise ValueError(f"Invalid target '{key}' in '{path}': {str(e)}")
+        targets[key] = _target_from_entry(key, entry, default)
+    return targets
+
+
+_targets: Optional[Dict[str, GitHubTarget]] = None
+_current_target: contextvars.ContextVar[Optional[GitHubTarget]] = contextvars.ContextVar("github_target", default=None)
+
+
+def get_targets() -> Dict[str, GitHubTarget]:
+    """
+    Returns the routing table, loading it on first use (normally from the app lifespan).
+    """
+    global _targets
+    if _targets is None:
+        _targets = load_targets(settings.GITHUB_TARGETS_FILE)
+        if len(_targets) > 1:
+            logger.info(f"Loaded {len(_targets) - 1} GitHub targets from '{settings.GITHUB_TARGETS_FILE}'.")
+    return _targets
+
+
+def resolve_target(key: Optional[str]) -> GitHubTarget:
+    """
+    Returns the target for a webhook's target key (the default target if None).
+    Raises a 404 for an unknown key.
+    """
+    target = get_targets().get(key or DEFAULT_TARGET_KEY)
+    if target is None:
+        raise HTTPException(status_code=404, detail=f"Unknown target '{key}'.")
+    return target
+
+
+def current_target() -> GitHubTarget:
+    """
+    Returns the target of the webhook being handled, or the default target.
+    """
+    target = _current_target.get()
+    return target if target is not None else resolve_target(None)
+
+
+@contextmanager
+def use_target(target: GitHubTarget) -> Iterator[GitHubTarget]:
+    """
+    Makes `target` the current target for a block, e.g. one webhook's GitHub flow.
+    """
+    token = _current_target.set(target)
+    try:
+        yield target
+    finally:
+        _current_target.reset(token)
@@ -0,0 +1,84 @@
+# app/webhook_body.py
+from typing import Any, Dict, List
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError, create_model
+
+from .models import WebhookPayload
+from .serialization import loads_json, decode_body, check_body_size
+
+# OpenAPI request body for endpoints that read the payload with `read_webhook_payload`
+# instead of a `Body(...)` parameter, so the docs still show the WebhookPayload schema.
+WEBHOOK_PAYLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": WebhookPayload.model_json_schema()}},
+    }
+}
+
+# WebhookPayload without `manifest`, which is checked separately so pydantic neither
+# walks it nor echoes it back in validation errors
+_WebhookEnvelope = create_model(
+    "WebhookEnvelope",
+    **{name: (field.annotation, field) for name, field in WebhookPayload.model_fields.items() if name != "manifest"},
+)
+
+
+async def _read_raw_body(request: Request) -> bytes:
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        check_body_size(int(content_length))
+    chunks: List[bytes] = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        check_body_size(size)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _validation_error(errors: List[Dict[str, Any]]) -> RequestValidationError:
+    # Same shape as FastAPI's own 422 responses for body validation
+    return RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in errors])
+
+
+def parse_webhook_payload(body: bytes) -> WebhookPayload:
+    """
+    Parses a webhook body into a WebhookPayload, validating only the envelope
+    (`commit_hash`, `created_at`, and that `manifest` is an object). The manifest
+    itself is used as parsed, without pydantic walking and copying every nested value.
+    """
+    try:
+        data = loads_json(body)
+    except ValueError as e:
+        raise _validation_error([{"type": "json_invalid", "loc": (0,), "msg": "JSON decode error", "input": {}, "ctx": {"error": str(e)}}])
+    if not isinstance(data, dict):
+        raise _validation_error([{"type": "model_attributes_type", "loc": (), "msg": "Input should be a valid dictionary or object to extract fields from", "input": data}])
+
+    manifest = data.get("manifest")
+    try:
+        envelope = _WebhookEnvelope.model_validate({key: value for key, value in data.items() if key != "manifest"})
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+    else:
+        errors = []
+    if "manifest" not in data:
+        errors.append({"type": "missing", "loc": ("manifest",), "msg": "Field required", "input": data})
+    elif not isinstance(manifest, dict):
+        errors.append({"type": "dict_type", "loc": ("manifest",), "msg": "Input should be a valid dictionary", "input": manifest})
+    if errors:
+        raise _validation_error(errors)
+
+    return WebhookPayload.model_construct(manifest=manifest, **envelope.model_dump())
+
+
+async def read_webhook_payload(request: Request) -> WebhookPayload:
+    """
+    FastAPI dependency that reads the raw request body (honouring Content-Encoding: gzip
+    and settings.MAX_WEBHOOK_BODY_BYTES) and parses it with `parse_webhook_payload`.
+    """
+    body = decode_body(await _read_raw_body(request), request.headers.get("content-encoding", ""))
+    if not body:
+        raise _validation_error([{"type": "missing", "loc": (), "msg": "Field required", "input": None}])
+    return parse_webhook_payload(body)
@@ -0,0 +1,275 @@
+# app/workflows.py
+import base64
+import logging
+import datetime # For PR branch naming
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from .models import WebhookPayload
+from .config import settings
+from .github_client import get_github_client
+from .targets import GitHubTarget, resolve_target, use_target
+from .shared_state import write_lock
+from .coalescer import WriteCoalescer, build_coalesced_commit_message
+from .git_data import commit_manifest_to_new_branch, commit_manifest_exploded
+from .helpers import (
+    commit_manifest_to_github_direct,
+    get_base_branch_sha,
+    create_new_branch_from_base,
+    commit_file_to_branch,
+    create_github_pull_request,
+    find_open_pull_request,
+    get_github_pull_request,
+    update_github_pull_request
+)
+
+logger = logging.getLogger(__name__)
+
+# The end-to-end GitHub flows behind each webhook endpoint. They are shared by the
+# synchronous endpoints and the background job workers (see app/job_queue.py),
+# and return the response body the endpoint would send.
+
+# One per worker process; only used when settings.COALESCE_WINDOW_SECONDS > 0
+write_coalescer = WriteCoalescer(
+    window=settings.COALESCE_WINDOW_SECONDS,
+    max_wait=settings.COALESCE_MAX_WAIT_SECONDS,
+)
+
+# (repo, base branch) -> {"number", "html_url"} of the open rolling Pull Request, per worker process
+_rolling_pull_requests: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+
+async def _commit_coalesced(newest: WebhookPayload, payloads: List[WebhookPayload]) -> Dict[str, Any]:
+    # All payloads of a batch share the coalescing key, so they have the same target
+    with use_target(resolve_target(newest.target)):
+        return await commit_manifest_to_github_direct(newest, build_coalesced_commit_message(newest, payloads))
+
+
+async def run_direct_commit(payload: WebhookPayload) -> Dict[str, Any]:
+    """
+    Commits the manifest directly to the branch of the payload's target (see app/targets.py).
+    With coalescing enabled, bursts of webhooks for the same file share one commit.
+    """
+    with use_target(resolve_target(payload.target)) as target:
+        return await _commit_directly(payload, target)
+
+
+async def _commit_directly(payload: WebhookPayload, target: GitHubTarget) -> Dict[str, Any]:
+    coalesced_commit_hashes = None
+    if settings.COALESCE_WINDOW_SECONDS > 0:
+        key = (target.full_name, target.branch, target.file_path)
+        github_response, coalesced_commit_hashes = await write_coalescer.submit(key, payload, _commit_coalesced)
+    else:
+        github_response = await commit_manifest_to_github_direct(payload)
+
+    message = "Webhook received and manifest committed directly to GitHub successfully."
+    if github_response.get("status") == "unchanged":
+        message = "Webhook received; manifest is unchanged on GitHub, so no commit was created."
+
+    response = {
+        "message": message,
+        "github_commit_details": github_response.get("commit", {}),
+        "github_content_details": github_response.get("content", {})
+    }
+    if coalesced_commit_hashes is not None:
+        response["coalesced_commit_hashes"] = coalesced_commit_hashes
+    return response
+
+
+def _manifest_excerpt(manifest_json_string: str) -> str:
+    """
+    Manifest as a JSON code block for the PR description, cut at
+    settings.PR_BODY_MAX_MANIFEST_CHARS so huge manifests stay within GitHub's body limit.
+    """
+    limit = settings.PR_BODY_MAX_MANIFEST_CHARS
+    if len(manifest_json_string) <= limit:
+        return f"```json\n{manifest_json_string}\n```"
+    return (
+        f"```json\n{manifest_json_string[:limit]}\n```\n"
+        f"_Manifest truncated: showing {limit} of {len(manifest_json_string)} characters. "
+        f"See the committed file for the full content._"
+    )
+
+
+async def run_pull_request(payload: WebhookPayload) -> Dict[str, Any]:
+    """
+    Creates a feature branch with the manifest and opens a Pull Request against the
+    branch of the payload's target. With settings.PR_BRANCH_MODE = "rolling" the manifest
+    is added to the target's single rolling PR instead.
+    """
+    with use_target(resolve_target(payload.target)) as target:
+        if settings.PR_BRANCH_MODE == "rolling":
+            return await _update_rolling_pull_request(payload, target)
+        return await _open_pull_request(payload, target)
+
+
+async def _open_pull_request(payload: WebhookPayload, target: GitHubTarget) -> Dict[str, Any]:
+    # Use a short hash and timestamp for a unique branch name
+    short_commit_hash = payload.commit_hash[:12] # First 12 chars of the commit hash
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+    new_branch_name = f"feature/prompt-{short_commit_hash}-{timestamp}"
+
+    pr_title = f"feat: Update prompt manifest from webhook ({short_commit_hash})"
+    # Serialized once; the same text goes into the commit and (possibly truncated) the PR body
+    manifest_json_string = payload.manifest_json()
+    pr_body = (
+        f"Automated Pull Request from webhook event.\n\n"
+        f"Associated Commit Hash (from payload): `{payload.commit_hash}`\n"
+        f"Event Created At (from payload): `{payload.created_at}`\n\n"
+        f"Manifest details included in this PR:\n"
+        f"{_manifest_excerpt(manifest_json_string)}"
+    )
+
+    # Commit message for the commit on the new feature branch
+    commit_message_for_pr_branch = f"feat: Update prompt manifest for PR ({short_commit_hash})"
+
+    # Shared, pooled client opened by the app lifespan (see app/github_client.py)
+    client = get_github_client()
+
+    if settings.PR_PIPELINE == "git_data":
+        # Steps 1-3 in one go: commit built on the (cached) base SHA, then the branch is created pointing at it
+        commit_details_on_new_branch = await commit_manifest_to_new_branch(
+            client, new_branch_name, payload,
+            manifest_json_string, commit_message_for_pr_branch
+        )
+        if commit_details_on_new_branch.get("status") == "unchanged":
+            return {
+                "message": f"Manifest is unchanged on '{target.branch}'; no Pull Request was created.",
+                "pull_request_url": None,
+                "pull_request_details": {},
+                "new_branch_name": None,
+                "commit_on_branch_details": {}
+            }
+    else:
+        # Step 1: Get the SHA of the base branch (e.g., main, develop)
+        base_sha = await get_base_branch_sha(client)
+
+        # Step 2: Create a new branch from the base branch SHA
+        await create_new_branch_from_base(client, new_branch_name, base_sha)
+
+        # Step 3: Commit the manifest file to the new feature branch
+        content_base64 = base64.b64encode(manifest_json_string.encode('utf-8')).decode('utf-8')
+        commit_details_on_new_branch = await commit_file_to_branch(
+            client, new_branch_name, target.file_path,
+            content_base64, commit_message_for_pr_branch
+        )
+
+    # Step 4: Create the Pull Request from the new feature branch to the base branch
+    pr_details = await create_github_pull_request(
+        client, new_branch_name, target.branch,
+        pr_title, pr_body
+    )
+
+    # Determine success message based on PR creation status
+    response_message = "Pull Request created successfully."
+    if pr_details.get("status") == "already_exists":
+        response_message = pr_details.get("message", "Pull Request already exists.")
+
+
+    return {
+        "message": response_message,
+        "pull_request_url": pr_details.get("html_url"), # URL of the created/existing PR
+        "pull_request_details": pr_details, # Full PR details from GitHub API
+        "new_branch_name": new_branch_name,
+        "commit_on_branch_details": commit_details_on_new_branch.get("commit", {})
+    }
+
+
+def rolling_branch_name(target: GitHubTarget) -> str:
+    return f"{settings.PR_ROLLING_BRANCH_PREFIX}-{target.branch}"
+
+
+def _rolling_response(message: str, pull: Optional[Dict[str, Any]], branch: Optional[str], commit: Dict[str, Any]) -> Dict[str, Any]:
+    # Same shape as the per-event response
+    return {
+        "message": message,
+        "pull_request_url": pull.get("html_url") if pull else None,
+        "pull_request_details": pull or {},
+        "new_branch_name": branch,
+        "commit_on_branch_details": commit
+    }
+
+
+async def _commit_to_rolling_branch(client: httpx.AsyncClient, branch: str, payload: WebhookPayload, manifest_json_string: str, commit_message: str, target: GitHubTarget) -> Dict[str, Any]:
+    if target.manifest_layout == "exploded":
+        return await commit_manifest_exploded(payload, commit_message, branch=branch)
+    # With the branch's file SHA cached, this is a single contents PUT
+    content_base64 = base64.b64encode(manifest_json_string.encode('utf-8')).decode('utf-8')
+    return await commit_file_to_branch(client, branch, target.file_path, content_base64, commit_message)
+
+
+async def _update_rolling_pull_request(payload: WebhookPayload, target: GitHubTarget) -> Dict[str, Any]:
+    """
+    Rolling mode: one branch ("{PR_ROLLING_BRANCH_PREFIX}-{base branch}") and one open PR per
+    base branch. Each webhook checks that the PR is still open, stacks a commit onto the
+    branch and rewrites the PR title and description, which costs 3 GitHub calls once the
+    PR number and file SHA are cached: a GET of the PR, then two writes (contents PUT and
+    PR PATCH). The GET is what guarantees a merged or closed PR is never written to; an
+    ETag would not save it, as every update changes the PR. When the PR has been merged or
+    closed, or its branch deleted, a new one is started from the base branch.
+    """
+    client = get_github_client()
+    branch = rolling_branch_name(target)
+    key = (target.full_name, target.branch)
+    short_commit_hash = payload.commit_hash[:12]
+    manifest_json_string = payload.manifest_json()
+    pr_title = f"feat: Update prompt manifest from webhooks (latest {short_commit_hash})"
+    pr_body = (
+        f"Automated Pull Request from webhook events. Every new event adds a commit to "
+        f"`{branch}` and updates this description.\n\n"
+        f"Latest Commit Hash (from payload): `{payload.commit_hash}`\n"
+        f"Latest Event Created At (from payload): `{payload.created_at}`\n\n"
+        f"Manifest details included in this PR:\n"
+        f"{_manifest_excerpt(manifest_json_string)}"
+    )
+    commit_message = f"feat: Update prompt manifest for PR ({short_commit_hash})"
+
+    # One update of the rolling branch and its PR at a time across all workers ("*": the whole branch)
+    async with write_lock(target.full_name, branch, "*"):
+        cached = _rolling_pull_requests.get(key)
+        if cached is None:
+            # Once per worker (and per PR): later webhooks use the cached number
+            pull = await find_open_pull_request(client, branch, target.branch)
+        else:
+            # The PR may have been merged or closed since the last webhook
+            pull = await get_github_pull_request(client, cached["number"])
+            if pull.get("state") != "open":
+                logger.info(f"Rolling Pull Request #{pull.get('number')} is {'merged' if pull.get('merged') else pull.get('state')}. Starting a new one.")
+                _rolling_pull_requests.pop(key, None)
+                pull = None
+
+        if pull is not None:
+            try:
+                commit_details = await _commit_to_rolling_branch(client, branch, payload, manifest_json_string, commit_message, target)
+            except HTTPException as e:
+                if e.status_code not in (404, 422):
+                    raise
+                # Typically the branch was deleted when the PR was merged
+                logger.info(f"Could not commit to rolling branch '{branch}' ({e.status_code}). Starting a new Pull Request.")
+            else:
+                if commit_details.get("status") == "unchanged":
+                    _rolling_pull_requests[key] = {"number": pull["number"], "html_url": pull.get("html_url")}
+                    return _rolling_response(f"Manifest is unchanged on '{branch}'; the Pull Request was not updated.", pull, branch, {})
+                pull = await update_github_pull_request(client, pull["number"], pr_title, pr_body)
+                if pull.get("state") == "open":
+                    _rolling_pull_requests[key] = {"number": pull["number"], "html_url": pull.get("html_url")}
+                    return _rolling_response("Pull Request updated with the new manifest.", pull, branch, commit_details.get("commit", {}))
+                # Closed between the check above and the update
+                logger.info(f"Rolling Pull Request #{pull.get('number')} was closed while it was being updated. Starting a new one.")
+
+        _rolling_pull_requests.pop(key, None)
+        # New rolling PR: commit on the base branch, point the rolling branch at it and open the PR
+        commit_details = await commit_manifest_to_new_branch(
+            client, branch, payload, manifest_json_string, commit_message, reuse_branch=True
+        )
+        if commit_details.get("status") == "unchanged":
+            return _rolling_response(f"Manifest is unchanged on '{target.branch}'; no Pull Request was created.", None, None, {})
+        pr_details = await create_github_pull_request(client, branch, target.branch, pr_title, pr_body)
+        response_message = "Pull Request created successfully."
+        if pr_details.get("status") == "already_exists":
+            response_message = pr_details.get("message", "Pull Request already exists.")
+        if pr_details.get("number") is not None:
+            _rolling_pull_requests[key] = {"number": pr_details["number"], "html_url": pr_details.get("html_url")}
+        return _rolling_response(response_message, pr_details, branch, commit_details.get("commit", {}))
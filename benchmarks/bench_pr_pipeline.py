@@ -0,0 +1,70 @@
+# benchmarks/bench_pr_pipeline.py
+"""
+Compares the original PR flow ("contents": get base SHA, create branch, GET file SHA,
+PUT file, create PR), the Git Data pipeline ("git_data") and the rolling PR mode
+("rolling": one branch and PR updated in place) against the in-process fake GitHub,
+and prints p50/p99 latency and GitHub calls per webhook.
+
+    python -m benchmarks.bench_pr_pipeline --requests 200 --latency 0.05
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Dict
+
+from .harness import percentile, reset_app_state
+from .fake_github import FakeGitHub
+
+from app.config import settings
+from app.models import WebhookPayload
+from app.workflows import run_pull_request
+from app.github_client import start_github_client, close_github_client
+
+
+async def run_pipeline(pipeline: str, requests: int, latency: float, jitter: float) -> Dict[str, float]:
+    settings.PR_PIPELINE = "git_data" if pipeline == "rolling" else pipeline
+    settings.PR_BRANCH_MODE = "rolling" if pipeline == "rolling" else "per_event"
+    reset_app_state()
+    fake = FakeGitHub(latency=latency, jitter=jitter)
+    await start_github_client(fake.transport())
+    try:
+        latencies = []
+        for i in range(requests):
+            payload = WebhookPayload(
+                manifest={"lc": 1, "type": "constructor", "kwargs": {"template": f"prompt revision {i}"}},
+                commit_hash=f"{i:012d}{pipeline}",
+                created_at="2025-05-07T10:00:00Z",
+            )
+            started = time.perf_counter()
+            await run_pull_request(payload)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        await close_github_client()
+
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "calls_per_webhook": fake.total_calls() / requests,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Webhooks per pipeline")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated GitHub latency per call (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Random +/- latency per call (seconds)")
+    args = parser.parse_args()
+
+    print(f"{'pipeline':<10} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'calls/webhook':>14}")
+    for pipeline in ("contents", "git_data", "rolling"):
+        result = await run_pipeline(pipeline, args.requests, args.latency, args.jitter)
+        print(
+            f"{pipeline:<10} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+            f"{result['mean_ms']:>9.1f} {result['calls_per_webhook']:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+# benchmarks/bench_pytest.py
+"""
+pytest-benchmark harness for the webhook endpoints against the in-process fake GitHub.
+Simulated GitHub latency is zero, so the numbers measure the service's own overhead
+(parsing, serialization, hashing, scheduling) and are stable enough to compare runs.
+
+    poetry install  # pytest-benchmark is a dev dependency
+    pytest benchmarks/bench_pytest.py --benchmark-autosave
+    pytest benchmarks/bench_pytest.py --benchmark-compare --benchmark-compare-fail=mean:10%
+"""
+import asyncio
+import itertools
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from .harness import run_webhooks  # noqa: E402
+from .payloads import synthetic_payload  # noqa: E402
+from .fake_github import FakeGitHub  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+WEBHOOKS_PER_ROUND = 20
+_payload_ids = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def event_loop_for_bench():
+    # One loop for all rounds: the app's scheduler binds its semaphore to the first loop it runs in
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.mark.parametrize("manifest_kb", [1, 512])
+@pytest.mark.parametrize("endpoint", ["github-commit", "github-pr"])
+def test_webhook_endpoint(benchmark, event_loop_for_bench, endpoint, manifest_kb):
+    fake = FakeGitHub(latency=0, seed=0)
+    results = []
+
+    def run_round():
+        payloads = [synthetic_payload(next(_payload_ids), manifest_kb, tag=endpoint) for _ in range(WEBHOOKS_PER_ROUND)]
+        results.append(event_loop_for_bench.run_until_complete(run_webhooks(app, fake, endpoint, payloads)))
+
+    benchmark.pedantic(run_round, rounds=5, iterations=1, warmup_rounds=1)
+
+    summary = results[-1].summary()
+    assert set(summary["statuses"]) == {201}, summary["statuses"]
+    benchmark.extra_info.update(
+        webhooks_per_round=WEBHOOKS_PER_ROUND,
+        p95_ms=round(summary["p95_ms"], 3),
+        p99_ms=round(summary["p99_ms"], 3),
+        calls_per_webhook=summary["calls_per_webhook"],
+    )
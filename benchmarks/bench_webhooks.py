@@ -0,0 +1,62 @@
+# benchmarks/bench_webhooks.py
+"""
+End-to-end load test of the webhook endpoints, fully offline: the FastAPI app runs
+in-process and talks to an in-memory fake GitHub. Reports throughput, p50/p95/p99
+latency and GitHub calls per webhook for each endpoint.
+
+    python -m benchmarks.bench_webhooks --requests 200 --concurrency 10 --latency 0.05
+    python -m benchmarks.bench_webhooks --conflict-rate 0.05 --secondary-limit-rate 0.01
+    python -m benchmarks.bench_webhooks --replay recorded_webhooks.jsonl --json
+
+A replay file holds one recorded webhook body per line, optionally wrapped as
+{"endpoint": "github-pr", "payload": {...}}.
+"""
+import json
+import asyncio
+import argparse
+
+from .harness import print_summaries, run_webhooks
+from .payloads import ENDPOINTS, iter_payloads
+from .fake_github import FakeGitHub
+
+from app.main import app
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=ENDPOINTS + ("all",), default="all", help="Endpoint to load")
+    parser.add_argument("--requests", type=int, default=200, help="Webhooks per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight")
+    parser.add_argument("--manifest-kb", type=int, default=1, help="Size of synthetic manifests (KiB)")
+    parser.add_argument("--replay", help="JSONL file of recorded webhook payloads to send instead of synthetic ones")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated GitHub latency per call (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Random +/- latency per call (seconds)")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="Fake GitHub quota per hour")
+    parser.add_argument("--conflict-rate", type=float, default=0.0, help="Share of writes failing with 409/422")
+    parser.add_argument("--secondary-limit-rate", type=float, default=0.0, help="Share of calls answered with 429 Retry-After")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency jitter and injected failures")
+    parser.add_argument("--json", action="store_true", help="Print one JSON summary per endpoint instead of a table")
+    args = parser.parse_args()
+
+    results = []
+    for endpoint in (ENDPOINTS if args.endpoint == "all" else (args.endpoint,)):
+        fake = FakeGitHub(
+            latency=args.latency,
+            jitter=args.jitter,
+            rate_limit=args.rate_limit,
+            conflict_rate=args.conflict_rate,
+            secondary_limit_rate=args.secondary_limit_rate,
+            seed=args.seed,
+        )
+        payloads = list(iter_payloads(args.requests, args.manifest_kb, args.replay, tag=endpoint))
+        results.append(await run_webhooks(app, fake, endpoint, payloads, args.concurrency))
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result.summary()))
+    else:
+        print_summaries(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,326 @@
+# benchmarks/fake_github.py
+import re
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import itertools
+from collections import Counter
+from typing import Dict, Any, List, Tuple, Optional
+
+import httpx
+
+# An in-memory stand-in for the parts of the GitHub REST API this service uses
+# (contents, refs, commits, trees, blobs, pulls). It runs in-process as an httpx
+# transport, so benchmarks need no network and no token (see benchmarks/fake_github_server.py
+# to serve it over HTTP for locust).
+
+
+def _blob_sha(content: bytes) -> str:
+    return hashlib.sha1(f"blob {len(content)}\0".encode("utf-8") + content).hexdigest()
+
+
+class FakeGitHub:
+    """
+    Simulated GitHub repository with configurable per-call latency.
+
+    Every request is counted in `calls` as (method, route) so benchmarks can report
+    GitHub calls per webhook.
+
+    Like GitHub, every response carries X-RateLimit-* headers for a quota of `rate_limit`
+    requests per `rate_limit_window` seconds; once it is used up, calls get a 403
+    "API rate limit exceeded" until the window resets. Failures can be injected at random:
+    - `conflict_rate`: writes fail as if another writer got there first (409 for a contents
+      PUT, 422 "not a fast forward" for a ref update).
+    - `secondary_limit_rate`: calls get a 429 with `Retry-After: 1`.
+    Injected failures are counted in `injected`.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        default_branch: str = "main",
+        rate_limit: int = 5000,
+        rate_limit_window: float = 3600.0,
+        conflict_rate: float = 0.0,
+        secondary_limit_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.conflict_rate = conflict_rate
+        self.secondary_limit_rate = secondary_limit_rate
+        self._random = random.Random(seed)
+        self._rate_limit_used = 0
+        self._rate_limit_reset = time.time() + rate_limit_window
+        self.calls: Counter = Counter()
+        self.injected: Counter = Counter()
+        self._ids = itertools.count(1)
+        self.blobs: Dict[str, bytes] = {}
+        self.trees: Dict[str, Dict[str, str]] = {}  # tree SHA -> {path: blob SHA}
+        self.commits: Dict[str, Dict[str, Any]] = {}
+        self.refs: Dict[str, str] = {}  # branch -> commit SHA
+        self.pulls: List[Dict[str, Any]] = []
+
+        root_tree = self._store_tree({})
+        self.refs[default_branch] = self._store_commit("Initial commit", root_tree, [])
+
+    # --- Object store ---
+
+    def _store_tree(self, files: Dict[str, str]) -> str:
+        sha = hashlib.sha1(json.dumps(sorted(files.items())).encode("utf-8")).hexdigest()
+        self.trees[sha] = dict(files)
+        return sha
+
+    def _store_commit(self, message: str, tree_sha: str, parents: List[str]) -> str:
+        sha = hashlib.sha1(f"{next(self._ids)}:{tree_sha}:{parents}".encode("utf-8")).hexdigest()
+        self.commits[sha] = {"sha": sha, "message": message, "tree": {"sha": tree_sha}, "parents": [{"sha": p} for p in parents]}
+        return sha
+
+    def _store_blob(self, content: bytes) -> str:
+        sha = _blob_sha(content)
+        self.blobs[sha] = content
+        return sha
+
+    def _is_ancestor(self, ancestor: str, commit_sha: str) -> bool:
+        pending = [commit_sha]
+        while pending:
+            sha = pending.pop()
+            if sha == ancestor:
+                return True
+            pending.extend(p["sha"] for p in self.commits.get(sha, {}).get("parents", []))
+        return False
+
+    def files_at(self, branch: str) -> Dict[str, bytes]:
+        """
+        Returns {path: content} of a branch head, for checks in benchmarks.
+        """
+        tree_sha = self.commits[self.refs[branch]]["tree"]["sha"]
+        return {path: self.blobs[sha] for path, sha in self.trees[tree_sha].items()}
+
+    # --- Transport ---
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter)))
+        route, response = self._throttle(request) or self._inject_conflict(request) or self._dispatch(request)
+        self.calls[(request.method, route)] += 1
+        response.headers.update(self._rate_limit_headers())
+        return response
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Call and failure counters, e.g. for benchmarks/fake_github_server.py.
+        """
+        return {
+            "total_calls": self.total_calls(),
+            "calls": {f"{method} {route}": count for (method, route), count in sorted(self.calls.items())},
+            "injected": dict(self.injected),
+            "rate_limit": self._rate_limit_headers(),
+        }
+
+    # --- Rate limits and injected failures ---
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(0, self.rate_limit - self._rate_limit_used)),
+            "X-RateLimit-Used": str(self._rate_limit_used),
+            "X-RateLimit-Reset": str(int(self._rate_limit_reset)),
+            "X-RateLimit-Resource": "core",
+        }
+
+    def _throttle(self, request: httpx.Request) -> Optional[Tuple[str, httpx.Response]]:
+        if time.time() >= self._rate_limit_reset:
+            self._rate_limit_used = 0
+            self._rate_limit_reset = time.time() + self.rate_limit_window
+        if self._rate_limit_used >= self.rate_limit:
+            self.injected["primary_rate_limit"] += 1
+            return "rate_limited", httpx.Response(403, json={"message": "API rate limit exceeded for user."})
+        self._rate_limit_used += 1
+        if self.secondary_limit_rate and self._random.random() < self.secondary_limit_rate:
+            self.injected["secondary_rate_limit"] += 1
+            return "rate_limited", httpx.Response(
+                429, json={"message": "You have exceeded a secondary rate limit."}, headers={"Retry-After": "1"}
+            )
+        return None
+
+    def _inject_conflict(self, request: httpx.Request) -> Optional[Tuple[str, httpx.Response]]:
+        if not self.conflict_rate or self._random.random() >= self.conflict_rate:
+            return None
+        path = request.url.path
+        if request.method == "PUT" and "/contents/" in path:
+            self.injected["contents_conflict"] += 1
+            return "contents", httpx.Response(409, json={"message": "is at a different commit than expected"})
+        if request.method == "PATCH" and "/git/refs/heads/" in path:
+            self.injected["ref_not_fast_forward"] += 1
+            return "ref", httpx.Response(422, json={"message": "Update is not a fast forward"})
+        return None
+
+    def _dispatch(self, request: httpx.Request) -> Tuple[str, httpx.Response]:
+        path = request.url.path
+        method = request.method
+        body = json.loads(request.content) if request.content else {}
+        match = re.match(r"^/repos/[^/]+/[^/]+/(.*)$", path)
+        if match is None:
+            return "unknown", httpx.Response(404, json={"message": "Not Found"})
+        rest = match.group(1)
+
+        if rest.startswith("contents/"):
+            return "contents", self._contents(method, rest[len("contents/"):], request, body)
+        ref_match = re.match(r"^git/refs?/heads/(.+)$", rest)
+        if ref_match:
+            return "ref", self._ref(method, ref_match.group(1), request, body)
+        if rest == "git/refs" and method == "POST":
+            return "create_ref", self._create_ref(body)
+        if rest == "git/blobs" and method == "POST":
+            content = base64.b64decode(body["content"]) if body.get("encoding") == "base64" else body["content"].encode("utf-8")
+            return "blob", httpx.Response(201, json={"sha": self._store_blob(content)})
+        if rest == "git/trees" and method == "POST":
+            return "create_tree", self._create_tree(body)
+        if rest.startswith("git/trees/") and method == "GET":
+            return "tree", self._get_tree(rest[len("git/trees/"):], request)
+        if rest == "git/commits" and method == "POST":
+            sha = self._store_commit(body["message"], body["tree"], body.get("parents", []))
+            return "create_commit", httpx.Response(201, json=self.commits[sha])
+        if rest.startswith("git/commits/") and method == "GET":
+            commit = self.commits.get(rest[len("git/commits/"):])
+            if commit is None:
+                return "commit", httpx.Response(404, json={"message": "Not Found"})
+            return "commit", httpx.Response(200, json=commit, headers={"ETag": f'"{commit["sha"]}"'})
+        if rest == "pulls":
+            return "pulls", self._pulls(method, request, body)
+        if rest.startswith("pulls/") and method == "GET":
+            return "pull", self._get_pull(int(rest[len("pulls/"):]))
+        if rest.startswith("pulls/") and method == "PATCH":
+            return "update_pull", self._update_pull(int(rest[len("pulls/"):]), body)
+        return "unknown", httpx.Response(404, json={"message": f"Not Found: {method} {rest}"})
+
+    def _contents(self, method: str, file_path: str, request: httpx.Request, body: Dict[str, Any]) -> httpx.Response:
+        if method == "GET":
+            branch = request.url.params.get("ref", "main")
+            if branch not in self.refs:
+                return httpx.Response(404, json={"message": "No commit found for the ref"})
+            tree = self.trees[self.commits[self.refs[branch]]["tree"]["sha"]]
+            if file_path not in tree:
+                return httpx.Response(404, json={"message": "Not Found"})
+            etag = f'"{tree[file_path]}"'
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304)
+            return httpx.Response(200, json={"path": file_path, "sha": tree[file_path]}, headers={"ETag": etag})
+
+        branch = body.get("branch", "main")
+        if branch not in self.refs:
+            return httpx.Response(422, json={"message": f"Branch {branch} not found"})
+        head = self.refs[branch]
+        files = dict(self.trees[self.commits[head]["tree"]["sha"]])
+        current_sha = files.get(file_path)
+        if current_sha is not None and body.get("sha") is None:
+            return httpx.Response(422, json={"message": "Invalid request.\n\n\"sha\" wasn't supplied."})
+        if current_sha is not None and body.get("sha") != current_sha:
+            return httpx.Response(409, json={"message": f"{file_path} does not match {body.get('sha')}"})
+        files[file_path] = self._store_blob(base64.b64decode(body["content"]))
+        commit_sha = self._store_commit(body["message"], self._store_tree(files), [head])
+        self.refs[branch] = commit_sha
+        return httpx.Response(
+            201 if current_sha is None else 200,
+            json={"content": {"path": file_path, "sha": files[file_path]}, "commit": self.commits[commit_sha]},
+        )
+
+    def _ref(self, method: str, branch: str, request: httpx.Request, body: Dict[str, Any]) -> httpx.Response:
+        if branch not in self.refs:
+            return httpx.Response(404, json={"message": "Not Found"})
+        if method == "GET":
+            etag = f'"{self.refs[branch]}"'
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304)
+            return httpx.Response(200, json={"ref": f"refs/heads/{branch}", "object": {"sha": self.refs[branch]}}, headers={"ETag": etag})
+        if method == "PATCH":
+            if not body.get("force") and not self._is_ancestor(self.refs[branch], body["sha"]):
+                return httpx.Response(422, json={"message": "Update is not a fast forward"})
+            self.refs[branch] = body["sha"]
+            return httpx.Response(200, json={"ref": f"refs/heads/{branch}", "object": {"sha": body["sha"]}})
+        return httpx.Response(405, json={"message": "Method Not Allowed"})
+
+    def _create_ref(self, body: Dict[str, Any]) -> httpx.Response:
+        branch = body["ref"][len("refs/heads/"):]
+        if branch in self.refs:
+            return httpx.Response(422, json={"message": "Reference already exists"})
+        self.refs[branch] = body["sha"]
+        return httpx.Response(201, json={"ref": body["ref"], "object": {"sha": body["sha"]}})
+
+    def _create_tree(self, body: Dict[str, Any]) -> httpx.Response:
+        files = dict(self.trees.get(body.get("base_tree"), {}))
+        for entry in body["tree"]:
+            if "content" in entry:
+                files[entry["path"]] = self._store_blob(entry["content"].encode("utf-8"))
+            elif entry.get("sha") is None:
+                files.pop(entry["path"], None)
+            else:
+                files[entry["path"]] = entry["sha"]
+        return httpx.Response(201, json={"sha": self._store_tree(files)})
+
+    def _get_tree(self, spec: str, request: httpx.Request) -> httpx.Response:
+        commit_or_tree, _, directory = spec.partition(":")
+        if commit_or_tree in self.commits:
+            commit_or_tree = self.commits[commit_or_tree]["tree"]["sha"]
+        files = self.trees.get(commit_or_tree)
+        if files is None:
+            return httpx.Response(404, json={"message": "Not Found"})
+        prefix = f"{directory.strip('/')}/" if directory else ""
+        entries = [
+            {"path": path[len(prefix):], "type": "blob", "sha": sha}
+            for path, sha in files.items() if path.startswith(prefix)
+        ]
+        if prefix and not entries:
+            return httpx.Response(404, json={"message": "Not Found"})
+        return httpx.Response(200, json={"sha": commit_or_tree, "tree": entries, "truncated": False})
+
+    def _pulls(self, method: str, request: httpx.Request, body: Dict[str, Any]) -> httpx.Response:
+        if method == "GET":
+            head = request.url.params.get("head", "").split(":")[-1]
+            base = request.url.params.get("base")
+            matches = [
+                pull for pull in self.pulls
+                if pull["state"] == "open" and (not head or pull["head"]["ref"] == head) and (not base or pull["base"]["ref"] == base)
+            ]
+            return httpx.Response(200, json=matches)
+        for pull in self.pulls:
+            if pull["state"] == "open" and pull["head"]["ref"] == body["head"] and pull["base"]["ref"] == body["base"]:
+                return httpx.Response(422, json={"message": "Validation Failed", "errors": [{"message": f"A pull request already exists for {body['head']}."}]})
+        number = len(self.pulls) + 1
+        pull = {
+            "number": number,
+            "html_url": f"https://github.com/fake/repo/pull/{number}",
+            "title": body["title"],
+            "body": body["body"],
+            "state": "open",
+            "merged": False,
+            "head": {"ref": body["head"]},
+            "base": {"ref": body["base"]},
+        }
+        self.pulls.append(pull)
+        return httpx.Response(201, json=pull)
+
+    def _get_pull(self, number: int) -> httpx.Response:
+        if not 0 < number <= len(self.pulls):
+            return httpx.Response(404, json={"message": "Not Found"})
+        return httpx.Response(200, json=self.pulls[number - 1])
+
+    def _update_pull(self, number: int, body: Dict[str, Any]) -> httpx.Response:
+        if not 0 < number <= len(self.pulls):
+            return httpx.Response(404, json={"message": "Not Found"})
+        pull = self.pulls[number - 1]
+        pull.update({k: v for k, v in body.items() if k in ("title", "body", "state")})
+        return httpx.Response(200, json=pull)
@@ -0,0 +1,62 @@
+# benchmarks/fake_github_server.py
+"""
+Serves the in-memory fake GitHub over HTTP, so a real deployment of the service
+(e.g. under gunicorn) can be load tested with locust without touching GitHub.
+
+    python -m benchmarks.fake_github_server --port 9000 --latency 0.05
+    GITHUB_API_BASE_URL=http://127.0.0.1:9000 poetry run uvicorn app.main:app --port 8000
+
+GET /_fake/stats returns the call counters (used by benchmarks/locustfile.py).
+"""
+import argparse
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from .fake_github import FakeGitHub
+
+
+def build_app(fake: FakeGitHub) -> Starlette:
+    async def stats(request: Request) -> JSONResponse:
+        return JSONResponse(fake.stats())
+
+    async def github_api(request: Request) -> Response:
+        github_request = httpx.Request(
+            request.method, str(request.url), headers=request.headers.raw, content=await request.body()
+        )
+        github_response = await fake.handle(github_request)
+        return Response(github_response.content, status_code=github_response.status_code, headers=dict(github_response.headers))
+
+    return Starlette(routes=[
+        Route("/_fake/stats", stats, methods=["GET"]),
+        Route("/{path:path}", github_api, methods=["GET", "POST", "PUT", "PATCH", "DELETE"]),
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated GitHub latency per call (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Random +/- latency per call (seconds)")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="Quota per hour")
+    parser.add_argument("--conflict-rate", type=float, default=0.0, help="Share of writes failing with 409/422")
+    parser.add_argument("--secondary-limit-rate", type=float, default=0.0, help="Share of calls answered with 429 Retry-After")
+    args = parser.parse_args()
+
+    fake = FakeGitHub(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        conflict_rate=args.conflict_rate,
+        secondary_limit_rate=args.secondary_limit_rate,
+    )
+    uvicorn.run(build_app(fake), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/harness.py
+"""
+Shared pieces of the in-process benchmarks: a driver that posts webhooks to the app
+against a FakeGitHub, and the latency / throughput / GitHub-calls summary.
+"""
+import os
+import time
+import asyncio
+import statistics
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Any, List
+
+# The app reads its settings at import time; the fake GitHub needs no real credentials
+os.environ.setdefault("GITHUB_TOKEN", "benchmark-token")
+os.environ.setdefault("GITHUB_REPO_OWNER", "fake")
+os.environ.setdefault("GITHUB_REPO_NAME", "repo")
+# Measure the service, not the scheduler's request pacing (the fake's rate-limit headers still apply)
+os.environ.setdefault("GITHUB_RATE_LIMIT_PER_SECOND", "0")
+
+import httpx  # noqa: E402
+
+from app import git_data, workflows  # noqa: E402
+from app.sha_cache import file_sha_cache  # noqa: E402
+from app.github_scheduler import github_schedulers  # noqa: E402
+from app.routers.webhook_router import idempotency_store  # noqa: E402
+from app.github_client import start_github_client, close_github_client  # noqa: E402
+
+from .fake_github import FakeGitHub  # noqa: E402
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def reset_app_state() -> None:
+    """
+    Clears the per-process caches so every benchmark run starts cold.
+    """
+    git_data._ref_cache.clear()
+    git_data._commit_tree_cache.clear()
+    git_data._manifest_listing_cache.clear()
+    workflows._rolling_pull_requests.clear()
+    file_sha_cache._entries.clear()
+    idempotency_store._entries.clear()
+    for scheduler in github_schedulers.values():
+        scheduler.limit = scheduler.remaining = scheduler.reset_at = None
+        scheduler._paused_until = 0.0
+
+
+# --- Driver and report ---
+
+@dataclass
+class BenchResult:
+    endpoint: str
+    latencies: List[float]
+    elapsed: float
+    github_calls: int
+    statuses: Counter = field(default_factory=Counter)
+    injected: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        count = len(self.latencies)
+        return {
+            "endpoint": self.endpoint,
+            "requests": count,
+            "throughput_rps": count / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p95_ms": percentile(self.latencies, 95) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+            "mean_ms": statistics.mean(self.latencies) * 1000,
+            "calls_per_webhook": self.github_calls / count if count else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+            "injected": self.injected,
+        }
+
+
+def print_summaries(results: List[BenchResult]) -> None:
+    print(f"{'endpoint':<14} {'reqs':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls/webhook':>14}  statuses")
+    for result in results:
+        s = result.summary()
+        print(
+            f"{s['endpoint']:<14} {s['requests']:>6} {s['throughput_rps']:>8.1f} {s['p50_ms']:>9.1f} "
+            f"{s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['calls_per_webhook']:>14.2f}  {s['statuses']}"
+        )
+        if s["injected"]:
+            print(f"{'':<14} injected by fake GitHub: {s['injected']}")
+
+
+async def run_webhooks(app, fake: FakeGitHub, endpoint: str, payloads: List[Dict[str, Any]], concurrency: int = 1) -> BenchResult:
+    """
+    Posts `payloads` to /webhook/<endpoint> through the ASGI app (no sockets), with up to
+    `concurrency` requests in flight, while the app talks to `fake` instead of GitHub.
+    A payload's "_endpoint" key (from a replay file) overrides `endpoint`.
+    """
+    reset_app_state()
+    calls_before = fake.total_calls()
+    injected_before = Counter(fake.injected)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+
+    await start_github_client(fake.transport())
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            async def worker() -> None:
+                while not queue.empty():
+                    body = dict(queue.get_nowait())
+                    target = body.pop("_endpoint", endpoint)
+                    started = time.perf_counter()
+                    response = await client.post(f"/webhook/{target}", json=body)
+                    latencies.append(time.perf_counter() - started)
+                    statuses[response.status_code] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+            elapsed = time.perf_counter() - started
+    finally:
+        await close_github_client()
+
+    injected = Counter(fake.injected)
+    injected.subtract(injected_before)
+    return BenchResult(
+        endpoint=endpoint,
+        latencies=latencies,
+        elapsed=elapsed,
+        github_calls=fake.total_calls() - calls_before,
+        statuses=statuses,
+        injected={k: v for k, v in injected.items() if v},
+    )
@@ -0,0 +1,87 @@
+# benchmarks/locustfile.py
+"""
+Locust scenario for a running instance of the service, normally pointed at the fake
+GitHub server so the whole test stays offline:
+
+    python -m benchmarks.fake_github_server --port 9000 --latency 0.05
+    GITHUB_API_BASE_URL=http://127.0.0.1:9000 GITHUB_TOKEN=x GITHUB_REPO_OWNER=fake GITHUB_REPO_NAME=repo \\
+        poetry run gunicorn app.main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000
+    poetry run locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000 --headless -u 50 -r 10 -t 2m
+
+Environment variables:
+    BENCH_REPLAY_FILE   JSONL of recorded webhook payloads to send instead of synthetic ones
+    BENCH_MANIFEST_KB   Size of synthetic manifests (default 1)
+    FAKE_GITHUB_URL     Fake GitHub server, for GitHub calls per webhook at the end (default http://127.0.0.1:9000)
+"""
+import os
+import uuid
+import itertools
+
+import httpx
+from locust import HttpUser, between, events, task
+
+from benchmarks.payloads import replay_payloads, synthetic_payload
+
+REPLAY_FILE = os.environ.get("BENCH_REPLAY_FILE")
+MANIFEST_KB = int(os.environ.get("BENCH_MANIFEST_KB", "1"))
+FAKE_GITHUB_URL = os.environ.get("FAKE_GITHUB_URL", "http://127.0.0.1:9000")
+
+_recorded = replay_payloads(REPLAY_FILE) if REPLAY_FILE else []
+_payload_ids = itertools.count()
+# Distinguishes commit hashes across locust runs, so they are not replayed as duplicates
+_run_id = uuid.uuid4().hex[:6]
+
+
+def next_payload(endpoint: str) -> dict:
+    i = next(_payload_ids)
+    if not _recorded:
+        return synthetic_payload(i, MANIFEST_KB, tag=f"{_run_id}{endpoint}")
+    body = dict(_recorded[i % len(_recorded)])
+    body.pop("_endpoint", None)
+    if i >= len(_recorded):
+        body["commit_hash"] = f"{body.get('commit_hash')}-{i // len(_recorded)}"
+    return body
+
+
+class WebhookSender(HttpUser):
+    wait_time = between(0.1, 0.5)
+
+    @task(3)
+    def direct_commit(self):
+        self.client.post("/webhook/github-commit", json=next_payload("github-commit"), name="/webhook/github-commit")
+
+    @task(1)
+    def pull_request(self):
+        self.client.post("/webhook/github-pr", json=next_payload("github-pr"), name="/webhook/github-pr")
+
+
+def _fake_github_stats() -> dict:
+    return httpx.get(f"{FAKE_GITHUB_URL}/_fake/stats", timeout=5).json()
+
+
+_calls_at_start = 0
+
+
+@events.test_start.add_listener
+def remember_github_calls(environment, **kwargs):
+    global _calls_at_start
+    try:
+        _calls_at_start = _fake_github_stats()["total_calls"]
+    except httpx.HTTPError:
+        _calls_at_start = 0
+
+
+@events.test_stop.add_listener
+def report_github_calls(environment, **kwargs):
+    webhooks = sum(
+        entry.num_requests for (name, _), entry in environment.stats.entries.items() if name.startswith("/webhook/")
+    )
+    try:
+        stats = _fake_github_stats()
+    except httpx.HTTPError as e:
+        print(f"[WARNING] Could not read fake GitHub stats from {FAKE_GITHUB_URL}: {str(e)}")
+        return
+    calls = stats["total_calls"] - _calls_at_start
+    print(f"GitHub calls: {calls} for {webhooks} webhooks ({calls / max(1, webhooks):.2f} per webhook)")
+    if stats["injected"]:
+        print(f"Injected by fake GitHub: {stats['injected']}")
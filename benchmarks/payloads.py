@@ -0,0 +1,74 @@
+# benchmarks/payloads.py
+"""
+Webhook bodies for the benchmarks: synthetic ones, or recorded ones replayed from a
+JSONL file. Kept free of app imports so the locustfile can use it too.
+"""
+import json
+from typing import Dict, Any, Iterator, List, Optional
+
+ENDPOINTS = ("github-commit", "github-pr")
+
+
+def synthetic_payload(i: int, manifest_kb: int = 1, tag: str = "bench") -> Dict[str, Any]:
+    """
+    A webhook body whose manifest changes on every call (so no commit is a no-op),
+    padded to roughly `manifest_kb` KiB.
+    """
+    return {
+        "manifest": {
+            "lc": 1,
+            "type": "constructor",
+            "id": ["langchain", "prompts", "chat", "ChatPromptTemplate"],
+            "kwargs": {
+                "template": f"prompt revision {i}",
+                "padding": "x" * max(0, manifest_kb * 1024 - 200),
+            },
+        },
+        "commit_hash": f"{i:012d}{tag}",
+        "created_at": "2025-05-07T10:00:00Z",
+    }
+
+
+def replay_payloads(path: str) -> List[Dict[str, Any]]:
+    """
+    Reads recorded webhook bodies from a JSONL file, one per line. A line is either a
+    webhook body (`manifest`, `commit_hash`, `created_at`) or `{"endpoint": ..., "payload": {...}}`;
+    the endpoint is kept under the "_endpoint" key. Lines that are not webhooks are skipped.
+    """
+    payloads = []
+    skipped = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            body = record.get("payload", record) if isinstance(record, dict) else None
+            if not isinstance(body, dict) or not isinstance(body.get("manifest"), dict):
+                skipped += 1
+                continue
+            if record.get("endpoint") in ENDPOINTS:
+                body = {**body, "_endpoint": record["endpoint"]}
+            payloads.append(body)
+    if skipped:
+        print(f"[WARNING] Skipped {skipped} line(s) of '{path}' that are not webhook payloads.")
+    return payloads
+
+
+def iter_payloads(requests: int, manifest_kb: int = 1, replay: Optional[str] = None, tag: str = "bench") -> Iterator[Dict[str, Any]]:
+    """
+    `requests` webhook bodies: replayed from `replay` or synthetic. A recording shorter than
+    `requests` is cycled; repeats get a suffixed commit_hash so they are not deduplicated
+    as retries (duplicates within the recording itself are kept).
+    """
+    if replay is None:
+        for i in range(requests):
+            yield synthetic_payload(i, manifest_kb, tag)
+        return
+    recorded = replay_payloads(replay)
+    if not recorded:
+        raise SystemExit(f"No webhook payloads found in '{replay}'.")
+    for i in range(requests):
+        cycle, index = divmod(i, len(recorded))
+        body = recorded[index]
+        yield body if cycle == 0 else {**body, "commit_hash": f"{body.get('commit_hash')}-{cycle}"}
@@ -0,0 +1,29 @@
+# gunicorn.conf.py
+# Server hooks for the multi-worker deployment (see the Dockerfile). Worker count, class
+# and bind address are passed on the command line.
+import os
+import shutil
+
+
+def on_starting(server):
+    """
+    Starts every run with an empty Prometheus multiprocess directory, so metrics of
+    workers from a previous run are not aggregated into /metrics.
+    """
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """
+    Drops the live gauges of a worker that exited, so in-flight counts do not stay stuck.
+    """
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,30 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# The app reads its settings at import time; the fake GitHub needs no real credentials
+os.environ.setdefault("GITHUB_TOKEN", "test-token")
+os.environ.setdefault("GITHUB_REPO_OWNER", "fake")
+os.environ.setdefault("GITHUB_REPO_NAME", "repo")
+os.environ.setdefault("GITHUB_RATE_LIMIT_PER_SECOND", "0")
+os.environ.setdefault("SHARED_STATE_DIR", tempfile.mkdtemp(prefix="webhook-tests-"))
+
+import pytest  # noqa: E402
+
+from app.github_client import start_github_client, close_github_client  # noqa: E402
+from benchmarks.fake_github import FakeGitHub  # noqa: E402
+from benchmarks.harness import reset_app_state  # noqa: E402
+
+
+@pytest.fixture
+async def fake_github():
+    """
+    A FakeGitHub (no latency) behind the app's GitHub client, with the per-process
+    caches cleared before and after.
+    """
+    reset_app_state()
+    fake = FakeGitHub(latency=0.0)
+    await start_github_client(fake.transport())
+    yield fake
+    await close_github_client()
+    reset_app_state()
@@ -0,0 +1,129 @@
+# tests/test_bulk.py
+import gzip
+import json
+
+import httpx
+import pytest
+
+from app import targets
+from app.bulk import _ndjson_lines
+from app.config import settings
+from app.main import app
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _lines(*chunks):
+    return [line async for line in _ndjson_lines(_chunks(*chunks))]
+
+
+async def test_ndjson_lines_are_split_across_chunks():
+    assert await _lines(b'{"a"', b': 1}\n\n  \n{"b": 2}\r', b"\n", b'{"c": 3}') == [
+        (1, b'{"a": 1}'),
+        (4, b'{"b": 2}\r'),
+        (5, b'{"c": 3}'),
+    ]
+    assert await _lines(b"", b"\n\n") == []
+
+
+async def test_oversized_ndjson_lines_are_dropped_while_streaming(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_WEBHOOK_BODY_BYTES", 8)
+    assert await _lines(b"short\n", b"x" * 5, b"x" * 5, b"\nok\n", b"y" * 9) == [
+        (1, b"short"),
+        (2, None),
+        (3, b"ok"),
+        (4, None),
+    ]
+
+
+def _record(commit_hash: str, second: int, prompt: str, **extra) -> dict:
+    return {"manifest": {"prompt": prompt}, "commit_hash": commit_hash, "created_at": f"2025-01-01T00:00:{second:02d}Z", **extra}
+
+
+async def _post_bulk(body: bytes, path: str = "/webhook/github-commit/bulk", headers=None):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(path, content=body, headers=headers)
+    assert response.status_code == 200
+    *results, summary = [json.loads(line) for line in response.text.splitlines()]
+    return sorted(results, key=lambda result: result["line"]), summary["summary"]
+
+
+@pytest.fixture
+def docs_target(monkeypatch):
+    """
+    A second target on the same (fake) repository that writes another file.
+    """
+    default = targets.resolve_target(None)
+    monkeypatch.setattr(targets, "_targets", {
+        targets.DEFAULT_TARGET_KEY: default,
+        "docs": default.model_copy(update={"key": "docs", "file_path": "docs_manifest.json"}),
+    })
+
+
+async def test_records_are_grouped_per_file_and_commit_the_newest_manifest(fake_github, docs_target, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_RECORDS_PER_COMMIT", 3)
+    records = [
+        _record("a1", 1, "a1"),
+        _record("d1", 1, "d1", target="docs"),
+        _record("a3", 3, "a3"),  # Newest of the first batch of the default file
+        _record("a2", 2, "a2"),
+        _record("d2", 2, "d2", target="docs"),
+        _record("a4", 4, "a4"),
+    ]
+    body = "\n".join(json.dumps(record) for record in records).encode("utf-8") + b"\n"
+
+    results, summary = await _post_bulk(gzip.compress(body), headers={"Content-Encoding": "gzip"})
+
+    assert [(r["line"], r["commit_hash"], r["target"], r["manifest_commit_hash"]) for r in results] == [
+        (1, "a1", "default", "a3"),
+        (2, "d1", "docs", "d2"),
+        (3, "a3", "default", "a3"),
+        (4, "a2", "default", "a3"),
+        (5, "d2", "docs", "d2"),
+        (6, "a4", "default", "a4"),
+    ]
+    assert {r["status"] for r in results} == {"committed"}
+    assert {key: summary[key] for key in ("records", "committed", "failed", "commits")} == {
+        "records": 6, "committed": 6, "failed": 0, "commits": 3,
+    }
+    files = fake_github.files_at(settings.GITHUB_BRANCH)
+    assert json.loads(files[settings.GITHUB_FILE_PATH]) == {"prompt": "a4"}
+    assert json.loads(files["docs_manifest.json"]) == {"prompt": "d2"}
+
+
+async def test_invalid_records_fail_alone(fake_github):
+    body = b"\n".join([
+        json.dumps(_record("ok", 1, "ok")).encode("utf-8"),
+        b'{"manifest": {"prompt": "secret"}, "created_at": "x"}',
+        b"not json",
+        json.dumps(_record("lost", 2, "lost", target="nowhere")).encode("utf-8"),
+    ])
+
+    results, summary = await _post_bulk(body)
+
+    assert [(r["line"], r["status"], r.get("status_code")) for r in results] == [
+        (1, "committed", None),
+        (2, "failed", 422),
+        (3, "failed", 422),
+        (4, "failed", 404),
+    ]
+    assert "secret" not in json.dumps(results)
+    assert (summary["records"], summary["failed"], summary["commits"]) == (4, 3, 1)
+
+
+async def test_target_from_the_path_overrides_the_records(fake_github, docs_target):
+    body = json.dumps(_record("d1", 1, "d1", target="default")).encode("utf-8")
+    results, _ = await _post_bulk(body, path="/webhook/docs/github-commit/bulk")
+    assert results[0]["target"] == "docs"
+    assert json.loads(fake_github.files_at(settings.GITHUB_BRANCH)["docs_manifest.json"]) == {"prompt": "d1"}
+
+
+async def test_a_truncated_gzip_body_still_commits_the_records_read(fake_github):
+    body = gzip.compress((json.dumps(_record("a1", 1, "a1")) + "\n").encode("utf-8") * 3)
+    # Without the gzip trailer (CRC and size) the stream never reaches its end
+    results, summary = await _post_bulk(body[:-8], headers={"Content-Encoding": "gzip"})
+    assert [r["status"] for r in results] == ["committed"] * 3
+    assert summary["error"].startswith("Request body is not valid compressed data")
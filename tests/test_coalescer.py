@@ -0,0 +1,126 @@
+# tests/test_coalescer.py
+import asyncio
+
+import pytest
+
+from app.coalescer import WriteCoalescer, build_coalesced_commit_message, created_at_sort_key
+from app.models import WebhookPayload
+
+KEY = ("fake/repo", "main", "prompt_manifest.json")
+
+
+def _payload(commit_hash: str, created_at: str) -> WebhookPayload:
+    return WebhookPayload(manifest={"prompt": commit_hash}, commit_hash=commit_hash, created_at=created_at)
+
+
+def test_created_at_sort_key_orders_iso_timestamps_after_unparseable_ones():
+    payloads = [
+        _payload("utc", "2025-01-01T10:00:00Z"),
+        _payload("offset", "2025-01-01T11:30:00+02:00"),  # 09:30 UTC
+        _payload("naive", "2025-01-01T09:45:00"),  # Treated as UTC
+        _payload("garbage", "yesterday"),
+    ]
+    ordered = [p.commit_hash for p in sorted(payloads, key=created_at_sort_key)]
+    assert ordered == ["garbage", "offset", "naive", "utc"]
+
+
+async def test_burst_is_merged_into_one_commit_of_the_newest_manifest():
+    coalescer = WriteCoalescer(window=0.05, max_wait=5.0)
+    commits = []
+
+    async def commit_fn(newest, payloads):
+        commits.append((newest.commit_hash, [p.commit_hash for p in payloads]))
+        return {"commit": {"sha": "abc"}}
+
+    # The newest event by created_at is not the last one to arrive
+    results = await asyncio.gather(
+        coalescer.submit(KEY, _payload("a", "2025-01-01T00:00:01Z"), commit_fn),
+        coalescer.submit(KEY, _payload("b", "2025-01-01T00:00:03Z"), commit_fn),
+        coalescer.submit(KEY, _payload("c", "2025-01-01T00:00:02Z"), commit_fn),
+    )
+
+    assert commits == [("b", ["a", "b", "c"])]
+    assert results == [({"commit": {"sha": "abc"}}, ["a", "b", "c"])] * 3
+
+
+async def test_ties_keep_the_last_arrived_payload():
+    coalescer = WriteCoalescer(window=0.02, max_wait=5.0)
+    newest = []
+
+    async def commit_fn(payload, payloads):
+        newest.append(payload.commit_hash)
+        return {}
+
+    await asyncio.gather(*(coalescer.submit(KEY, _payload(h, "2025-01-01T00:00:00Z"), commit_fn) for h in "xyz"))
+    assert newest == ["z"]
+
+
+async def test_different_files_are_committed_separately():
+    coalescer = WriteCoalescer(window=0.02, max_wait=5.0)
+    committed = []
+
+    async def commit_fn(newest, payloads):
+        committed.append(newest.commit_hash)
+        return {}
+
+    await asyncio.gather(
+        coalescer.submit(KEY, _payload("a", "2025-01-01T00:00:00Z"), commit_fn),
+        coalescer.submit(("fake/repo", "main", "other.json"), _payload("b", "2025-01-01T00:00:00Z"), commit_fn),
+    )
+    assert sorted(committed) == ["a", "b"]
+
+
+async def test_max_wait_bounds_a_steady_stream():
+    coalescer = WriteCoalescer(window=0.05, max_wait=0.12)
+    batches = []
+
+    async def commit_fn(newest, payloads):
+        batches.append([p.commit_hash for p in payloads])
+        return {}
+
+    async def send(index):
+        await asyncio.sleep(index * 0.03)
+        await coalescer.submit(KEY, _payload(str(index), f"2025-01-01T00:00:{index:02d}Z"), commit_fn)
+
+    # A write every 30ms never leaves a 50ms quiet window, so only max_wait flushes
+    await asyncio.gather(*(send(i) for i in range(8)))
+    assert len(batches) >= 2
+    assert [h for batch in batches for h in batch] == [str(i) for i in range(8)]
+
+
+async def test_a_failed_commit_is_raised_to_every_merged_request():
+    coalescer = WriteCoalescer(window=0.02, max_wait=5.0)
+
+    async def commit_fn(newest, payloads):
+        raise RuntimeError("GitHub is down")
+
+    results = await asyncio.gather(
+        coalescer.submit(KEY, _payload("a", "2025-01-01T00:00:00Z"), commit_fn),
+        coalescer.submit(KEY, _payload("b", "2025-01-01T00:00:01Z"), commit_fn),
+        return_exceptions=True,
+    )
+    assert [str(r) for r in results] == ["GitHub is down", "GitHub is down"]
+
+
+async def test_a_cancelled_caller_does_not_cancel_the_others():
+    coalescer = WriteCoalescer(window=0.05, max_wait=5.0)
+
+    async def commit_fn(newest, payloads):
+        return {"merged": len(payloads)}
+
+    leaving = asyncio.create_task(coalescer.submit(KEY, _payload("a", "2025-01-01T00:00:00Z"), commit_fn))
+    staying = asyncio.create_task(coalescer.submit(KEY, _payload("b", "2025-01-01T00:00:01Z"), commit_fn))
+    await asyncio.sleep(0.01)
+    leaving.cancel()
+
+    assert await staying == ({"merged": 2}, ["a", "b"])
+    with pytest.raises(asyncio.CancelledError):
+        await leaving
+
+
+def test_coalesced_commit_message_lists_every_event():
+    payloads = [_payload("a", "1"), _payload("b", "2")]
+    message = build_coalesced_commit_message(payloads[1], payloads)
+    assert message.startswith("feat: Update prompt manifest via webhook - commit b")
+    assert "Coalesced 2 webhook events:\n- a\n- b" in message
+    assert build_coalesced_commit_message(payloads[0], payloads[:1]) == "feat: Update prompt manifest via webhook - commit a"
@@ -0,0 +1,162 @@
+# tests/test_github_scheduler.py
+import asyncio
+import email.utils
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.github_scheduler import GitHubScheduler, SchedulingTransport, _parse_retry_after
+
+
+def _scheduler(**overrides) -> GitHubScheduler:
+    options = {"rate_per_second": 0, "burst": 1, "max_concurrency": 10, "max_wait": 1.0, "quota_reserve": 0}
+    options.update(overrides)
+    return GitHubScheduler(**options)
+
+
+def _response(status_code: int, headers=None, text: str = "") -> httpx.Response:
+    return httpx.Response(status_code, headers=headers, text=text)
+
+
+def _assert_shed(exc_info, retry_after: str) -> None:
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": retry_after}
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after("30") == 30.0
+    assert _parse_retry_after("-5") == 0.0
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after("soon") is None
+    in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 < _parse_retry_after(in_a_minute) <= 60
+
+
+def test_is_rate_limited_tells_rate_limits_from_permission_errors():
+    assert GitHubScheduler.is_rate_limited(_response(429))
+    assert GitHubScheduler.is_rate_limited(_response(403, {"Retry-After": "5"}))
+    assert GitHubScheduler.is_rate_limited(_response(403, {"X-RateLimit-Remaining": "0"}))
+    assert GitHubScheduler.is_rate_limited(_response(403, text='{"message": "You have exceeded a secondary rate limit"}'))
+    assert not GitHubScheduler.is_rate_limited(_response(403, text='{"message": "Resource not accessible by integration"}'))
+    assert not GitHubScheduler.is_rate_limited(_response(500))
+
+
+async def test_token_bucket_delays_within_max_wait_and_sheds_beyond_it():
+    scheduler = _scheduler(rate_per_second=10, burst=2, max_wait=0.15)
+    started = time.monotonic()
+    for _ in range(3):  # Two from the burst, the third waits about 0.1s for a token
+        await scheduler.acquire()
+        scheduler.release()
+    assert time.monotonic() - started >= 0.08
+
+    # A burst at once: the 2nd call waits 0.1s, the 3rd would wait 0.2s and is shed
+    scheduler = _scheduler(rate_per_second=10, burst=1, max_wait=0.15)
+    results = await asyncio.gather(*(scheduler.acquire() for _ in range(3)), return_exceptions=True)
+    assert results[:2] == [None, None]
+    assert isinstance(results[2], HTTPException)
+    assert results[2].status_code == 503
+    assert results[2].headers == {"Retry-After": "1"}
+    assert scheduler.totals["shed"] == 1
+
+
+async def test_retry_after_pauses_every_call():
+    scheduler = _scheduler(max_wait=1.0)
+    assert scheduler.observe(_response(429, {"Retry-After": "120"})) == 120.0
+    assert scheduler.totals["throttled"] == 1
+
+    with pytest.raises(HTTPException) as exc_info:
+        await scheduler.acquire()
+    _assert_shed(exc_info, "120")
+
+    # A short pause is waited out instead
+    scheduler._paused_until = time.monotonic() + 0.05
+    await scheduler.acquire()
+    scheduler.release()
+
+
+async def test_nearly_exhausted_quota_sheds_until_the_reset():
+    scheduler = _scheduler(quota_reserve=10, max_wait=1.0)
+    scheduler.observe(_response(200, {
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Remaining": "10",
+        "X-RateLimit-Reset": str(int(time.time()) + 300),
+    }))
+    assert (scheduler.limit, scheduler.remaining) == (5000, 10)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await scheduler.acquire()
+    assert exc_info.value.status_code == 503
+    assert 295 <= int(exc_info.value.headers["Retry-After"]) <= 301
+
+    scheduler.remaining = 11
+    await scheduler.acquire()
+    scheduler.release()
+    assert scheduler.remaining == 10  # Our own call is counted until GitHub reports again
+
+
+async def test_concurrency_is_capped():
+    scheduler = _scheduler(max_concurrency=2)
+    await scheduler.acquire()
+    await scheduler.acquire()
+    third = asyncio.create_task(scheduler.acquire())
+    await asyncio.sleep(0.01)
+    assert not third.done()
+    assert (scheduler.in_flight, scheduler.waiting) == (2, 1)
+
+    scheduler.release()
+    await asyncio.wait_for(third, 1)
+    assert (scheduler.in_flight, scheduler.waiting) == (2, 0)
+
+
+def _transport(responses, scheduler=None, max_retries=3):
+    """
+    SchedulingTransport over a mock that returns `responses` in order; returns it and
+    the list of requests the mock received.
+    """
+    received = []
+    queue = list(responses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(request.method)
+        return queue.pop(0)
+
+    transport = SchedulingTransport(
+        httpx.MockTransport(handler), scheduler or _scheduler(), max_retries=max_retries, base_delay=0.001, max_delay=0.01
+    )
+    return transport, received
+
+
+async def test_rate_limited_requests_are_retried_for_any_method():
+    transport, received = _transport([_response(429, {"Retry-After": "0"}), _response(201)])
+    async with httpx.AsyncClient(transport=transport, base_url="https://api.github.test") as client:
+        response = await client.post("/repos/o/r/pulls", json={})
+    assert response.status_code == 201
+    assert received == ["POST", "POST"]
+    assert transport.scheduler.totals["retries"] == 1
+
+
+async def test_server_errors_are_only_retried_for_idempotent_methods():
+    transport, received = _transport([_response(502), _response(200)])
+    async with httpx.AsyncClient(transport=transport, base_url="https://api.github.test") as client:
+        assert (await client.get("/repos/o/r")).status_code == 200
+    assert received == ["GET", "GET"]
+
+    transport, received = _transport([_response(502), _response(200)])
+    async with httpx.AsyncClient(transport=transport, base_url="https://api.github.test") as client:
+        assert (await client.post("/repos/o/r/git/commits", json={})).status_code == 502
+    assert received == ["POST"]
+
+
+async def test_retries_stop_at_max_retries_and_at_long_retry_afters():
+    transport, received = _transport([_response(503)] * 3, max_retries=2)
+    async with httpx.AsyncClient(transport=transport, base_url="https://api.github.test") as client:
+        assert (await client.get("/repos/o/r")).status_code == 503
+    assert len(received) == 3
+
+    # GitHub's answer is returned instead of holding the webhook past max_wait
+    transport, received = _transport([_response(429, {"Retry-After": "60"}), _response(200)])
+    async with httpx.AsyncClient(transport=transport, base_url="https://api.github.test") as client:
+        assert (await client.get("/repos/o/r")).status_code == 429
+    assert len(received) == 1
@@ -0,0 +1,153 @@
+# tests/test_idempotency.py
+import asyncio
+
+import httpx
+import pytest
+
+from app.idempotency import IdempotencyStore
+from app.main import app
+from app.shared_state import start_shared_state, stop_shared_state
+
+
+@pytest.fixture
+async def shared_state():
+    shared = await start_shared_state()
+    yield shared
+    stop_shared_state()
+
+
+def _operation(calls, response=(200, {"status": "ok"}), delay=0.0):
+    async def operation():
+        calls.append(response)
+        await asyncio.sleep(delay)
+        return response
+    return operation
+
+
+async def test_duplicate_after_success_is_replayed():
+    store = IdempotencyStore(max_entries=10, ttl=60)
+    calls = []
+
+    assert await store.run("k", _operation(calls)) == ((200, {"status": "ok"}), False)
+    assert await store.run("k", _operation(calls)) == ((200, {"status": "ok"}), True)
+    assert len(calls) == 1
+
+
+async def test_in_flight_duplicates_share_one_operation():
+    store = IdempotencyStore(max_entries=10, ttl=60)
+    calls = []
+
+    results = await asyncio.gather(*(store.run("k", _operation(calls, delay=0.02)) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert [replayed for _, replayed in results] == [False, True, True, True, True]
+
+
+async def test_failures_are_not_stored():
+    store = IdempotencyStore(max_entries=10, ttl=60)
+    calls = []
+
+    async def failing():
+        calls.append("failed")
+        await asyncio.sleep(0.01)
+        raise RuntimeError("GitHub is down")
+
+    # The duplicate that waited on the failed operation sees the same error
+    results = await asyncio.gather(store.run("k", failing), store.run("k", failing), return_exceptions=True)
+    assert [str(r) for r in results] == ["GitHub is down", "GitHub is down"]
+    assert calls == ["failed"]
+
+    # A retry runs the operation again
+    assert await store.run("k", _operation(calls)) == ((200, {"status": "ok"}), False)
+    assert len(store) == 1
+
+
+async def test_cancelled_duplicate_does_not_cancel_the_operation():
+    store = IdempotencyStore(max_entries=10, ttl=60)
+    calls = []
+
+    first = asyncio.create_task(store.run("k", _operation(calls, delay=0.05)))
+    await asyncio.sleep(0)
+    duplicate = asyncio.create_task(store.run("k", _operation(calls)))
+    await asyncio.sleep(0.01)
+    duplicate.cancel()
+
+    assert await first == ((200, {"status": "ok"}), False)
+    assert len(calls) == 1
+
+
+async def test_entries_expire_and_are_evicted_least_recently_used_first():
+    store = IdempotencyStore(max_entries=2, ttl=60)
+    calls = []
+    for key in ("a", "b"):
+        await store.run(key, _operation(calls))
+    await store.run("a", _operation(calls))  # "a" is now the most recently used
+    await store.run("c", _operation(calls))
+
+    assert list(store._entries) == ["a", "c"]
+
+    store.ttl = 0
+    await store.run("d", _operation(calls))
+    assert (await store.run("d", _operation(calls)))[1] is False
+
+
+async def test_retried_webhook_is_committed_once(fake_github):
+    payload = {"manifest": {"prompt": "v1"}, "commit_hash": "retried", "created_at": "2025-01-01T00:00:00Z"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.post("/webhook/github-commit", json=payload)
+        retry = await client.post("/webhook/github-commit", json=payload)
+        other_key = await client.post("/webhook/github-commit", json=payload, headers={"Idempotency-Key": "new"})
+
+    assert (first.status_code, retry.status_code) == (201, 201)
+    assert retry.json() == first.json()
+    assert (first.headers.get("Idempotent-Replayed"), retry.headers.get("Idempotent-Replayed")) == (None, "true")
+    assert fake_github.calls[("PUT", "contents")] == 1
+    # A new key runs again, but the file already holds this manifest
+    assert other_key.json()["github_commit_details"] == {}
+
+
+async def test_duplicates_on_other_workers_replay_the_shared_response(shared_state):
+    # Two stores stand in for two worker processes sharing the host's database
+    worker_1 = IdempotencyStore(max_entries=10, ttl=60)
+    worker_2 = IdempotencyStore(max_entries=10, ttl=60)
+    calls = []
+
+    results = await asyncio.gather(
+        worker_1.run("shared", _operation(calls, delay=0.1)),
+        worker_2.run("shared", _operation(calls)),
+    )
+
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert results[0][0] == results[1][0]
+
+
+async def test_failed_operation_releases_the_shared_claim(shared_state):
+    worker_1 = IdempotencyStore(max_entries=10, ttl=60)
+    worker_2 = IdempotencyStore(max_entries=10, ttl=60)
+
+    async def failing():
+        raise RuntimeError("GitHub is down")
+
+    with pytest.raises(RuntimeError):
+        await worker_1.run("released", failing)
+
+    calls = []
+    assert await worker_2.run("released", _operation(calls)) == ((200, {"status": "ok"}), False)
+    assert len(calls) == 1
+
+
+async def test_cancelled_operation_releases_the_shared_claim(shared_state):
+    worker_1 = IdempotencyStore(max_entries=10, ttl=60)
+    worker_2 = IdempotencyStore(max_entries=10, ttl=60)
+    running = asyncio.create_task(worker_1.run("cancelled", _operation([], delay=10)))
+    await asyncio.sleep(0.05)
+
+    running.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running
+
+    # Released rather than left to expire after SHARED_IDEMPOTENCY_LEASE_SECONDS
+    calls = []
+    assert await asyncio.wait_for(worker_2.run("cancelled", _operation(calls)), 2) == ((200, {"status": "ok"}), False)
+    assert len(calls) == 1
@@ -0,0 +1,161 @@
+# tests/test_job_queue.py
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+from app import job_queue
+from app.config import settings
+from app.job_queue import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobQueue, JobWorkerPool
+from app.models import WebhookPayload
+
+PAYLOAD = WebhookPayload(manifest={"prompt": "v1"}, commit_hash="c1", created_at="2025-01-01T00:00:00Z")
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL", 0.01)
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    yield queue
+    queue.close()
+
+
+def _runner(outcomes):
+    """
+    A job runner that raises or returns the given outcomes in order, recording each call.
+    """
+    calls = []
+
+    async def runner(payload):
+        calls.append(payload.commit_hash)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return runner, calls
+
+
+async def _run_until_done(queue, job_id, timeout=5.0):
+    async def wait():
+        while (await queue.get(job_id))["status"] in (JOB_QUEUED, JOB_RUNNING):
+            await asyncio.sleep(0.01)
+
+    pool = JobWorkerPool(queue, concurrency=2)
+    pool.start()
+    try:
+        await asyncio.wait_for(wait(), timeout)
+    finally:
+        await pool.stop()
+    return await queue.get(job_id)
+
+
+async def test_claim_leases_one_job_at_a_time(queue):
+    job_id = await queue.enqueue("commit", PAYLOAD)
+
+    job = queue._claim(lease_seconds=60, max_attempts=3)
+    assert (job["id"], job["attempts"]) == (job_id, 1)
+    assert queue._claim(lease_seconds=60, max_attempts=3) is None
+    assert (await queue.get(job_id))["status"] == JOB_RUNNING
+
+
+async def test_expired_lease_is_claimed_again_until_the_last_attempt(queue):
+    job_id = await queue.enqueue("commit", PAYLOAD)
+
+    # A negative lease stands in for a worker that died holding the job
+    for attempt in (1, 2, 3):
+        assert queue._claim(lease_seconds=-1, max_attempts=3)["attempts"] == attempt
+    assert queue._claim(lease_seconds=-1, max_attempts=3) is None
+
+    job = await queue.get(job_id)
+    assert (job["status"], job["attempts"]) == (JOB_FAILED, 3)
+    assert job["error"] == "Worker lease expired on the last of 3 attempt(s)."
+
+
+async def test_retryable_failures_are_retried_until_success(queue, monkeypatch):
+    runner, calls = _runner([HTTPException(status_code=503, detail="Busy"), HTTPException(status_code=409, detail="Conflict"), {"ok": True}])
+    monkeypatch.setitem(job_queue.JOB_RUNNERS, "commit", runner)
+
+    job = await _run_until_done(queue, await queue.enqueue("commit", PAYLOAD))
+
+    assert (job["status"], job["attempts"], job["result"]) == (JOB_SUCCEEDED, 3, {"ok": True})
+    assert calls == ["c1", "c1", "c1"]
+
+
+async def test_permanent_failures_are_not_retried(queue, monkeypatch):
+    runner, calls = _runner([HTTPException(status_code=422, detail="Bad manifest")])
+    monkeypatch.setitem(job_queue.JOB_RUNNERS, "commit", runner)
+
+    job = await _run_until_done(queue, await queue.enqueue("commit", PAYLOAD))
+
+    assert (job["status"], job["attempts"], job["error"]) == (JOB_FAILED, 1, "422: Bad manifest")
+    assert len(calls) == 1
+
+
+async def test_jobs_fail_after_max_attempts(queue, monkeypatch):
+    runner, calls = _runner([RuntimeError("boom")])
+    monkeypatch.setitem(job_queue.JOB_RUNNERS, "commit", runner)
+
+    job = await _run_until_done(queue, await queue.enqueue("commit", PAYLOAD))
+
+    assert (job["status"], job["attempts"], job["error"]) == (JOB_FAILED, 3, "Unexpected error: boom")
+    assert len(calls) == 3
+
+
+async def test_unknown_kinds_fail_immediately(queue):
+    job = await _run_until_done(queue, await queue.enqueue("nope", PAYLOAD))
+    assert (job["status"], job["error"]) == (JOB_FAILED, "Unknown job kind 'nope'.")
+
+
+async def test_stop_requeues_interrupted_jobs(queue, monkeypatch):
+    started = asyncio.Event()
+
+    async def hanging(payload):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setitem(job_queue.JOB_RUNNERS, "commit", hanging)
+    job_id = await queue.enqueue("commit", PAYLOAD)
+    pool = JobWorkerPool(queue, concurrency=1)
+    pool.start()
+    await asyncio.wait_for(started.wait(), 5)
+    await pool.stop()
+
+    job = await queue.get(job_id)
+    assert (job["status"], job["error"]) == (JOB_QUEUED, "Interrupted by worker shutdown.")
+    assert queue._claim(lease_seconds=60, max_attempts=3)["attempts"] == 2
+
+
+async def test_workers_survive_sqlite_errors_when_recording_an_outcome(queue, monkeypatch):
+    runner, calls = _runner([{"ok": True}])
+    monkeypatch.setitem(job_queue.JOB_RUNNERS, "commit", runner)
+    finish = queue.finish
+    failures = []
+
+    async def flaky_finish(job_id, status, *args, **kwargs):
+        if not failures:
+            failures.append(job_id)
+            raise sqlite3.OperationalError("database is locked")
+        await finish(job_id, status, *args, **kwargs)
+
+    monkeypatch.setattr(queue, "finish", flaky_finish)
+    first_id = await queue.enqueue("commit", PAYLOAD)
+    second_id = await queue.enqueue("commit", PAYLOAD)
+
+    pool = JobWorkerPool(queue, concurrency=1)
+    pool.start()
+    try:
+        async def wait():
+            while (await queue.get(second_id))["status"] != JOB_SUCCEEDED:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(wait(), 5)
+        assert not any(task.done() for task in pool._tasks)
+    finally:
+        await pool.stop()
+
+    # The job whose outcome was lost stays leased and runs again once the lease expires
+    assert failures == [first_id]
+    assert (await queue.get(first_id))["status"] in (JOB_RUNNING, JOB_QUEUED)
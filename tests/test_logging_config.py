@@ -0,0 +1,87 @@
+# tests/test_logging_config.py
+import json
+import queue
+import logging
+
+from app import logging_config
+from app.logging_config import JsonFormatter, RepeatedErrorSampler, _DroppingQueueHandler, log_context
+
+
+def _record(message: str = "GitHub is down", level: int = logging.ERROR, lineno: int = 10, **extra) -> logging.LogRecord:
+    record = logging.makeLogRecord({"name": "app.helpers", "levelno": level, "levelname": logging.getLevelName(level), "pathname": "helpers.py", "lineno": lineno, "msg": message})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_full_queue_drops_and_counts_records_instead_of_blocking():
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=2))
+    logger = logging.getLogger("app.tests.full_queue")
+    logger.handlers = [handler]
+    logger.propagate = False
+
+    # Nothing drains the queue; a blocking handler would hang on the third record
+    for i in range(5):
+        logger.warning("record %d", i)
+
+    assert handler.dropped == 3
+    assert [handler.queue.get_nowait().msg for _ in range(2)] == ["record 0", "record 1"]
+
+
+def test_queued_records_carry_the_context_ids():
+    handler = _DroppingQueueHandler(queue.Queue())
+    with log_context("req-1", "corr-1"):
+        handler.handle(_record())
+    record = handler.queue.get_nowait()
+    assert (record.request_id, record.correlation_id) == ("req-1", "corr-1")
+
+
+def test_sampler_keeps_its_configured_rate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(logging_config.time, "monotonic", lambda: now[0])
+    sampler = RepeatedErrorSampler(window=60, burst=3)
+
+    for window in range(3):
+        records = [_record() for _ in range(10)]
+        passed = [record for record in records if sampler.filter(record)]
+        assert len(passed) == 3
+        # The first record of a window reports what the previous one suppressed
+        assert getattr(passed[0], "suppressed", None) == (7 if window else None)
+        now[0] += 60
+
+    # Other call sites and records below WARNING have their own budget / are never sampled
+    assert sampler.filter(_record(lineno=11))
+    assert all(sampler.filter(_record(level=logging.INFO)) for _ in range(10))
+
+
+def test_sampling_is_disabled_with_a_zero_burst():
+    sampler = RepeatedErrorSampler(window=60, burst=0)
+    assert all(sampler.filter(_record()) for _ in range(20))
+
+
+def test_oversized_messages_and_fields_are_truncated():
+    formatter = JsonFormatter(max_chars=50)
+    record = _record("x" * 500, github_body="y" * 80, status=422)
+    record.exc_text = "z" * 500
+
+    entry = json.loads(formatter.format(record))
+
+    assert entry["message"] == "x" * 50 + "... [truncated 450 chars]"
+    assert entry["github_body"] == "y" * 50 + "... [truncated 30 chars]"
+    assert entry["status"] == 422
+    assert entry["exception"] == "z" * 200 + "... [truncated 300 chars]"
+    assert (entry["level"], entry["logger"]) == ("ERROR", "app.helpers")
+
+
+def test_dropped_records_are_reported_as_json_on_shutdown(monkeypatch, capsys):
+    app_logger = logging.getLogger("app")
+    for attribute in ("handlers", "propagate", "level"):
+        monkeypatch.setattr(app_logger, attribute, getattr(app_logger, attribute))
+    logging_config.setup_logging()
+    logging_config._queue_handler.dropped = 3
+
+    logging_config.shutdown_logging()
+
+    entry = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert (entry["level"], entry["logger"]) == ("WARNING", "app.logging_config")
+    assert entry["message"] == "Dropped 3 log records because the log queue was full."
+    assert "time" in entry
@@ -0,0 +1,267 @@
+# tests/test_manifest_layout.py
+import base64
+import hashlib
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app import git_data, targets
+from app.git_data import commit_manifest_exploded
+from app.github_client import close_github_client, start_github_client
+from app.manifest_layout import _component_file_name, explode_manifest, exploded_manifest_dir, serialize_json
+from app.models import WebhookPayload
+from app.sha_cache import git_blob_sha
+from app.targets import resolve_target, use_target
+
+MANIFEST = {
+    "lc": 1,
+    "id": ["langchain", "schema", "runnable", "RunnableSequence"],
+    "kwargs": {
+        "first": {"template": "Hello {name}"},
+        "middle": [{"model": "gpt-4o"}],
+        "last": {"parser": "str"},
+    },
+}
+
+
+class FakeGitData:
+    """
+    A single-branch stand-in for GitHub's Git Data API with flat trees ({path: blob SHA}).
+    `interfere` is called before each ref update, to simulate another writer moving the branch.
+    """
+
+    def __init__(self):
+        self.blobs = {}
+        self.trees = {"t0": {}}
+        self.commits = {"c0": {"tree": "t0", "parents": []}}
+        self.head = "c0"
+        self.sent = []  # (method, route)
+        self.posted_trees = []  # `tree` entries of every tree POST
+        self.interfere = None
+
+    def files(self) -> dict:
+        return {path: self.blobs.get(sha) for path, sha in self.trees[self.commits[self.head]["tree"]].items()}
+
+    def commit_files(self, files: dict, message: str = "other writer") -> str:
+        tree = dict(self.trees[self.commits[self.head]["tree"]])
+        for path, content in files.items():
+            self.blobs[git_blob_sha(content)] = content
+            tree[path] = git_blob_sha(content)
+        tree_sha = self._store_tree(tree)
+        return self._store_commit(message, tree_sha, [self.head], move_head=True)
+
+    def _store_tree(self, tree: dict) -> str:
+        tree_sha = "t" + hashlib.sha1(json.dumps(tree, sort_keys=True).encode()).hexdigest()[:12]
+        self.trees[tree_sha] = tree
+        return tree_sha
+
+    def _store_commit(self, message: str, tree_sha: str, parents: list, move_head: bool = False) -> str:
+        commit_sha = "c" + hashlib.sha1(f"{message}{tree_sha}{parents}".encode()).hexdigest()[:12]
+        self.commits[commit_sha] = {"tree": tree_sha, "parents": parents}
+        if move_head:
+            self.head = commit_sha
+        return commit_sha
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        route = request.url.path.split("/git/", 1)[1]
+        kind = route.split("/", 1)[0]
+        self.sent.append((request.method, kind))
+        body = json.loads(request.content) if request.content else {}
+        if request.method == "GET" and kind == "ref":
+            etag = f'"{self.head}"'
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304)
+            return httpx.Response(200, json={"object": {"sha": self.head}}, headers={"ETag": etag})
+        if request.method == "GET" and kind == "commits":
+            return httpx.Response(200, json={"tree": {"sha": self.commits[route.split("/")[1]]["tree"]}})
+        if request.method == "GET" and kind == "trees":
+            commit_sha, directory = route.split("/", 1)[1].split(":", 1)
+            tree = self.trees[self.commits[commit_sha]["tree"]]
+            entries = [
+                {"path": path[len(directory) + 1:], "type": "blob", "sha": sha}
+                for path, sha in tree.items() if path.startswith(directory + "/")
+            ]
+            return httpx.Response(200, json={"tree": entries}) if entries else httpx.Response(404)
+        if kind == "blobs":
+            content = base64.b64decode(body["content"])
+            self.blobs[git_blob_sha(content)] = content
+            return httpx.Response(201, json={"sha": git_blob_sha(content)})
+        if kind == "trees":
+            self.posted_trees.append(body["tree"])
+            tree = dict(self.trees[body["base_tree"]])
+            for entry in body["tree"]:
+                if entry["sha"] is None:
+                    tree.pop(entry["path"], None)
+                else:
+                    tree[entry["path"]] = entry["sha"]
+            return httpx.Response(201, json={"sha": self._store_tree(tree)})
+        if kind == "commits":
+            return httpx.Response(201, json={"sha": self._store_commit(body["message"], body["tree"], body["parents"])})
+        if request.method == "PATCH" and kind == "refs":
+            if self.interfere is not None:
+                self.interfere()
+            if self.commits[body["sha"]]["parents"] != [self.head]:
+                return httpx.Response(422, json={"message": "Update is not a fast forward"})
+            self.head = body["sha"]
+            return httpx.Response(200, json={"object": {"sha": self.head}})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+async def git(monkeypatch):
+    fake = FakeGitData()
+    exploded = resolve_target(None).model_copy(update={"manifest_layout": "exploded", "manifest_dir": None})
+    monkeypatch.setattr(targets, "_targets", {targets.DEFAULT_TARGET_KEY: exploded})
+    for cache in (git_data._ref_cache, git_data._commit_tree_cache, git_data._manifest_listing_cache):
+        cache.clear()
+    await start_github_client(httpx.MockTransport(fake.handle))
+    yield fake
+    await close_github_client()
+
+
+def _payload(manifest: dict) -> WebhookPayload:
+    return WebhookPayload(manifest=manifest, commit_hash="c1", created_at="2025-01-01T00:00:00Z")
+
+
+def _with_kwargs(**kwargs) -> dict:
+    return {**MANIFEST, "kwargs": kwargs}
+
+
+def test_component_file_names_are_sanitised_and_deduplicated():
+    used = {}
+    assert _component_file_name("first", used) == "first.json"
+    assert _component_file_name("a/b c", used) == "a_b_c.json"
+    assert _component_file_name("a_b_c", used) == "a_b_c_2.json"
+    assert _component_file_name("a?b c", used) == "a_b_c_3.json"
+    assert _component_file_name("", used) == "_.json"
+    assert used["a_b_c_2.json"] == "a_b_c"
+
+
+def test_explode_manifest_replaces_components_with_refs():
+    manifest = _with_kwargs(first={"x": 1}, **{"../escape": [2]})
+
+    files = explode_manifest(manifest)
+
+    assert set(files) == {"manifest.json", "kwargs/first.json", "kwargs/.._escape.json"}
+    assert files["kwargs/first.json"] == serialize_json({"x": 1})
+    assert files["kwargs/.._escape.json"] == serialize_json([2])
+    root = json.loads(files["manifest.json"])
+    assert root["kwargs"] == {"first": {"$ref": "kwargs/first.json"}, "../escape": {"$ref": "kwargs/.._escape.json"}}
+    assert (root["lc"], root["id"]) == (manifest["lc"], manifest["id"])
+    # The caller's manifest is left untouched
+    assert manifest["kwargs"]["first"] == {"x": 1}
+
+
+def test_manifests_without_kwargs_are_one_root_file():
+    assert explode_manifest({"prompt": "v1"}) == {"manifest.json": serialize_json({"prompt": "v1"})}
+    assert explode_manifest({"kwargs": {}}) == {"manifest.json": serialize_json({"kwargs": {}})}
+
+
+def test_exploded_manifest_dir():
+    target = resolve_target(None).model_copy(update={"file_path": "prompts/chat.json", "manifest_dir": None})
+    with use_target(target):
+        assert exploded_manifest_dir() == "prompts/chat"
+    with use_target(target.model_copy(update={"manifest_dir": "/layout/chat/"})):
+        assert exploded_manifest_dir() == "layout/chat"
+
+
+async def test_only_changed_components_are_uploaded(git):
+    directory = exploded_manifest_dir()
+    first = await commit_manifest_exploded(_payload(MANIFEST))
+    assert sorted(first["content"]["files_changed"]) == sorted(
+        f"{directory}/{path}" for path in explode_manifest(MANIFEST)
+    )
+    assert git.files() == {f"{directory}/{path}": content for path, content in explode_manifest(MANIFEST).items()}
+
+    git.sent.clear()
+    changed = _with_kwargs(**{**MANIFEST["kwargs"], "last": {"parser": "json"}})
+    result = await commit_manifest_exploded(_payload(changed))
+
+    assert result["content"] == {"path": directory, "files_changed": [f"{directory}/kwargs/last.json"], "files_removed": []}
+    # The cached listing and commit tree spare the tree reads; only one blob is uploaded
+    assert [kind for method, kind in git.sent if method != "GET"] == ["blobs", "trees", "commits", "refs"]
+    assert git.files()[f"{directory}/kwargs/last.json"] == serialize_json({"parser": "json"})
+
+
+async def test_unchanged_manifest_skips_the_commit(git):
+    await commit_manifest_exploded(_payload(MANIFEST))
+    head = git.head
+    git.sent.clear()
+
+    result = await commit_manifest_exploded(_payload(MANIFEST))
+
+    assert result["status"] == "unchanged"
+    assert git.head == head
+    # One conditional ref lookup (a 304) and nothing else
+    assert git.sent == [("GET", "ref")]
+
+
+async def test_unchanged_manifest_is_detected_from_the_tree_listing(git):
+    await commit_manifest_exploded(_payload(MANIFEST))
+    git_data._manifest_listing_cache.clear()
+    git.sent.clear()
+
+    assert (await commit_manifest_exploded(_payload(MANIFEST)))["status"] == "unchanged"
+    assert git.sent == [("GET", "ref"), ("GET", "trees")]
+
+
+async def test_removed_components_are_deleted_from_the_tree(git):
+    directory = exploded_manifest_dir()
+    await commit_manifest_exploded(_payload(MANIFEST))
+    git.posted_trees.clear()
+
+    result = await commit_manifest_exploded(_payload(_with_kwargs(first=MANIFEST["kwargs"]["first"])))
+
+    removed = sorted([f"{directory}/kwargs/middle.json", f"{directory}/kwargs/last.json"])
+    assert sorted(result["content"]["files_removed"]) == removed
+    assert sorted(entry["path"] for entry in git.posted_trees[0] if entry["sha"] is None) == removed
+    assert sorted(git.files()) == sorted([f"{directory}/manifest.json", f"{directory}/kwargs/first.json"])
+
+
+async def test_commit_is_retried_when_the_branch_moves(git):
+    directory = exploded_manifest_dir()
+    moves = []
+
+    def another_writer():
+        if not moves:
+            moves.append(git.commit_files({"README.md": b"edited concurrently"}))
+
+    git.interfere = another_writer
+
+    result = await commit_manifest_exploded(_payload(MANIFEST))
+
+    assert [kind for method, kind in git.sent if method == "PATCH"] == ["refs", "refs"]
+    assert git.commits[git.head]["parents"] == moves
+    assert result["commit"]["sha"] == git.head
+    # Both our files and the other writer's change are on the branch
+    assert git.files()["README.md"] == b"edited concurrently"
+    assert git.files()[f"{directory}/manifest.json"] == explode_manifest(MANIFEST)["manifest.json"]
+
+
+async def test_commit_gives_up_with_409_when_the_branch_keeps_moving(git):
+    counter = iter(range(100))
+    git.interfere = lambda: git.commit_files({"README.md": f"edit {next(counter)}".encode()})
+
+    with pytest.raises(HTTPException) as excinfo:
+        await commit_manifest_exploded(_payload(MANIFEST))
+
+    assert excinfo.value.status_code == 409
+
+
+async def test_targets_sharing_a_branch_keep_their_own_manifest_listing(git):
+    default = resolve_target(None)
+    docs = default.model_copy(update={"key": "docs", "file_path": "docs.json"})
+    await commit_manifest_exploded(_payload(MANIFEST))
+    prompt_files = {path: content for path, content in git.files().items() if path.startswith("prompt_manifest/")}
+    assert prompt_files
+
+    with use_target(docs):
+        result = await commit_manifest_exploded(_payload({"title": "Docs"}))
+
+    assert result["content"] == {"path": "docs", "files_changed": ["docs/manifest.json"], "files_removed": []}
+    assert git.files() == {**prompt_files, "docs/manifest.json": serialize_json({"title": "Docs"})}
+    # And the default target's next commit does not delete the docs
+    unchanged = await commit_manifest_exploded(_payload(MANIFEST))
+    assert unchanged["status"] == "unchanged"
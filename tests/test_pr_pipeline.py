@@ -0,0 +1,144 @@
+# tests/test_pr_pipeline.py
+import json
+
+import pytest
+
+from app import git_data
+from app.config import settings
+from app.git_data import commit_manifest_to_new_branch
+from app.github_client import get_github_client
+from app.models import WebhookPayload
+from app.sha_cache import file_sha_cache, git_blob_sha
+from app.targets import resolve_target
+from app.workflows import run_pull_request
+
+
+@pytest.fixture(autouse=True)
+def git_data_pipeline(monkeypatch):
+    monkeypatch.setattr(settings, "PR_PIPELINE", "git_data")
+    monkeypatch.setattr(settings, "BASE_SHA_CACHE_TTL_SECONDS", 60.0)
+
+
+def _payload(prompt: str) -> WebhookPayload:
+    return WebhookPayload(manifest={"prompt": prompt}, commit_hash=f"c-{prompt}", created_at="2025-01-01T00:00:00Z")
+
+
+async def _commit(branch: str, prompt: str, reuse_branch: bool = False):
+    manifest_json_string = json.dumps(_payload(prompt).manifest, indent=2)
+    return await commit_manifest_to_new_branch(
+        get_github_client(), branch, _payload(prompt), manifest_json_string, f"feat: {prompt}", reuse_branch=reuse_branch
+    )
+
+
+def _manifest_on(fake_github, branch: str) -> dict:
+    return json.loads(fake_github.files_at(branch)[settings.GITHUB_FILE_PATH])
+
+
+async def test_branch_is_created_pointing_at_the_new_commit(fake_github):
+    base_sha = fake_github.refs[settings.GITHUB_BRANCH]
+
+    result = await _commit("feature/a", "v1")
+
+    assert fake_github.refs["feature/a"] == result["commit"]["sha"]
+    assert fake_github.commits[result["commit"]["sha"]]["parents"] == [{"sha": base_sha}]
+    assert _manifest_on(fake_github, "feature/a") == {"prompt": "v1"}
+    # No file SHA lookup and no separate blob upload
+    assert ("GET", "contents") not in fake_github.calls
+    assert ("POST", "blob") not in fake_github.calls
+
+
+async def test_base_sha_is_reused_until_the_ttl_expires(fake_github):
+    await _commit("feature/a", "v1")
+    await _commit("feature/b", "v2")
+    assert fake_github.calls[("GET", "ref")] == 1
+
+    key = (resolve_target(None).full_name, settings.GITHUB_BRANCH)
+    etag, head_sha, looked_up_at = git_data._ref_cache[key]
+    git_data._ref_cache[key] = (etag, head_sha, looked_up_at - 61)
+    await _commit("feature/c", "v3")
+
+    # Revalidated with a conditional GET; the base commit's tree is still cached
+    assert fake_github.calls[("GET", "ref")] == 2
+    assert fake_github.calls[("GET", "commit")] == 1
+    assert _manifest_on(fake_github, "feature/c") == {"prompt": "v3"}
+
+
+async def test_per_event_branches_do_not_grow_the_ref_cache(fake_github, monkeypatch):
+    monkeypatch.setattr(git_data, "_REF_CACHE_SIZE", 4)
+
+    for i in range(10):
+        await _commit(f"feature/prompt-{i}", f"v{i}")
+
+    base_key = (resolve_target(None).full_name, settings.GITHUB_BRANCH)
+    assert len(git_data._ref_cache) == 4
+    # The base branch is used by every webhook, so it is never the one evicted
+    assert base_key in git_data._ref_cache
+    assert fake_github.calls[("GET", "ref")] == 1
+
+
+async def test_existing_branch_gets_the_commit_stacked_on_top(fake_github):
+    first = await _commit("feature/a", "v1")
+
+    second = await _commit("feature/a", "v2")
+
+    # create-ref answered 422 "Reference already exists"; the commit built on the base
+    # is not a fast-forward of the branch, so it is rebuilt on the branch head
+    assert fake_github.calls[("POST", "create_ref")] == 2
+    assert fake_github.calls[("PATCH", "ref")] == 2
+    assert fake_github.refs["feature/a"] == second["commit"]["sha"]
+    assert fake_github.commits[second["commit"]["sha"]]["parents"] == [{"sha": first["commit"]["sha"]}]
+    assert _manifest_on(fake_github, "feature/a") == {"prompt": "v2"}
+
+
+async def test_existing_branch_that_contains_the_base_is_fast_forwarded(fake_github):
+    # A leftover branch still pointing at the base head
+    fake_github.refs["feature/a"] = fake_github.refs[settings.GITHUB_BRANCH]
+
+    result = await _commit("feature/a", "v1")
+
+    assert fake_github.calls[("POST", "create_ref")] == 1
+    assert fake_github.calls[("PATCH", "ref")] == 1
+    assert fake_github.refs["feature/a"] == result["commit"]["sha"]
+    assert _manifest_on(fake_github, "feature/a") == {"prompt": "v1"}
+
+
+async def test_reused_branch_is_force_reset_to_the_base(fake_github):
+    # A rolling branch left over from a closed PR, with commits the base does not have
+    await _commit("rolling", "v1")
+    await _commit("rolling", "v2")
+    base_sha = fake_github.refs[settings.GITHUB_BRANCH]
+
+    result = await _commit("rolling", "v3", reuse_branch=True)
+
+    assert fake_github.refs["rolling"] == result["commit"]["sha"]
+    assert fake_github.commits[result["commit"]["sha"]]["parents"] == [{"sha": base_sha}]
+    assert _manifest_on(fake_github, "rolling") == {"prompt": "v3"}
+    # Primed for the next commit to the branch, which then needs no SHA lookup
+    cached = file_sha_cache.get(resolve_target(None).full_name, "rolling", settings.GITHUB_FILE_PATH)
+    assert cached.blob_sha == git_blob_sha(json.dumps({"prompt": "v3"}, indent=2).encode("utf-8"))
+
+
+async def test_unchanged_manifest_creates_no_branch(fake_github):
+    # The base branch is known to hold this manifest already
+    manifest_bytes = json.dumps({"prompt": "v1"}, indent=2).encode("utf-8")
+    file_sha_cache.update(resolve_target(None).full_name, settings.GITHUB_BRANCH, settings.GITHUB_FILE_PATH, git_blob_sha(manifest_bytes))
+    refs_before = dict(fake_github.refs)
+
+    result = await run_pull_request(_payload("v1"))
+
+    assert (result["pull_request_url"], result["new_branch_name"]) == (None, None)
+    assert fake_github.refs == refs_before
+    assert fake_github.pulls == []
+
+
+async def test_run_pull_request_opens_one_pull_request(fake_github):
+    result = await run_pull_request(_payload("v1"))
+
+    assert len(fake_github.pulls) == 1
+    branch = result["new_branch_name"]
+    assert fake_github.pulls[0]["head"]["ref"] == branch
+    assert _manifest_on(fake_github, branch) == {"prompt": "v1"}
+    assert dict(fake_github.calls) == {
+        ("GET", "ref"): 1, ("GET", "commit"): 1, ("POST", "create_tree"): 1,
+        ("POST", "create_commit"): 1, ("POST", "create_ref"): 1, ("POST", "pulls"): 1,
+    }
@@ -0,0 +1,97 @@
+# tests/test_rolling_pull_request.py
+import pytest
+
+from app.config import settings
+from app.models import WebhookPayload
+from app.workflows import run_pull_request
+
+BRANCH = f"{settings.PR_ROLLING_BRANCH_PREFIX}-{settings.GITHUB_BRANCH}"
+
+
+@pytest.fixture(autouse=True)
+def rolling_mode(monkeypatch):
+    monkeypatch.setattr(settings, "PR_BRANCH_MODE", "rolling")
+
+
+def _payload(commit_hash: str) -> WebhookPayload:
+    return WebhookPayload(manifest={"prompt": commit_hash}, commit_hash=commit_hash, created_at="2025-01-01T00:00:00Z")
+
+
+def _writes(fake_github):
+    return {call: count for call, count in fake_github.calls.items() if call[0] != "GET"}
+
+
+async def test_webhooks_stack_onto_one_open_pull_request(fake_github):
+    first = await run_pull_request(_payload("e1"))
+    assert first["message"] == "Pull Request created successfully."
+    assert first["new_branch_name"] == BRANCH
+
+    fake_github.calls.clear()
+    second = await run_pull_request(_payload("e2"))
+
+    assert second["message"] == "Pull Request updated with the new manifest."
+    assert second["pull_request_details"]["number"] == 1
+    assert dict(fake_github.calls) == {("GET", "pull"): 1, ("PUT", "contents"): 1, ("PATCH", "update_pull"): 1}
+    assert len(fake_github.pulls) == 1
+    assert "e2" in fake_github.pulls[0]["title"]
+
+
+@pytest.mark.parametrize("merged", [True, False])
+async def test_closed_or_merged_pull_request_is_never_written_to(fake_github, merged):
+    await run_pull_request(_payload("e1"))
+    old_pull = fake_github.pulls[0]
+    old_pull.update(state="closed", merged=merged)
+    old_title = old_pull["title"]
+    base_head = fake_github.refs[settings.GITHUB_BRANCH]
+
+    fake_github.calls.clear()
+    result = await run_pull_request(_payload("e2"))
+
+    # The branch is restarted from the base branch and a new PR is opened
+    assert result["message"] == "Pull Request created successfully."
+    assert result["pull_request_details"]["number"] == 2
+    assert ("PATCH", "update_pull") not in fake_github.calls
+    assert ("PUT", "contents") not in fake_github.calls
+    assert old_pull["title"] == old_title
+    head_commit = fake_github.commits[fake_github.refs[BRANCH]]
+    assert [parent["sha"] for parent in head_commit["parents"]] == [base_head]
+
+    # Later webhooks stack onto the new PR
+    fake_github.calls.clear()
+    assert (await run_pull_request(_payload("e3")))["pull_request_details"]["number"] == 2
+    assert ("PATCH", "update_pull") in _writes(fake_github)
+
+
+async def test_resetting_a_leftover_rolling_branch_logs_its_old_head(fake_github, caplog):
+    await run_pull_request(_payload("e1"))
+    fake_github.pulls[0].update(state="closed", merged=False)
+    old_head = fake_github.refs[BRANCH]
+
+    await run_pull_request(_payload("e2"))
+
+    warnings = [record.getMessage() for record in caplog.records if record.levelname == "WARNING"]
+    assert len(warnings) == 1
+    assert f"Force-resetting it to the new commit {fake_github.refs[BRANCH]}" in warnings[0]
+    assert f"discarding its old head {old_head}" in warnings[0]
+
+
+async def test_deleted_rolling_branch_starts_a_new_pull_request(fake_github):
+    await run_pull_request(_payload("e1"))
+    # Merged with "delete branch" before GitHub reports the PR as merged
+    del fake_github.refs[BRANCH]
+
+    result = await run_pull_request(_payload("e2"))
+
+    assert BRANCH in fake_github.refs
+    assert result["new_branch_name"] == BRANCH
+    assert fake_github.files_at(BRANCH)[settings.GITHUB_FILE_PATH] == _payload("e2").manifest_json().encode("utf-8")
+
+
+async def test_unchanged_manifest_does_not_touch_the_pull_request(fake_github):
+    await run_pull_request(_payload("e1"))
+    fake_github.calls.clear()
+
+    result = await run_pull_request(WebhookPayload(manifest={"prompt": "e1"}, commit_hash="again", created_at="x"))
+
+    assert result["message"] == f"Manifest is unchanged on '{BRANCH}'; the Pull Request was not updated."
+    assert _writes(fake_github) == {}
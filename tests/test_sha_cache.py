@@ -0,0 +1,175 @@
+# tests/test_sha_cache.py
+import base64
+import json
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.github_client import close_github_client, start_github_client
+from app.helpers import commit_manifest_to_github_direct, file_sha_cache
+from app.models import WebhookPayload
+from app.sha_cache import FileShaCache, git_blob_sha
+from app.targets import resolve_target
+
+
+class FakeContents:
+    """
+    Just enough of GitHub's contents API for one branch: GETs with ETags and PUTs that
+    reject a stale `sha` with a 409, or a missing one with a 422. Every call is recorded
+    as (method, If-None-Match, status). `before_put` is called before each PUT.
+    """
+
+    def __init__(self):
+        self.files = {}  # path -> bytes
+        self.sent = []
+        self.before_put = None
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.split("/contents/", 1)[1]
+        current = self.files.get(path)
+        current_sha = git_blob_sha(current) if current is not None else None
+        if request.method == "GET":
+            etag = f'"{current_sha}"'
+            if current is None:
+                response = httpx.Response(404, json={"message": "Not Found"})
+            elif request.headers.get("If-None-Match") == etag:
+                response = httpx.Response(304)
+            else:
+                response = httpx.Response(200, json={"sha": current_sha}, headers={"ETag": etag})
+        else:
+            if self.before_put is not None:
+                self.before_put()
+                current = self.files.get(path)
+                current_sha = git_blob_sha(current) if current is not None else None
+            data = json.loads(request.content)
+            if current is not None and "sha" not in data:
+                response = httpx.Response(422, json={"message": 'Invalid request.\n\n"sha" wasn\'t supplied.'})
+            elif data.get("sha") != current_sha:
+                response = httpx.Response(409, json={"message": "is at a different commit than expected"})
+            else:
+                self.files[path] = base64.b64decode(data["content"])
+                new_sha = git_blob_sha(self.files[path])
+                response = httpx.Response(201, json={"content": {"path": path, "sha": new_sha}, "commit": {"sha": f"c-{new_sha[:7]}"}})
+        self.sent.append((request.method, request.headers.get("If-None-Match"), response.status_code))
+        return response
+
+
+@pytest.fixture
+async def contents():
+    fake = FakeContents()
+    file_sha_cache._entries.clear()
+    await start_github_client(httpx.MockTransport(fake.handle))
+    yield fake
+    await close_github_client()
+    file_sha_cache._entries.clear()
+
+
+def _payload(prompt: str) -> WebhookPayload:
+    return WebhookPayload(manifest={"prompt": prompt}, commit_hash=f"c-{prompt}", created_at="2025-01-01T00:00:00Z")
+
+
+def _manifest_bytes(payload: WebhookPayload) -> bytes:
+    return json.dumps(payload.manifest, indent=2).encode("utf-8")
+
+
+def _cached(path: str):
+    return file_sha_cache.get(resolve_target(None).full_name, settings.GITHUB_BRANCH, path)
+
+
+def _age(path: str) -> None:
+    _cached(path).validated_at -= settings.SHA_CACHE_TTL_SECONDS + 1
+
+
+def test_git_blob_sha_matches_git():
+    # `git hash-object` of an empty file and of "hello\n"
+    assert git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+    assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = FileShaCache(ttl=60, max_entries=2)
+    cache.update("o/r", "main", "a.json", "sha-a")
+    cache.update("o/r", "feature/prompt-1", "a.json", "sha-1")
+    cache.get("o/r", "main", "a.json")
+    cache.update("o/r", "feature/prompt-2", "a.json", "sha-2")
+
+    assert list(cache._entries) == [("o/r", "main", "a.json"), ("o/r", "feature/prompt-2", "a.json")]
+    assert cache.get("o/r", "feature/prompt-1", "a.json") is None
+
+
+def test_entries_expire_after_ttl_until_revalidated():
+    cache = FileShaCache(ttl=60, max_entries=10)
+    cache.update("o/r", "main", "a.json", "sha-1", etag='"e1"')
+    entry = cache.get("o/r", "main", "a.json")
+    assert (entry.blob_sha, entry.etag) == ("sha-1", '"e1"')
+    assert cache.is_fresh(entry)
+
+    entry.validated_at -= 61
+    assert not cache.is_fresh(entry)
+    cache.mark_validated("o/r", "main", "a.json")
+    assert cache.is_fresh(entry)
+
+    assert cache.get("other/repo", "main", "a.json") is None
+    cache.invalidate("o/r", "main", "a.json")
+    assert cache.get("o/r", "main", "a.json") is None
+
+
+async def test_no_op_commits_revalidate_stale_shas_with_if_none_match(contents):
+    path = settings.GITHUB_FILE_PATH
+    payload = _payload("v1")
+    first = await commit_manifest_to_github_direct(payload)
+    assert first["content"]["sha"] == git_blob_sha(_manifest_bytes(payload))
+    assert [(method, status) for method, _, status in contents.sent] == [("GET", 404), ("PUT", 201)]
+
+    # Fresh cache: the same manifest is a no-op without any GitHub call
+    contents.sent.clear()
+    assert (await commit_manifest_to_github_direct(payload))["status"] == "unchanged"
+    assert contents.sent == []
+
+    # Stale entry without an ETag: a plain GET confirms it and stores the ETag
+    _age(path)
+    assert (await commit_manifest_to_github_direct(payload))["status"] == "unchanged"
+    assert contents.sent == [("GET", None, 200)]
+
+    # Stale again: the conditional GET gets a 304
+    contents.sent.clear()
+    _age(path)
+    assert (await commit_manifest_to_github_direct(payload))["status"] == "unchanged"
+    assert contents.sent == [("GET", _cached(path).etag, 304)]
+    assert file_sha_cache.is_fresh(_cached(path))
+
+
+async def test_changed_manifest_uses_cached_sha_without_get(contents):
+    await commit_manifest_to_github_direct(_payload("v1"))
+    contents.sent.clear()
+
+    result = await commit_manifest_to_github_direct(_payload("v2"))
+
+    assert result["content"]["sha"] == git_blob_sha(_manifest_bytes(_payload("v2")))
+    assert contents.sent == [("PUT", None, 201)]
+    assert contents.files[settings.GITHUB_FILE_PATH] == _manifest_bytes(_payload("v2"))
+
+
+async def test_stale_cached_sha_is_refreshed_after_a_409(contents):
+    await commit_manifest_to_github_direct(_payload("v1"))
+    # Another writer changes the file behind the cache's back
+    contents.files[settings.GITHUB_FILE_PATH] = b"edited elsewhere"
+    contents.sent.clear()
+
+    await commit_manifest_to_github_direct(_payload("v2"))
+
+    assert [(method, status) for method, _, status in contents.sent] == [("PUT", 409), ("GET", 200), ("PUT", 201)]
+    assert contents.files[settings.GITHUB_FILE_PATH] == _manifest_bytes(_payload("v2"))
+
+
+async def test_a_file_created_between_the_get_and_the_put_is_retried(contents):
+    def another_writer():
+        contents.files.setdefault(settings.GITHUB_FILE_PATH, b"created elsewhere")
+
+    contents.before_put = another_writer
+
+    await commit_manifest_to_github_direct(_payload("v1"))
+
+    assert [(method, status) for method, _, status in contents.sent] == [("GET", 404), ("PUT", 422), ("GET", 200), ("PUT", 201)]
+    assert contents.files[settings.GITHUB_FILE_PATH] == _manifest_bytes(_payload("v1"))
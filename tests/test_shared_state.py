@@ -0,0 +1,113 @@
+# tests/test_shared_state.py
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app import shared_state
+from app.config import settings
+from app.shared_state import SharedState, write_lock
+from app.sqlite_db import open_database
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """
+    Two SharedState handles on one directory, standing in for two worker processes.
+    """
+    first, second = SharedState(str(tmp_path)), SharedState(str(tmp_path))
+    yield first, second
+    first.close()
+    second.close()
+
+
+async def test_open_database_uses_wal_and_works_from_worker_threads(tmp_path):
+    schema = "CREATE TABLE IF NOT EXISTS t (k TEXT PRIMARY KEY, v TEXT);"
+    conn = open_database(str(tmp_path / "db.sqlite3"), schema)
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        await asyncio.to_thread(conn.execute, "INSERT INTO t VALUES ('a', '1')")
+        # Reopening applies the schema again without losing rows; writes are autocommitted
+        other = open_database(str(tmp_path / "db.sqlite3"), schema)
+        assert dict(other.execute("SELECT * FROM t").fetchone()) == {"k": "a", "v": "1"}
+        other.close()
+    finally:
+        conn.close()
+
+
+async def test_file_shas_are_shared(workers):
+    first, second = workers
+    await first.set_file_sha("o/r", "main", "a.json", "sha-1", age=30)
+    blob_sha, age = await second.get_file_sha("o/r", "main", "a.json")
+    assert blob_sha == "sha-1"
+    assert 29 < age < 35
+
+    await second.set_file_sha("o/r", "main", "a.json", None)
+    assert await first.get_file_sha("o/r", "main", "a.json") is None
+
+
+async def test_a_response_is_claimed_by_one_worker_and_replayed_by_the_other(workers):
+    first, second = workers
+    assert await first.claim_response("key", lease_seconds=60) is None
+
+    waiting = asyncio.create_task(second.claim_response("key", lease_seconds=60))
+    await asyncio.sleep(0.1)
+    assert not waiting.done()
+
+    await first.store_response("key", (200, {"status": "ok"}), ttl=60)
+    assert await asyncio.wait_for(waiting, 5) == (200, {"status": "ok"})
+
+
+async def test_released_and_expired_claims_can_be_taken_over(workers):
+    first, second = workers
+    assert await first.claim_response("released", lease_seconds=60) is None
+    await first.release_response("released")
+    assert await second.claim_response("released", lease_seconds=60) is None
+
+    # A worker that died holding the claim: it expires after the lease
+    assert await first.claim_response("expired", lease_seconds=0.1) is None
+    assert await asyncio.wait_for(second.claim_response("expired", lease_seconds=60), 5) is None
+
+    await first.store_response("stored", (201, {"n": 1}), ttl=-1)
+    assert await second.claim_response("stored", lease_seconds=60) is None
+
+
+async def test_file_locks_exclude_other_workers(workers):
+    first, second = workers
+    fd = await first.acquire_file_lock("o/r:main:a.json", time.monotonic() + 1)
+    with pytest.raises(TimeoutError):
+        await second.acquire_file_lock("o/r:main:a.json", time.monotonic() + 0.05)
+
+    # Other keys are independent
+    other = await second.acquire_file_lock("o/r:main:b.json", time.monotonic() + 0.05)
+    os.close(other)
+
+    os.close(fd)
+    os.close(await second.acquire_file_lock("o/r:main:a.json", time.monotonic() + 1))
+
+
+async def test_write_lock_serializes_writers_and_times_out(workers, monkeypatch):
+    monkeypatch.setattr(shared_state, "_shared", workers[0])
+    monkeypatch.setattr(settings, "SHARED_LOCK_TIMEOUT_SECONDS", 0.2)
+    order = []
+
+    async def write(name, hold):
+        async with write_lock("o/r", "main", "a.json"):
+            order.append(f"{name} start")
+            await asyncio.sleep(hold)
+            order.append(f"{name} end")
+
+    await asyncio.gather(write("first", 0.05), write("second", 0.0))
+    assert order == ["first start", "first end", "second start", "second end"]
+
+    # Another worker holds the file lock for longer than the timeout
+    fd = await workers[1].acquire_file_lock("o/r:main:a.json", time.monotonic() + 1)
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            await write("third", 0.0)
+        assert exc_info.value.status_code == 503
+    finally:
+        os.close(fd)
+    assert shared_state._process_locks._locks == {}
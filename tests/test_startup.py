@@ -0,0 +1,119 @@
+# tests/test_startup.py
+import asyncio
+
+import httpx
+import pytest
+
+from app import github_client, startup, targets
+from app.config import settings
+from app.main import app
+from app.sha_cache import file_sha_cache
+from app.targets import DEFAULT_TARGET_KEY, resolve_target
+
+
+@pytest.fixture
+async def warm_up(fake_github, monkeypatch):
+    """
+    Runs the warm-up against the fake GitHub. Requests are held until `release` is set,
+    and every request to the "broken" target's repository fails with a 500.
+    """
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(settings, "WARMUP_TIMEOUT_SECONDS", 5.0)
+    monkeypatch.setattr(settings, "GITHUB_MAX_RETRIES", 0)
+    default = resolve_target(None)
+    broken = default.model_copy(update={"key": "broken", "owner": "broken", "repo": "repo"})
+    monkeypatch.setattr(targets, "_targets", {DEFAULT_TARGET_KEY: default, "broken": broken})
+    release = asyncio.Event()
+
+    async def gated(request: httpx.Request) -> httpx.Response:
+        await release.wait()
+        if request.url.path.startswith(broken.api_path):
+            return httpx.Response(500, json={"message": "Server Error"})
+        return await fake_github.handle(request)
+
+    await github_client.close_github_client()
+    await github_client.start_github_client(httpx.MockTransport(gated))
+    yield release
+    await startup.stop_warm_up()
+
+
+async def _ready():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get("/ready")
+
+
+async def test_ready_is_503_until_the_warm_up_has_finished(warm_up):
+    before = await _ready()
+    assert (before.status_code, before.json()["status"]) == (503, "warming_up")
+
+    startup.start_warm_up()
+    await asyncio.sleep(0.05)
+    during = await _ready()
+    assert (during.status_code, during.json()["warm_up"]) == (503, {})
+
+    warm_up.set()
+    await asyncio.wait_for(startup._warm_up_task, 5)
+    after = await _ready()
+    assert (after.status_code, after.json()["status"]) == (200, "ready")
+    assert "warm_up" in after.json()["startup_ms"]
+
+
+async def test_a_failing_target_is_reported_without_blocking_readiness(warm_up, fake_github):
+    default = resolve_target(None)
+    blob_sha = fake_github._store_blob(b"{}")
+    tree_sha = fake_github._store_tree({default.file_path: blob_sha})
+    fake_github.refs[default.branch] = fake_github._store_commit("manifest", tree_sha, [fake_github.refs[default.branch]])
+    warm_up.set()
+    startup.start_warm_up()
+    await asyncio.wait_for(startup._warm_up_task, 5)
+
+    report = (await _ready()).json()
+    assert report["status"] == "ready"
+    assert report["warm_up"]["default"] == "ok"
+    assert report["warm_up"]["broken"].startswith("failed: ")
+    assert "500" in report["warm_up"]["broken"]
+    # The healthy target's file SHA was prefetched all the same
+    assert file_sha_cache.get(default.full_name, default.branch, default.file_path).blob_sha == blob_sha
+
+
+async def test_a_hanging_target_times_out_and_the_worker_becomes_ready(warm_up, monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_TIMEOUT_SECONDS", 0.1)
+    startup.start_warm_up()
+    await asyncio.wait_for(startup._warm_up_task, 5)
+
+    response = await _ready()
+    assert response.status_code == 200
+    assert response.json()["warm_up"] == {"default": "timed out after 0.1s", "broken": "timed out after 0.1s"}
+
+
+async def test_ready_at_once_with_the_warm_up_disabled(warm_up, monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", False)
+    startup.start_warm_up()
+    assert (await _ready()).status_code == 200
+
+
+async def test_warm_up_caps_how_many_targets_run_at_once(fake_github, monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(settings, "GITHUB_MAX_CONCURRENT_REQUESTS", 2)
+    default = resolve_target(None)
+    many = {DEFAULT_TARGET_KEY: default, **{f"t{i}": default.model_copy(update={"key": f"t{i}", "repo": f"repo{i}"}) for i in range(6)}}
+    monkeypatch.setattr(targets, "_targets", many)
+    in_flight, peak = set(), [0]
+
+    async def slow(request: httpx.Request) -> httpx.Response:
+        in_flight.add(request.url.path)
+        peak[0] = max(peak[0], len(in_flight))
+        await asyncio.sleep(0.02)
+        in_flight.discard(request.url.path)
+        return httpx.Response(404, json={"message": "Not Found"})
+
+    await github_client.close_github_client()
+    await github_client.start_github_client(httpx.MockTransport(slow))
+    try:
+        startup.start_warm_up()
+        await asyncio.wait_for(startup._warm_up_task, 5)
+    finally:
+        await startup.stop_warm_up()
+
+    assert peak[0] == 2
+    assert set(startup.readiness()[1]["warm_up"]) == set(many)
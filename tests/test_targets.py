@@ -0,0 +1,175 @@
+# tests/test_targets.py
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app import github_client, metrics, targets
+from app.github_scheduler import github_schedulers
+from app.main import app
+from app.sha_cache import file_sha_cache
+from app.targets import DEFAULT_TARGET_KEY, load_targets, resolve_target, use_target
+from benchmarks.fake_github import FakeGitHub
+
+
+def _write_targets(tmp_path, content) -> str:
+    path = tmp_path / "targets.json"
+    path.write_text(content if isinstance(content, str) else json.dumps(content), encoding="utf-8")
+    return str(path)
+
+
+def test_entries_inherit_unset_fields_from_the_default_target(tmp_path, monkeypatch):
+    monkeypatch.setenv("ACME_TOKEN", "acme-token")
+    path = _write_targets(tmp_path, {
+        "acme": {"owner": "acme", "repo": "prompts", "token_env": "ACME_TOKEN", "max_concurrent_requests": 2},
+        "docs": {"owner": "fake", "repo": "repo", "file_path": "docs.json", "manifest_layout": "exploded"},
+    })
+
+    loaded = load_targets(path)
+
+    default = loaded[DEFAULT_TARGET_KEY]
+    assert list(loaded) == [DEFAULT_TARGET_KEY, "acme", "docs"]
+    assert (loaded["acme"].full_name, loaded["acme"].token, loaded["acme"].max_concurrent_requests) == ("acme/prompts", "acme-token", 2)
+    assert (loaded["acme"].branch, loaded["acme"].file_path) == (default.branch, default.file_path)
+    assert (loaded["docs"].file_path, loaded["docs"].manifest_layout, loaded["docs"].token) == ("docs.json", "exploded", default.token)
+    assert "acme-token" not in repr(loaded["acme"])
+    assert load_targets(None) == {DEFAULT_TARGET_KEY: default}
+
+
+@pytest.mark.parametrize(
+    "content, message",
+    [
+        ("{not json", "Could not read"),
+        ("[]", "must contain a JSON object"),
+        ({"bad key!": {"owner": "o", "repo": "r"}}, "Invalid target key 'bad key!'"),
+        ({"x": {"owner": "o"}}, "Invalid target 'x'"),
+        ({"x": {"owner": "o", "repo": "r", "branchh": "main"}}, "Invalid target 'x'"),
+        ({"x": {"owner": "o", "repo": "r", "manifest_layout": "zip"}}, "Invalid target 'x'"),
+        ({"x": {"owner": "o", "repo": "r", "rate_limit_burst": 0}}, "Invalid target 'x'"),
+        ({"x": {"owner": "o", "repo": "r", "token_env": "UNSET_TARGET_TOKEN"}}, "'UNSET_TARGET_TOKEN' is not set"),
+        ({"default": {"owner": "o", "repo": "r"}}, "Invalid target key 'default'"),
+        ('{"x": {"owner": "o", "repo": "r"}, "x": {"owner": "o", "repo": "s"}}', r"duplicate keys \['x'\]"),
+    ],
+)
+def test_invalid_target_files_fail_loudly(tmp_path, monkeypatch, content, message):
+    monkeypatch.delenv("UNSET_TARGET_TOKEN", raising=False)
+    with pytest.raises(ValueError, match=message):
+        load_targets(_write_targets(tmp_path, content))
+
+
+def test_missing_target_file_fails_loudly(tmp_path):
+    with pytest.raises(ValueError, match="Could not read"):
+        load_targets(str(tmp_path / "missing.json"))
+
+
+@pytest.fixture
+def two_repositories(monkeypatch):
+    """
+    The default target plus an "acme" target on another repository with its own token.
+    Each repository is a separate FakeGitHub; every request is recorded with its token.
+    """
+    default = resolve_target(None)
+    acme = default.model_copy(update={"key": "acme", "owner": "acme", "repo": "prompts", "token": "acme-token"})
+    monkeypatch.setattr(targets, "_targets", {DEFAULT_TARGET_KEY: default, "acme": acme})
+    fakes = {default.api_path: FakeGitHub(latency=0.002, jitter=0.002, seed=1), acme.api_path: FakeGitHub(latency=0.002, jitter=0.002, seed=2)}
+    seen = []
+
+    async def route(request: httpx.Request) -> httpx.Response:
+        api_path = "/".join(request.url.path.split("/")[:4])
+        seen.append((api_path, request.headers["Authorization"]))
+        return await fakes[api_path].handle(request)
+
+    return default, acme, fakes, seen, httpx.MockTransport(route)
+
+
+async def test_unknown_targets_are_404s(fake_github):
+    payload = {"manifest": {"prompt": "v1"}, "commit_hash": "c1", "created_at": "2025-01-01T00:00:00Z"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        by_path = await client.post("/webhook/nowhere/github-commit", json=payload)
+        by_field = await client.post("/webhook/github-pr", json={**payload, "target": "nowhere"})
+
+    assert (by_path.status_code, by_field.status_code) == (404, 404)
+    assert by_path.json()["detail"] == "Unknown target 'nowhere'."
+    assert fake_github.total_calls() == 0
+    with pytest.raises(HTTPException) as exc_info:
+        resolve_target("nowhere")
+    assert exc_info.value.status_code == 404
+
+
+async def test_concurrent_webhooks_never_share_clients_tokens_or_caches(fake_github, two_repositories):
+    default, acme, fakes, seen, transport = two_repositories
+    await github_client.close_github_client()
+    await github_client.start_github_client(transport)
+
+    def payload(target: str, i: int) -> dict:
+        return {"manifest": {"prompt": f"{target} {i}"}, "commit_hash": f"{target}-{i}", "created_at": "2025-01-01T00:00:00Z"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post(url, json=payload(target, i))
+            for i in range(8)
+            for target, url in (("default", "/webhook/github-commit"), ("acme", "/webhook/acme/github-commit"))
+        ))
+    assert {response.status_code for response in responses} == {201}
+
+    # Every request went to its own repository with its own token
+    assert {api_path: token for api_path, token in seen} == {
+        default.api_path: f"Bearer {default.token}",
+        acme.api_path: "Bearer acme-token",
+    }
+    assert len(set(seen)) == 2
+    for target, fake in ((default, fakes[default.api_path]), (acme, fakes[acme.api_path])):
+        manifest = json.loads(fake.files_at(target.branch)[target.file_path])
+        assert manifest["prompt"].startswith(f"{target.key} ")
+        commit_messages = [commit["message"] for commit in fake.commits.values()]
+        assert all(f"{target.key}-" in message for message in commit_messages[1:])
+
+    # Separate clients, schedulers and cache entries per target
+    assert github_client._clients[default.key] is not github_client._clients[acme.key]
+    assert github_schedulers[default.key] is not github_schedulers[acme.key]
+    assert {key[0] for key in file_sha_cache._entries} == {default.full_name, acme.full_name}
+
+
+async def test_the_current_target_does_not_leak_between_tasks(fake_github, two_repositories):
+    default, acme, _, _, _ = two_repositories
+    seen = {}
+
+    async def flow(target):
+        with use_target(target):
+            for _ in range(5):
+                await asyncio.sleep(0)
+                seen.setdefault(target.key, set()).add((targets.current_target().key, id(github_client.get_github_client())))
+
+    await asyncio.gather(flow(default), flow(acme), flow(default), flow(acme))
+
+    assert {key: {current for current, _ in values} for key, values in seen.items()} == {"default": {"default"}, "acme": {"acme"}}
+    assert len(seen["default"]) == len(seen["acme"]) == 1
+    assert seen["default"] != seen["acme"]
+    assert targets.current_target().key == DEFAULT_TARGET_KEY
+
+
+def test_connection_pool_gauges_are_kept_per_target():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    assert metrics.init_metrics()
+
+    class Connection:
+        def __init__(self, idle: bool):
+            self.idle = idle
+
+        def is_idle(self) -> bool:
+            return self.idle
+
+    def transport(*idle_flags):
+        return SimpleNamespace(_pool=SimpleNamespace(connections=[Connection(idle) for idle in idle_flags]))
+
+    metrics.observe_connection_pool("pool-a", transport(True, True, False))
+    metrics.observe_connection_pool("pool-b", transport(False))
+
+    def sample(target, state):
+        return prometheus_client.REGISTRY.get_sample_value("github_pool_connections", {"target": target, "state": state})
+
+    assert (sample("pool-a", "idle"), sample("pool-a", "active")) == (2, 1)
+    assert (sample("pool-b", "idle"), sample("pool-b", "active")) == (0, 1)
@@ -0,0 +1,104 @@
+# tests/test_webhook_body.py
+import gzip
+import json
+import random
+import zlib
+
+import pytest
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+
+from app.config import settings
+from app.serialization import decode_body, dumps_manifest
+from app.webhook_body import parse_webhook_payload
+
+SECRET = "do-not-echo-this-prompt"
+
+
+def _body(**fields) -> bytes:
+    return json.dumps(fields).encode("utf-8")
+
+
+def test_parse_keeps_the_manifest_as_sent():
+    manifest = {"prompt": {"messages": [{"role": "user", "content": "Hi"}]}, "tags": ["a"]}
+    payload = parse_webhook_payload(_body(manifest=manifest, commit_hash="abc", created_at="2025-01-01T00:00:00Z"))
+    assert payload.manifest == manifest
+    assert (payload.commit_hash, payload.created_at) == ("abc", "2025-01-01T00:00:00Z")
+
+
+@pytest.mark.parametrize(
+    "body, expected",
+    [
+        (_body(manifest={"prompt": SECRET}, created_at="2025-01-01T00:00:00Z"), [("missing", ("body", "commit_hash"))]),
+        (_body(manifest={"prompt": SECRET}, commit_hash=1, created_at="x"), [("string_type", ("body", "commit_hash"))]),
+        (_body(commit_hash="abc", created_at="x"), [("missing", ("body", "manifest"))]),
+        (_body(manifest=["not", "an", "object"], commit_hash="abc", created_at="x"), [("dict_type", ("body", "manifest"))]),
+        (b"[]", [("model_attributes_type", ("body",))]),
+        (b"{not json", [("json_invalid", ("body", 0))]),
+    ],
+)
+def test_invalid_envelopes_are_422s_without_the_manifest(body, expected):
+    with pytest.raises(RequestValidationError) as exc_info:
+        parse_webhook_payload(body)
+    errors = exc_info.value.errors()
+    assert [(error["type"], error["loc"]) for error in errors] == expected
+    # Neither the manifest nor a placeholder for it is echoed back in the error details
+    assert SECRET not in json.dumps(errors, default=str)
+    assert not any(isinstance(error["input"], dict) and "manifest" in error["input"] for error in errors)
+
+
+def test_decode_body_inflates_gzip_and_deflate():
+    body = _body(manifest={"prompt": "x" * 1000}, commit_hash="abc", created_at="x")
+    assert decode_body(body, "") == body
+    assert decode_body(body, "identity") == body
+    assert decode_body(gzip.compress(body), "gzip") == body
+    assert decode_body(zlib.compress(body), " Deflate ") == body
+
+
+def test_decode_body_rejects_bad_encodings():
+    with pytest.raises(HTTPException) as exc_info:
+        decode_body(b"data", "br")
+    assert exc_info.value.status_code == 415
+
+    with pytest.raises(HTTPException) as exc_info:
+        decode_body(b"not gzip at all", "gzip")
+    assert exc_info.value.status_code == 400
+
+
+def test_decode_body_caps_the_decompressed_size(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_WEBHOOK_BODY_BYTES", 1024)
+    bomb = gzip.compress(b"0" * 100_000)
+    assert len(bomb) < 1024
+
+    with pytest.raises(HTTPException) as exc_info:
+        decode_body(bomb, "gzip")
+    assert exc_info.value.status_code == 413
+    assert decode_body(gzip.compress(b"0" * 1024), "gzip") == b"0" * 1024
+
+
+def _random_value(rng: random.Random, depth: int = 0):
+    kind = rng.randrange(7 if depth < 3 else 4)
+    if kind == 0:
+        return rng.choice(["plain", "ünïcödé", "emoji 🎉", 'quote " and \\ slash', "tab\tnewline\n", ""])
+    if kind == 1:
+        return rng.randint(-10**12, 10**12)
+    if kind == 2:
+        return rng.choice([0.5, -1.25, 3.14159, 100.0])
+    if kind == 3:
+        return rng.choice([True, False, None])
+    if kind in (4, 5):
+        return {f"key{rng.randrange(100)}": _random_value(rng, depth + 1) for _ in range(rng.randrange(4))}
+    return [_random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+
+
+def test_dumps_manifest_matches_the_original_format(monkeypatch):
+    monkeypatch.setattr(settings, "MANIFEST_SORT_KEYS", False)
+    rng = random.Random(0)
+    for _ in range(200):
+        manifest = {"prompt": _random_value(rng), "z": 1, "a": _random_value(rng)}
+        assert dumps_manifest(manifest) == json.dumps(manifest, indent=2)
+
+
+def test_dumps_manifest_sorts_keys_when_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "MANIFEST_SORT_KEYS", True)
+    assert dumps_manifest({"b": 1, "a": {"d": 2, "c": "é"}}) == json.dumps({"a": {"c": "é", "d": 2}, "b": 1}, indent=2)